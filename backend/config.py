@@ -48,6 +48,9 @@ class Config:
     JWT_ALGORITHM: str = os.environ.get('JWT_ALGORITHM', 'HS256')
     JWT_ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.environ.get('JWT_ACCESS_TOKEN_EXPIRE_MINUTES', '30'))
     
+    # ==================== OTP Configuration ====================
+    OTP_HASH_SECRET: str = os.environ.get('OTP_HASH_SECRET', JWT_SECRET_KEY)
+    
     # ==================== Frontend Configuration ====================
     FRONTEND_URL: str = os.environ.get('FRONTEND_URL', 'http://localhost:3000')
     
@@ -98,6 +101,10 @@ class Config:
     API_TIMEOUT: int = int(os.environ.get('API_TIMEOUT', '30'))
     API_VERSION: str = os.environ.get('API_VERSION', '1.0.0')
     
+    # ==================== Blog Configuration ====================
+    # Falls back to unindexed substring matching instead of the blog_text index
+    BLOG_REGEX_SEARCH: bool = os.environ.get('BLOG_REGEX_SEARCH', 'False').lower() == 'true'
+    
     # ==================== Security Configuration ====================
     ALLOWED_HOSTS: List[str] = os.environ.get(
         'ALLOWED_HOSTS',
@@ -132,6 +139,9 @@ class Config:
             if cls.ENVIRONMENT == 'production':
                 errors.append("JWT_SECRET_KEY must be set in production")
         
+        if cls.OTP_HASH_SECRET == cls.JWT_SECRET_KEY:
+            errors.append("OTP_HASH_SECRET should be set separately from JWT_SECRET_KEY")
+        
         if errors:
             raise ValueError(f"Configuration errors: {', '.join(errors)}")
         
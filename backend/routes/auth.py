@@ -26,6 +26,18 @@ async def get_database() -> AsyncIOMotorDatabase:
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
+async def ensure_otp_indexes(db: AsyncIOMotorDatabase):
+    """Ensure indexes backing OTP issue and verification exist."""
+    # At most one live OTP per identifier and purpose; create_otp upserts into it
+    await db.otps.create_index(
+        [("identifier", 1), ("purpose", 1)],
+        unique=True,
+        partialFilterExpression={"is_used": False},
+        name="otp_active_unique"
+    )
+    # MongoDB's TTL monitor removes OTPs once they expire
+    await db.otps.create_index("expires_at", expireAfterSeconds=0)
+
 @router.post("/register", response_model=dict)
 async def register_user(
     user_data: UserCreate,
@@ -201,21 +213,14 @@ async def request_otp(
     
     try:
         if otp_request.email:
-            # Create OTP for email
-            otp_data = await otp_service.create_otp(
+            # Create OTP and send it via email
+            otp_data = await otp_service.create_and_send_otp(
                 identifier=otp_request.email,
                 purpose=otp_request.purpose,
                 identifier_type="email"
             )
             
-            # Send OTP via email
-            email_sent = await otp_service.send_email_otp(
-                email=otp_request.email,
-                otp_code=otp_data["otp_code"],
-                purpose=otp_request.purpose
-            )
-            
-            if not email_sent:
+            if not otp_data["sent"]:
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail="Failed to send OTP email"
@@ -228,21 +233,14 @@ async def request_otp(
             }
             
         elif otp_request.phone:
-            # Create OTP for phone
-            otp_data = await otp_service.create_otp(
+            # Create OTP and send it via SMS
+            otp_data = await otp_service.create_and_send_otp(
                 identifier=otp_request.phone,
                 purpose=otp_request.purpose,
                 identifier_type="phone"
             )
             
-            # Send OTP via SMS
-            sms_sent = await otp_service.send_sms_otp(
-                phone=otp_request.phone,
-                otp_code=otp_data["otp_code"],
-                purpose=otp_request.purpose
-            )
-            
-            if not sms_sent:
+            if not otp_data["sent"]:
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail="Failed to send OTP SMS"
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Response
 from typing import Optional, List
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
 
 from models.shipment import ShipmentCreate, ShipmentResponse, ShipmentUpdate, ShipmentStatus
 from models.user import User
@@ -142,14 +143,13 @@ async def get_user_bookings(
         query["status"] = status_filter
     
     # Find user's shipments
-    shipments_cursor = db.shipments.find(query).sort("created_at", -1).limit(limit).skip(skip)
-    shipments_data = await shipments_cursor.to_list(length=limit)
+    shipments_cursor = db.shipments.find(query).sort("created_at", -1).limit(limit).skip(skip).batch_size(limit)
     
     # Convert to response format
     booking_service = BookingService()
     responses = []
     
-    for shipment_data in shipments_data:
+    async for shipment_data in shipments_cursor:
         from models.shipment import Shipment
         shipment = Shipment(**shipment_data)
         response = booking_service.process_shipment_response(shipment)
@@ -250,10 +250,17 @@ async def update_booking(
     # Update in database
     if update_data:
         update_data["updated_at"] = shipment.updated_at
-        await db.shipments.update_one(
-            {"id": booking_id},
-            {"$set": update_data}
-        )
+        try:
+            await db.shipments.update_one(
+                {"id": booking_id},
+                {"$set": update_data}
+            )
+        except DuplicateKeyError:
+            # AWBs are unique across shipments (awb_unique index)
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Tracking number is already assigned to another shipment"
+            )
         
         # Refresh from database
         shipment_data = await db.shipments.find_one({"id": booking_id})
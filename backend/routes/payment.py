@@ -1,7 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi.responses import ORJSONResponse
 from typing import Optional, List
 from datetime import datetime
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pydantic import TypeAdapter
+import orjson
 
 from models.user import User
 from models.payment import (
@@ -11,17 +14,29 @@ from models.payment import (
 )
 from services.payment_service import PaymentService
 from utils.auth import get_current_user
-
-# Database dependency
-async def get_database() -> AsyncIOMotorDatabase:
-    from motor.motor_asyncio import AsyncIOMotorClient
-    import os
-    mongo_url = os.environ['MONGO_URL']
-    client = AsyncIOMotorClient(mongo_url)
-    return client[os.environ.get('DB_NAME', 'xfas_logistics')]
+from utils.database import get_database
+from config import config
 
 router = APIRouter(prefix="/payments", tags=["Payments"])
 
+# Stateless service shared by all handlers
+_payment_service = PaymentService()
+
+# Raw gateway responses can be large and are not needed in listings
+PAYMENT_LIST_PROJECTION = {"_id": 0, "provider_response": 0}
+
+# Validates a whole page of payment documents in one call
+_PAYMENT_LIST_ADAPTER = TypeAdapter(List[Payment])
+
+async def ensure_payment_indexes(db: AsyncIOMotorDatabase):
+    """Ensure indexes backing the payment listing queries exist."""
+    # Serves GET /payments/: equality on user_id (+ optional status), newest first
+    await db.payments.create_index([
+        ("user_id", 1),
+        ("status", 1),
+        ("created_at", -1)
+    ])
+
 # ===== WALLET MANAGEMENT =====
 
 @router.get("/wallet", response_model=Wallet)
@@ -32,8 +47,7 @@ async def get_wallet(
     """Get user's wallet information."""
     
     try:
-        payment_service = PaymentService()
-        wallet = await payment_service.get_or_create_wallet(current_user.id, db)
+        wallet = await _payment_service.get_or_create_wallet(current_user.id, db)
         
         return wallet
         
@@ -51,8 +65,7 @@ async def get_wallet_balance(
     """Get user's wallet balance."""
     
     try:
-        payment_service = PaymentService()
-        balance = await payment_service.get_wallet_balance(current_user.id, db)
+        balance = await _payment_service.get_wallet_balance(current_user.id, db)
         
         return {"success": True, "balance": balance}
         
@@ -72,8 +85,7 @@ async def get_wallet_transactions(
     """Get user's wallet transaction history."""
     
     try:
-        payment_service = PaymentService()
-        transactions = await payment_service.get_wallet_transactions(current_user.id, db, limit, skip)
+        transactions = await _payment_service.get_wallet_transactions(current_user.id, db, limit, skip)
         
         return transactions
         
@@ -93,8 +105,6 @@ async def load_wallet(
     """Load money into user's wallet."""
     
     try:
-        payment_service = PaymentService()
-        
         # Create payment for wallet load
         payment_data = PaymentCreate(
             amount=amount,
@@ -105,7 +115,7 @@ async def load_wallet(
             description=f"Wallet load of ₹{amount}"
         )
         
-        payment_response = await payment_service.create_payment(payment_data, current_user.id, db)
+        payment_response = await _payment_service.create_payment(payment_data, current_user.id, db)
         
         return payment_response
         
@@ -131,8 +141,7 @@ async def create_payment(
     """Create a new payment."""
     
     try:
-        payment_service = PaymentService()
-        payment_response = await payment_service.create_payment(payment_data, current_user.id, db)
+        payment_response = await _payment_service.create_payment(payment_data, current_user.id, db)
         
         return payment_response
         
@@ -156,8 +165,7 @@ async def get_payment(
     """Get payment details."""
     
     try:
-        payment_service = PaymentService()
-        payment = await payment_service.get_payment(payment_id, current_user.id, db)
+        payment = await _payment_service.get_payment(payment_id, current_user.id, db)
         
         if not payment:
             raise HTTPException(
@@ -190,11 +198,24 @@ async def get_user_payments(
         if status_filter:
             query["status"] = status_filter
         
-        cursor = db.payments.find(query).sort("created_at", -1).skip(skip).limit(limit)
-        payments_data = await cursor.to_list(length=limit)
-        total_count = await db.payments.count_documents(query)
-        
-        payments = [Payment(**payment) for payment in payments_data]
+        # Fetch the page and the total count in a single round trip
+        pipeline = [
+            {"$match": query},
+            {"$facet": {
+                "data": [
+                    {"$sort": {"created_at": -1}},
+                    {"$skip": skip},
+                    {"$limit": limit},
+                    {"$project": PAYMENT_LIST_PROJECTION}
+                ],
+                "total": [{"$count": "count"}]
+            }}
+        ]
+        result = (await db.payments.aggregate(pipeline).to_list(length=1))[0]
+        payments_data = result["data"]
+        total_count = result["total"][0]["count"] if result["total"] else 0
+        
+        payments = _PAYMENT_LIST_ADAPTER.validate_python(payments_data)
         
         return {
             "success": True,
@@ -226,8 +247,7 @@ async def create_refund(
     """Create a refund request."""
     
     try:
-        payment_service = PaymentService()
-        refund_response = await payment_service.create_refund(refund_request, current_user.id, db)
+        refund_response = await _payment_service.create_refund(refund_request, current_user.id, db)
         
         return refund_response
         
@@ -244,7 +264,7 @@ async def create_refund(
 
 # ===== WEBHOOKS =====
 
-@router.post("/webhooks/razorpay")
+@router.post("/webhooks/razorpay", response_class=ORJSONResponse)
 async def razorpay_webhook(
     request: Request,
     db: AsyncIOMotorDatabase = Depends(get_database)
@@ -255,9 +275,17 @@ async def razorpay_webhook(
         payload = await request.body()
         signature = request.headers.get("X-Razorpay-Signature", "")
         
+        # Reject forged deliveries before paying for JSON parsing
+        webhook_secret = config.RAZORPAY_WEBHOOK_SECRET
+        if not webhook_secret:
+            payment_config = await _payment_service.get_payment_config(db)
+            webhook_secret = payment_config.razorpay_webhook_secret
+        
+        if not signature or not webhook_secret or not _payment_service.verify_razorpay_signature(payload, signature, webhook_secret):
+            return {"status": "invalid"}
+        
         # Parse payload
-        import json
-        webhook_data = json.loads(payload.decode('utf-8'))
+        webhook_data = orjson.loads(payload)
         
         # Create webhook record
         webhook = PaymentWebhook(
@@ -268,8 +296,7 @@ async def razorpay_webhook(
             signature=signature
         )
         
-        payment_service = PaymentService()
-        processed = await payment_service.process_webhook(webhook, db)
+        processed = await _payment_service.process_webhook(webhook, db)
         
         if processed:
             return {"status": "success"}
@@ -308,8 +335,7 @@ async def get_payment_analytics(
     """Get user's payment analytics."""
     
     try:
-        payment_service = PaymentService()
-        analytics = await payment_service.get_payment_analytics(current_user.id, days, db)
+        analytics = await _payment_service.get_payment_analytics(current_user.id, days, db)
         
         return {"success": True, "data": analytics}
         
@@ -329,8 +355,7 @@ async def get_payment_config(
     """Get payment configuration (admin only)."""
     
     try:
-        payment_service = PaymentService()
-        config = await payment_service.get_payment_config(db)
+        config = await _payment_service.get_payment_config(db)
         
         # Remove sensitive fields for response
         config.razorpay_key_secret = None
@@ -363,8 +388,7 @@ async def update_payment_config(
             upsert=True
         )
         
-        payment_service = PaymentService()
-        updated_config = await payment_service.get_payment_config(db)
+        updated_config = await _payment_service.get_payment_config(db)
         
         # Remove sensitive fields for response
         updated_config.razorpay_key_secret = None
@@ -473,19 +473,13 @@ async def request_phone_verification(
         
         otp_service = get_otp_service(db)
         
-        otp_data = await otp_service.create_otp(
+        otp_data = await otp_service.create_and_send_otp(
             identifier=current_user.phone,
             purpose="verify_phone",
             identifier_type="phone"
         )
         
-        sms_sent = await otp_service.send_sms_otp(
-            phone=current_user.phone,
-            otp_code=otp_data["otp_code"],
-            purpose="verify_phone"
-        )
-        
-        if not sms_sent:
+        if not otp_data["sent"]:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to send verification SMS"
@@ -1,23 +1,58 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from typing import Optional
+from typing import Optional, List
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pydantic import TypeAdapter
 
 from models.quote import QuoteRequest, Quote, QuoteResponse
 from models.user import User
 from services.quote_service import QuoteService
 from services.carrier_service import CarrierService
 from utils.auth import get_current_user, get_optional_current_user
-
-# Database dependency
-async def get_database() -> AsyncIOMotorDatabase:
-    from motor.motor_asyncio import AsyncIOMotorClient
-    import os
-    mongo_url = os.environ['MONGO_URL']
-    client = AsyncIOMotorClient(mongo_url)
-    return client[os.environ.get('DB_NAME', 'xfas_logistics')]
+from utils.database import get_database
 
 router = APIRouter(prefix="/quotes", tags=["Quotes"])
 
+# Stateless service shared by all handlers
+_quote_service = QuoteService()
+
+# Fields read by process_quote_response
+QUOTE_LIST_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "user_id": 1,
+    "request": 1,
+    "carrier_quotes": 1,
+    "status": 1,
+    "created_at": 1,
+    "expires_at": 1
+}
+
+# Validates a whole page of quote documents in one call
+_QUOTE_LIST_ADAPTER = TypeAdapter(List[Quote])
+
+async def ensure_quote_indexes(db: AsyncIOMotorDatabase):
+    """Ensure indexes backing the quote lookups exist."""
+    # Serves GET /quotes/: a user's quotes, newest first
+    await db.quotes.create_index([
+        ("user_id", 1),
+        ("created_at", -1)
+    ])
+    # Serves get/delete by quote id
+    await db.quotes.create_index("id", unique=True)
+
+async def _raise_quote_lookup_error(db: AsyncIOMotorDatabase, quote_id: str):
+    """Raise 403 if the quote exists but was filtered out by ownership, else 404."""
+    
+    if await db.quotes.find_one({"id": quote_id}, {"_id": 0, "id": 1}):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied"
+        )
+    raise HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="Quote not found"
+    )
+
 @router.post("/", response_model=QuoteResponse)
 async def create_quote(
     request: QuoteRequest,
@@ -27,18 +62,15 @@ async def create_quote(
     """Generate shipping quotes from multiple carriers."""
     
     try:
-        # Create quote service
-        quote_service = QuoteService()
-        
         # Generate quote
         user_id = current_user.id if current_user else None
-        quote = await quote_service.generate_quote(request, user_id)
+        quote = await _quote_service.generate_quote(request, user_id)
         
-        # Save to database
-        await db.quotes.insert_one(quote.dict())
+        # Save to database (unset optional fields are left out of the document)
+        await db.quotes.insert_one(quote.dict(exclude_none=True))
         
         # Process and return response
-        response = quote_service.process_quote_response(quote)
+        response = _quote_service.process_quote_response(quote)
         
         return response
         
@@ -59,21 +91,16 @@ async def get_user_quotes(
     
     # Find user's quotes
     quotes_cursor = db.quotes.find(
-        {"user_id": current_user.id}
+        {"user_id": current_user.id},
+        QUOTE_LIST_PROJECTION
     ).sort("created_at", -1).limit(limit).skip(skip)
     
     quotes_data = await quotes_cursor.to_list(length=limit)
     
     # Convert to Quote objects and process responses
-    quote_service = QuoteService()
-    responses = []
-    
-    for quote_data in quotes_data:
-        quote = Quote(**quote_data)
-        response = quote_service.process_quote_response(quote)
-        responses.append(response)
+    quotes = _QUOTE_LIST_ADAPTER.validate_python(quotes_data)
     
-    return responses
+    return [_quote_service.process_quote_response(quote) for quote in quotes]
 
 @router.get("/{quote_id}", response_model=QuoteResponse)
 async def get_quote(
@@ -83,26 +110,19 @@ async def get_quote(
 ):
     """Get a specific quote by ID."""
     
-    # Find quote
-    quote_data = await db.quotes.find_one({"id": quote_id})
+    # Find quote, folding the access check into the filter
+    query = {"id": quote_id}
+    if current_user:
+        query["$or"] = [{"user_id": None}, {"user_id": current_user.id}]
+    
+    quote_data = await db.quotes.find_one(query)
     if not quote_data:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Quote not found"
-        )
+        await _raise_quote_lookup_error(db, quote_id)
     
     quote = Quote(**quote_data)
     
-    # Check if user has access to this quote
-    if quote.user_id and current_user and quote.user_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied"
-        )
-    
     # Process and return response
-    quote_service = QuoteService()
-    response = quote_service.process_quote_response(quote)
+    response = _quote_service.process_quote_response(quote)
     
     return response
 
@@ -114,30 +134,11 @@ async def delete_quote(
 ):
     """Delete a quote."""
     
-    # Find and verify ownership
-    quote_data = await db.quotes.find_one({"id": quote_id})
-    if not quote_data:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Quote not found"
-        )
-    
-    quote = Quote(**quote_data)
-    
-    if quote.user_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied"
-        )
-    
-    # Delete quote
-    result = await db.quotes.delete_one({"id": quote_id})
+    # Delete only if owned by the current user
+    result = await db.quotes.delete_one({"id": quote_id, "user_id": current_user.id})
     
     if result.deleted_count == 0:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Quote not found"
-        )
+        await _raise_quote_lookup_error(db, quote_id)
     
     return {"message": "Quote deleted successfully"}
 
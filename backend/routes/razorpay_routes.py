@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi.responses import ORJSONResponse
 from typing import Dict, Any
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from pydantic import BaseModel
@@ -8,8 +9,8 @@ import hashlib
 from models.user import User
 from services.razorpay_service import RazorpayService
 from utils.auth import get_current_user
-import json
 import logging
+import orjson
 
 logger = logging.getLogger(__name__)
 
@@ -196,7 +197,7 @@ async def verify_payment(
             detail=f"Payment verification failed: {str(e)}"
         )
 
-@router.post("/webhooks/razorpay")
+@router.post("/webhooks/razorpay", response_class=ORJSONResponse)
 async def razorpay_webhook(
     request: Request,
     db: AsyncIOMotorDatabase = Depends(get_database)
@@ -218,7 +219,7 @@ async def razorpay_webhook(
             )
         
         # Parse webhook payload
-        webhook_data = json.loads(payload.decode())
+        webhook_data = orjson.loads(payload)
         event_type = webhook_data.get("event", "")
         
         # Process webhook event
@@ -1,10 +1,21 @@
-from typing import List, Optional, Dict, Any, Tuple
+from typing import AsyncIterator, List, Optional, Dict, Any, Tuple
 from datetime import datetime
 import re
+import time
+import asyncio
 import csv
 import io
 import json
+import logging
+from collections import Counter
+from itertools import islice
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from config import config
+from utils.cache import TTLCache
+from utils.search import literal_search_conditions
 
 from models.blog import (
     BlogPost, BlogPostCreate, BlogPostUpdate, BlogPostResponse,
@@ -12,6 +23,40 @@ from models.blog import (
     SEOSettings, SEOPage, PostStatus, PostCategory
 )
 
+logger = logging.getLogger(__name__)
+
+# Free-text fields matched by the blog search box; tags are matched by prefix
+POST_SEARCH_FIELDS = ("title", "excerpt", "content")
+
+# Slug normalisation: drop punctuation, then collapse separators into dashes
+_SLUG_STRIP = re.compile(r'[^\w\s-]')
+_SLUG_DASH = re.compile(r'[\s_-]+')
+
+# Rows written per bulk_write round trip during CSV imports
+CSV_IMPORT_CHUNK_SIZE = 500
+
+# Minimum gap between progress writes while a CSV import is running
+CSV_PROGRESS_INTERVAL_SECONDS = 1.0
+
+# Rows per chunk yielded by the streaming CSV export
+CSV_EXPORT_BATCH_SIZE = 1000
+
+# Only the columns written by export_to_csv are read from the database
+SHIPMENT_EXPORT_PROJECTION = {
+    "_id": 0, "id": 1, "shipment_number": 1, "status": 1, "sender.name": 1,
+    "recipient.name": 1, "carrier_info.carrier_name": 1, "payment_info.amount": 1,
+    "created_at": 1
+}
+USER_EXPORT_FIELDS = ("id", "first_name", "last_name", "email", "user_type", "is_active", "created_at")
+USER_EXPORT_PROJECTION = {"_id": 0, **{field: 1 for field in USER_EXPORT_FIELDS}}
+
+# Collection each importable entity type is written to
+IMPORT_COLLECTIONS = {"shipments": "shipments", "users": "users", "rates": "carrier_rates"}
+
+# SEO config changes rarely; writes through this service invalidate these
+_seo_settings_cache = TTLCache(60, 1)
+_page_seo_cache = TTLCache(60, 1024)
+
 class BlogService:
     def __init__(self):
         pass
@@ -20,25 +65,45 @@ class BlogService:
     
     def _generate_slug(self, title: str) -> str:
         """Generate URL-friendly slug from title."""
-        slug = re.sub(r'[^\w\s-]', '', title.lower())
-        slug = re.sub(r'[\s_-]+', '-', slug)
-        return slug.strip('-')
+        return _SLUG_DASH.sub('-', _SLUG_STRIP.sub('', title.lower())).strip('-')
     
-    async def create_blog_post(self, post_data: BlogPostCreate, author_id: str, author_name: str, db: AsyncIOMotorDatabase) -> BlogPost:
-        """Create a new blog post."""
+    def _first_free_slug(self, original_slug: str, taken: set) -> str:
+        """Return the slug itself, or its lowest numbered variant not in taken."""
+        slug = original_slug
+        counter = 0
+        while slug in taken:
+            counter += 1
+            slug = f"{original_slug}-{counter}"
+        return slug
+    
+    async def _taken_slugs(self, original_slug: str, db: AsyncIOMotorDatabase,
+                           exclude_post_id: Optional[str] = None) -> set:
+        """Fetch the slug and its numbered variants already in use, in one round trip."""
+        query = {"slug": {"$regex": f"^{re.escape(original_slug)}(-\\d+)?$"}}
+        if exclude_post_id is not None:
+            query["id"] = {"$ne": exclude_post_id}
+        existing = await db.blog_posts.find(query, {"_id": 0, "slug": 1}).to_list(None)
+        return {post["slug"] for post in existing}
+    
+    async def create_blog_post(self, post_data: BlogPostCreate, author_id: str, author_name: str, db: AsyncIOMotorDatabase,
+                               taken_slugs: Optional[set] = None) -> BlogPost:
+        """Create a new blog post.
+        
+        Callers creating many posts can pass taken_slugs, preloaded once with
+        blog_posts.distinct("slug"), to skip the per-post slug lookup; the
+        chosen slug is added to it.
+        """
         
         # Generate slug if not provided
         slug = post_data.slug or self._generate_slug(post_data.title)
         
-        # Ensure slug is unique
-        existing_post = await db.blog_posts.find_one({"slug": slug})
-        if existing_post:
-            counter = 1
-            original_slug = slug
-            while existing_post:
-                slug = f"{original_slug}-{counter}"
-                existing_post = await db.blog_posts.find_one({"slug": slug})
-                counter += 1
+        # Ensure slug is unique: take the lowest free numbered suffix
+        original_slug = slug
+        if taken_slugs is None:
+            taken = await self._taken_slugs(original_slug, db)
+        else:
+            taken = taken_slugs
+        slug = self._first_free_slug(original_slug, taken)
         
         # Set published_at if status is published
         published_at = None
@@ -47,7 +112,8 @@ class BlogService:
         elif post_data.status == PostStatus.SCHEDULED and post_data.scheduled_for:
             published_at = post_data.scheduled_for
         
-        blog_post = BlogPost(
+        # post_data was validated as BlogPostCreate; skip a second validation pass
+        blog_post = BlogPost.model_construct(
             **post_data.dict(exclude={'slug'}),
             slug=slug,
             author_id=author_id,
@@ -55,8 +121,17 @@ class BlogService:
             published_at=published_at
         )
         
-        await db.blog_posts.insert_one(blog_post.dict())
-        return blog_post
+        # The unique slug index settles races with concurrent creates
+        while True:
+            try:
+                await db.blog_posts.insert_one(blog_post.dict())
+                taken.add(blog_post.slug)
+                return blog_post
+            except DuplicateKeyError as e:
+                if "slug" not in (e.details or {}).get("keyPattern", {}):
+                    raise
+                taken.add(blog_post.slug)
+                blog_post.slug = self._first_free_slug(original_slug, taken)
     
     async def get_blog_posts(self, 
                            db: AsyncIOMotorDatabase,
@@ -85,25 +160,33 @@ class BlogService:
             query["featured"] = True
         
         # Search filter
-        if search:
-            query["$or"] = [
-                {"title": {"$regex": search, "$options": "i"}},
-                {"excerpt": {"$regex": search, "$options": "i"}},
-                {"content": {"$regex": search, "$options": "i"}},
-                {"tags": {"$regex": search, "$options": "i"}}
+        projection = None
+        sort = [
+            ("sticky", -1),  # Sticky posts first
+            ("published_at", -1)  # Then by publish date
+        ]
+        if search and config.BLOG_REGEX_SEARCH:
+            query["$or"] = literal_search_conditions(POST_SEARCH_FIELDS, search) + [
+                # Tags are stored lowercased, so an anchored prefix can use the tags index
+                {"tags": {"$regex": f"^{re.escape(search.strip().lower())}"}}
             ]
+        elif search:
+            # Served by the weighted blog_text index, best matches first
+            query["$text"] = {"$search": search}
+            projection = {"score": {"$meta": "textScore"}}
+            sort = [("sticky", -1), ("score", {"$meta": "textScore"})]
         
         # Get posts
-        cursor = db.blog_posts.find(query).sort([
-            ("sticky", -1),  # Sticky posts first
-            ("published_at", -1)  # Then by publish date
-        ]).skip(skip).limit(limit)
+        cursor = db.blog_posts.find(query, projection).sort(sort).skip(skip).limit(limit)
         
-        posts_data = await cursor.to_list(length=limit)
-        total_count = await db.blog_posts.count_documents(query)
+        # Page and total are independent, so fetch them concurrently
+        posts_data, total_count = await asyncio.gather(
+            cursor.to_list(length=limit),
+            db.blog_posts.count_documents(query)
+        )
         
         # Convert to response format
-        posts = [BlogPostResponse(**post) for post in posts_data]
+        posts = [BlogPostResponse.from_document(post) for post in posts_data]
         
         return posts, total_count
     
@@ -122,7 +205,7 @@ class BlogService:
             )
             post_data["view_count"] += 1
         
-        return BlogPostResponse(**post_data)
+        return BlogPostResponse.from_document(post_data)
     
     async def update_blog_post(self, post_id: str, update_data: BlogPostUpdate, db: AsyncIOMotorDatabase) -> Optional[BlogPost]:
         """Update a blog post."""
@@ -130,25 +213,46 @@ class BlogService:
         update_dict = {k: v for k, v in update_data.dict().items() if v is not None}
         update_dict["updated_at"] = datetime.utcnow()
         
-        # Handle slug update
+        # Handle slug update; the post's own slug doesn't count as taken
+        original_slug = None
         if "title" in update_dict and "slug" not in update_dict:
-            update_dict["slug"] = self._generate_slug(update_dict["title"])
+            original_slug = self._generate_slug(update_dict["title"])
         elif "slug" in update_dict:
-            update_dict["slug"] = self._generate_slug(update_dict["slug"])
+            original_slug = self._generate_slug(update_dict["slug"])
+        if original_slug is not None:
+            taken = await self._taken_slugs(original_slug, db, exclude_post_id=post_id)
+            update_dict["slug"] = self._first_free_slug(original_slug, taken)
         
-        # Handle status change to published
-        if update_dict.get("status") == PostStatus.PUBLISHED:
-            existing_post = await db.blog_posts.find_one({"id": post_id})
-            if existing_post and existing_post.get("status") != PostStatus.PUBLISHED:
-                update_dict["published_at"] = datetime.utcnow()
-        
-        result = await db.blog_posts.update_one(
-            {"id": post_id},
-            {"$set": update_dict}
-        )
+        # Pipeline update so values are $literal-wrapped (user text starting with
+        # "$" would otherwise be read as a field path)
+        new_values = {key: {"$literal": value} for key, value in update_dict.items()}
         
-        if result.modified_count:
-            updated_data = await db.blog_posts.find_one({"id": post_id})
+        # Handle status change to published: stamp published_at only on the
+        # transition, judged against the stored status in the same write
+        if update_dict.get("status") == PostStatus.PUBLISHED:
+            new_values["published_at"] = {"$cond": [
+                {"$ne": ["$status", PostStatus.PUBLISHED.value]},
+                "$$NOW",
+                "$published_at"
+            ]}
+        
+        # The unique slug index settles races with concurrent writes
+        while True:
+            try:
+                updated_data = await db.blog_posts.find_one_and_update(
+                    {"id": post_id},
+                    [{"$set": new_values}],
+                    return_document=ReturnDocument.AFTER
+                )
+                break
+            except DuplicateKeyError as e:
+                if original_slug is None or "slug" not in (e.details or {}).get("keyPattern", {}):
+                    raise
+                taken.add(update_dict["slug"])
+                update_dict["slug"] = self._first_free_slug(original_slug, taken)
+                new_values["slug"] = {"$literal": update_dict["slug"]}
+        
+        if updated_data:
             return BlogPost(**updated_data)
         
         return None
@@ -175,6 +279,24 @@ class BlogService:
         
         return comment
     
+    async def create_comments_bulk(self, comments_data: List[CommentCreate], db: AsyncIOMotorDatabase) -> List[Comment]:
+        """Create many comments with one insert and one counter bump per post."""
+        
+        if not comments_data:
+            return []
+        
+        comments = [Comment(**comment_data.dict()) for comment_data in comments_data]
+        await db.comments.insert_many([comment.dict() for comment in comments])
+        
+        # Increment comment counts, one $inc per post
+        comment_counts = Counter(comment.post_id for comment in comments)
+        await db.blog_posts.bulk_write([
+            UpdateOne({"id": post_id}, {"$inc": {"comment_count": count}})
+            for post_id, count in comment_counts.items()
+        ], ordered=False)
+        
+        return comments
+    
     async def get_comments(self, post_id: str, db: AsyncIOMotorDatabase, status: str = "approved") -> List[Comment]:
         """Get comments for a post."""
         
@@ -235,49 +357,97 @@ class BlogService:
                 "current_step": "Reading CSV file"
             }, db)
             
-            # Parse CSV
+            # Parse CSV lazily; the line count is only an estimate of the row
+            # count since quoted fields may span lines
             csv_reader = csv.DictReader(io.StringIO(csv_content))
-            rows = list(csv_reader)
-            results["total_records"] = len(rows)
+            estimated_total = max(csv_content.count('\n') - 1, 0)
+            results["total_records"] = estimated_total
             
             # Update progress
             await self.update_bulk_operation(operation_id, {
-                "total_records": len(rows),
+                "total_records": estimated_total,
                 "current_step": f"Processing {entity_type} records"
             }, db)
             
-            # Process each row based on entity type
-            for i, row in enumerate(rows):
-                try:
-                    if entity_type == "shipments":
-                        await self._process_shipment_row(row, db)
-                    elif entity_type == "users":
-                        await self._process_user_row(row, db)
-                    elif entity_type == "rates":
-                        await self._process_rate_row(row, db)
-                    
-                    results["success_count"] += 1
+            # Validate rows a chunk at a time and write each chunk in one bulk_write
+            row_processors = {
+                "shipments": self._process_shipment_row,
+                "users": self._process_user_row,
+                "rates": self._process_rate_row
+            }
+            process_row = row_processors.get(entity_type)
+            
+            processed = 0
+            last_progress_at = time.monotonic()
+            while True:
+                chunk = list(islice(csv_reader, CSV_IMPORT_CHUNK_SIZE))
+                if not chunk:
+                    break
+                start = processed
+                chunk_errors = []
+                operations = []
+                operation_rows = []
+                
+                # Validators may query the database, so run a chunk's rows concurrently
+                if process_row:
+                    documents = await asyncio.gather(
+                        *(process_row(row, db) for row in chunk),
+                        return_exceptions=True
+                    )
+                else:
+                    documents = [None] * len(chunk)
+                
+                for row_number, (row, document) in enumerate(zip(chunk, documents), start + 1):
+                    if isinstance(document, Exception):
+                        chunk_errors.append({
+                            "row": row_number,
+                            "error": str(document),
+                            "data": row
+                        })
+                        continue
                     
-                except Exception as row_error:
-                    results["error_count"] += 1
-                    results["errors"].append({
-                        "row": i + 1,
-                        "error": str(row_error),
-                        "data": row
-                    })
+                    if document is not None:
+                        operations.append(InsertOne(document))
+                        operation_rows.append((row_number, row))
                 
-                # Update progress
-                progress = ((i + 1) / len(rows)) * 100
+                if operations:
+                    try:
+                        await db[IMPORT_COLLECTIONS[entity_type]].bulk_write(operations, ordered=False)
+                    except BulkWriteError as bulk_error:
+                        for write_error in bulk_error.details.get("writeErrors", []):
+                            row_number, row = operation_rows[write_error["index"]]
+                            chunk_errors.append({
+                                "row": row_number,
+                                "error": write_error.get("errmsg", "Write failed"),
+                                "data": row
+                            })
+                
+                results["error_count"] += len(chunk_errors)
+                results["success_count"] += len(chunk) - len(chunk_errors)
+                results["errors"].extend(chunk_errors)
+                
+                # Update progress, at most once per interval on fast imports
+                processed = start + len(chunk)
+                if time.monotonic() - last_progress_at < CSV_PROGRESS_INTERVAL_SECONDS:
+                    continue
+                last_progress_at = time.monotonic()
                 await self.update_bulk_operation(operation_id, {
-                    "processed_records": i + 1,
-                    "progress_percentage": progress,
+                    "processed_records": processed,
+                    "progress_percentage": (processed / max(estimated_total, processed)) * 100,
                     "success_count": results["success_count"],
                     "error_count": results["error_count"]
                 }, db)
             
+            results["total_records"] = processed
+            
             # Mark as completed
             await self.update_bulk_operation(operation_id, {
                 "status": "completed",
+                "total_records": processed,
+                "processed_records": processed,
+                "progress_percentage": 100,
+                "success_count": results["success_count"],
+                "error_count": results["error_count"],
                 "completed_at": datetime.utcnow(),
                 "current_step": "Completed",
                 "summary": results
@@ -300,110 +470,127 @@ class BlogService:
         
         return results
     
-    async def _process_shipment_row(self, row: Dict[str, Any], db: AsyncIOMotorDatabase):
-        """Process a single shipment row from CSV."""
+    async def _process_shipment_row(self, row: Dict[str, Any], db: AsyncIOMotorDatabase) -> Optional[Dict[str, Any]]:
+        """Validate a single shipment row from CSV and return the document to insert."""
         # Implementation would depend on CSV format
         # This is a placeholder for actual shipment creation logic
         pass
     
-    async def _process_user_row(self, row: Dict[str, Any], db: AsyncIOMotorDatabase):
-        """Process a single user row from CSV."""
+    async def _process_user_row(self, row: Dict[str, Any], db: AsyncIOMotorDatabase) -> Optional[Dict[str, Any]]:
+        """Validate a single user row from CSV and return the document to insert."""
         # Implementation would depend on CSV format
         # This is a placeholder for actual user creation logic
         pass
     
-    async def _process_rate_row(self, row: Dict[str, Any], db: AsyncIOMotorDatabase):
-        """Process a single rate row from CSV."""
+    async def _process_rate_row(self, row: Dict[str, Any], db: AsyncIOMotorDatabase) -> Optional[Dict[str, Any]]:
+        """Validate a single rate row from CSV and return the document to insert."""
         # Implementation would depend on CSV format
         # This is a placeholder for actual rate creation logic
         pass
     
-    async def export_to_csv(self, entity_type: str, filters: Dict[str, Any], db: AsyncIOMotorDatabase) -> str:
-        """Export data to CSV format."""
-        
-        output = io.StringIO()
+    async def export_to_csv(self, entity_type: str, filters: Dict[str, Any], db: AsyncIOMotorDatabase) -> AsyncIterator[str]:
+        """Export data to CSV format, yielding the file a batch of rows at a time."""
         
         if entity_type == "shipments":
             # Export shipments
-            cursor = db.shipments.find(filters)
-            shipments = await cursor.to_list(length=10000)
+            cursor = db.shipments.find(filters, SHIPMENT_EXPORT_PROJECTION)
+            fieldnames = ["id", "shipment_number", "status", "sender_name", "recipient_name", 
+                         "carrier", "cost", "created_at"]
             
-            if shipments:
-                fieldnames = ["id", "shipment_number", "status", "sender_name", "recipient_name", 
-                             "carrier", "cost", "created_at"]
-                writer = csv.DictWriter(output, fieldnames=fieldnames)
-                writer.writeheader()
-                
-                for shipment in shipments:
-                    writer.writerow({
-                        "id": shipment.get("id"),
-                        "shipment_number": shipment.get("shipment_number"),
-                        "status": shipment.get("status"),
-                        "sender_name": shipment.get("sender", {}).get("name"),
-                        "recipient_name": shipment.get("recipient", {}).get("name"),
-                        "carrier": shipment.get("carrier_info", {}).get("carrier_name"),
-                        "cost": shipment.get("payment_info", {}).get("amount"),
-                        "created_at": shipment.get("created_at")
-                    })
+            def to_row(shipment):
+                return {
+                    "id": shipment.get("id"),
+                    "shipment_number": shipment.get("shipment_number"),
+                    "status": shipment.get("status"),
+                    "sender_name": shipment.get("sender", {}).get("name"),
+                    "recipient_name": shipment.get("recipient", {}).get("name"),
+                    "carrier": shipment.get("carrier_info", {}).get("carrier_name"),
+                    "cost": shipment.get("payment_info", {}).get("amount"),
+                    "created_at": shipment.get("created_at")
+                }
         
         elif entity_type == "users":
             # Export users
-            cursor = db.users.find(filters)
-            users = await cursor.to_list(length=10000)
+            fieldnames = list(USER_EXPORT_FIELDS)
+            cursor = db.users.find(filters, USER_EXPORT_PROJECTION)
             
-            if users:
-                fieldnames = ["id", "first_name", "last_name", "email", "user_type", 
-                             "is_active", "created_at"]
-                writer = csv.DictWriter(output, fieldnames=fieldnames)
-                writer.writeheader()
+            def to_row(user):
+                return {field: user.get(field) for field in fieldnames}
+        
+        else:
+            return
+        
+        output = io.StringIO()
+        writer = csv.DictWriter(output, fieldnames=fieldnames)
+        row_count = 0
+        
+        # Runs after the response has started, so failures can only be logged here
+        try:
+            async for document in cursor.limit(10000).batch_size(CSV_EXPORT_BATCH_SIZE):
+                if row_count == 0:
+                    writer.writeheader()
+                writer.writerow(to_row(document))
+                row_count += 1
                 
-                for user in users:
-                    writer.writerow({
-                        "id": user.get("id"),
-                        "first_name": user.get("first_name"),
-                        "last_name": user.get("last_name"),
-                        "email": user.get("email"),
-                        "user_type": user.get("user_type"),
-                        "is_active": user.get("is_active"),
-                        "created_at": user.get("created_at")
-                    })
-        
-        return output.getvalue()
+                if row_count % CSV_EXPORT_BATCH_SIZE == 0:
+                    yield output.getvalue()
+                    output.seek(0)
+                    output.truncate(0)
+        except Exception:
+            logger.exception(f"CSV export of {entity_type} failed after {row_count} rows")
+            raise
+        
+        if output.tell():
+            yield output.getvalue()
     
     # ===== SEO MANAGEMENT =====
     
     async def get_seo_settings(self, db: AsyncIOMotorDatabase) -> SEOSettings:
         """Get SEO settings."""
         
+        cached = _seo_settings_cache.get("settings")
+        if cached is not None:
+            return cached
+        
         settings_data = await db.seo_settings.find_one({})
         if settings_data:
-            return SEOSettings(**settings_data)
+            settings = SEOSettings(**settings_data)
         else:
             # Create default settings
-            default_settings = SEOSettings()
-            await db.seo_settings.insert_one(default_settings.dict())
-            return default_settings
+            settings = SEOSettings()
+            await db.seo_settings.insert_one(settings.dict())
+        
+        _seo_settings_cache.set("settings", settings)
+        return settings
     
     async def update_seo_settings(self, update_data: Dict[str, Any], db: AsyncIOMotorDatabase) -> SEOSettings:
         """Update SEO settings."""
         
         update_data["updated_at"] = datetime.utcnow()
         
-        await db.seo_settings.update_one(
+        settings_data = await db.seo_settings.find_one_and_update(
             {},
             {"$set": update_data},
-            upsert=True
+            upsert=True,
+            return_document=ReturnDocument.AFTER
         )
         
-        return await self.get_seo_settings(db)
+        settings = SEOSettings(**settings_data)
+        _seo_settings_cache.set("settings", settings)
+        return settings
     
     async def get_page_seo(self, page_path: str, db: AsyncIOMotorDatabase) -> Optional[SEOPage]:
         """Get SEO settings for a specific page."""
         
+        # Wrapped in a tuple so pages without overrides are cached too
+        cached = _page_seo_cache.get(page_path)
+        if cached is not None:
+            return cached[0]
+        
         page_data = await db.seo_pages.find_one({"page_path": page_path})
-        if page_data:
-            return SEOPage(**page_data)
-        return None
+        page = SEOPage(**page_data) if page_data else None
+        _page_seo_cache.set(page_path, (page,))
+        return page
     
     async def update_page_seo(self, page_path: str, seo_data: Dict[str, Any], db: AsyncIOMotorDatabase) -> SEOPage:
         """Update SEO settings for a specific page."""
@@ -411,14 +598,15 @@ class BlogService:
         seo_data["page_path"] = page_path
         seo_data["updated_at"] = datetime.utcnow()
         
-        await db.seo_pages.update_one(
+        updated_data = await db.seo_pages.find_one_and_update(
             {"page_path": page_path},
             {"$set": seo_data},
-            upsert=True
+            upsert=True,
+            return_document=ReturnDocument.AFTER
         )
-        
-        updated_data = await db.seo_pages.find_one({"page_path": page_path})
-        return SEOPage(**updated_data)
+        page = SEOPage(**updated_data)
+        _page_seo_cache.set(page_path, (page,))
+        return page
     
     async def generate_sitemap(self, base_url: str, db: AsyncIOMotorDatabase) -> str:
         """Generate XML sitemap."""
@@ -436,10 +624,12 @@ class BlogService:
         sitemap_entries.extend(static_pages)
         
         # Blog posts
-        cursor = db.blog_posts.find({"status": PostStatus.PUBLISHED})
-        posts = await cursor.to_list(length=10000)
+        cursor = db.blog_posts.find(
+            {"status": PostStatus.PUBLISHED},
+            {"_id": 0, "slug": 1, "updated_at": 1, "created_at": 1}
+        ).limit(10000).batch_size(1000)
         
-        for post in posts:
+        async for post in cursor:
             sitemap_entries.append({
                 "url": f"{base_url}/blog/{post['slug']}",
                 "priority": "0.7",
@@ -448,21 +638,23 @@ class BlogService:
             })
         
         # Generate XML
-        xml = '<?xml version="1.0" encoding="UTF-8"?>\n'
-        xml += '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+        parts = [
+            '<?xml version="1.0" encoding="UTF-8"?>\n',
+            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+        ]
         
         for entry in sitemap_entries:
-            xml += '  <url>\n'
-            xml += f'    <loc>{entry["url"]}</loc>\n'
-            xml += f'    <priority>{entry["priority"]}</priority>\n'
-            xml += f'    <changefreq>{entry["changefreq"]}</changefreq>\n'
+            parts.append('  <url>\n')
+            parts.append(f'    <loc>{entry["url"]}</loc>\n')
+            parts.append(f'    <priority>{entry["priority"]}</priority>\n')
+            parts.append(f'    <changefreq>{entry["changefreq"]}</changefreq>\n')
             if entry.get("lastmod"):
                 lastmod = entry["lastmod"]
                 if isinstance(lastmod, str):
                     lastmod = datetime.fromisoformat(lastmod)
-                xml += f'    <lastmod>{lastmod.strftime("%Y-%m-%d")}</lastmod>\n'
-            xml += '  </url>\n'
+                parts.append(f'    <lastmod>{lastmod.strftime("%Y-%m-%d")}</lastmod>\n')
+            parts.append('  </url>\n')
         
-        xml += '</urlset>'
+        parts.append('</urlset>')
         
-        return xml
\ No newline at end of file
+        return "".join(parts)
\ No newline at end of file
@@ -3,6 +3,7 @@ Enhanced Email Service for XFas Logistics using Zoho Mail
 Handles OTP emails, notifications, and general email communications
 """
 
+import asyncio
 import smtplib
 import imaplib
 import poplib
@@ -21,6 +22,19 @@ from config import config
 
 logger = logging.getLogger(__name__)
 
+# Messages sent over one SMTP session before it is recycled
+SMTP_MAX_MESSAGES_PER_CONNECTION = 100
+
+# What the OTP email asks the recipient to do, by purpose
+OTP_PURPOSE_TEXT = {
+    'registration': 'complete your registration',
+    'login': 'log in to your account',
+    'verify_email': 'verify your email address',
+    'verify_phone': 'verify your phone number',
+    'reset_password': 'reset your password',
+    'booking_confirmation': 'confirm your booking'
+}
+
 class EmailService:
     def __init__(self):
         self.smtp_host = config.SMTP_HOST
@@ -38,6 +52,12 @@ class EmailService:
         
         self.require_auth = config.REQUIRE_EMAIL_AUTH
         
+        # Persistent SMTP session reused across sends; only touched from
+        # worker threads while holding _smtp_lock
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._smtp_messages = 0
+        self._smtp_lock = asyncio.Lock()
+        
     def _validate_config(self) -> bool:
         """Validate email configuration."""
         if not self.smtp_user or not self.smtp_password:
@@ -108,13 +128,9 @@ class EmailService:
             if bcc:
                 recipients.extend(bcc)
             
-            # Send email
-            with smtplib.SMTP(self.smtp_host, self.smtp_port) as server:
-                if self.smtp_use_tls:
-                    server.starttls()
-                
-                server.login(self.smtp_user, self.smtp_password)
-                server.send_message(msg, to_addrs=recipients)
+            # Send email off the event loop, over the shared session
+            async with self._smtp_lock:
+                await asyncio.to_thread(self._send_message_sync, msg, recipients)
             
             logger.info(f"Email sent successfully to {to_email}")
             
@@ -135,6 +151,44 @@ class EmailService:
                 "subject": subject
             }
     
+    def _send_message_sync(self, msg: MIMEMultipart, recipients: List[str]):
+        """Send one message, opening or recycling the SMTP session as needed."""
+        if self._smtp is not None and self._smtp_messages >= SMTP_MAX_MESSAGES_PER_CONNECTION:
+            self._close_smtp_sync()
+        
+        for attempt in range(2):
+            if self._smtp is None:
+                server = smtplib.SMTP(self.smtp_host, self.smtp_port, timeout=30)
+                if self.smtp_use_tls:
+                    server.starttls()
+                server.login(self.smtp_user, self.smtp_password)
+                self._smtp = server
+                self._smtp_messages = 0
+            
+            try:
+                self._smtp.send_message(msg, to_addrs=recipients)
+                self._smtp_messages += 1
+                return
+            except smtplib.SMTPServerDisconnected:
+                # Idle sessions get dropped by the server; reconnect once
+                self._smtp = None
+                if attempt:
+                    raise
+    
+    def _close_smtp_sync(self):
+        """Quit the SMTP session if one is open."""
+        server, self._smtp = self._smtp, None
+        if server is not None:
+            try:
+                server.quit()
+            except (smtplib.SMTPException, OSError):
+                server.close()
+    
+    async def close(self):
+        """Release the persistent SMTP session."""
+        async with self._smtp_lock:
+            await asyncio.to_thread(self._close_smtp_sync)
+    
     def _add_attachment(self, msg: MIMEMultipart, attachment: Dict[str, Any]):
         """Add attachment to email message."""
         try:
@@ -181,14 +235,7 @@ class EmailService:
             Dict with success status and details
         """
         
-        purpose_text = {
-            'registration': 'complete your registration',
-            'login': 'log in to your account',
-            'verify_email': 'verify your email address',
-            'verify_phone': 'verify your phone number',
-            'reset_password': 'reset your password',
-            'booking_confirmation': 'confirm your booking'
-        }.get(purpose, 'verify your identity')
+        purpose_text = OTP_PURPOSE_TEXT.get(purpose, 'verify your identity')
         
         subject = f"XFas Logistics - OTP Verification ({purpose.replace('_', ' ').title()})"
         
@@ -1,9 +1,17 @@
+import hashlib
+import hmac
 import random
-import string
+import secrets
 import asyncio
+import time
+from collections import deque
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple, Callable, Awaitable
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+
+from config import config
+from utils.cache import TTLCache
 import smtplib
 import os
 from email.mime.text import MIMEText
@@ -12,14 +20,46 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Background OTP email delivery: queue bound and retry policy
+OTP_EMAIL_QUEUE_SIZE = 1000
+OTP_EMAIL_MAX_ATTEMPTS = 5
+OTP_EMAIL_MAX_BACKOFF_SECONDS = 300
+
+# Verification attempts allowed per identifier within the sliding window
+OTP_VERIFY_RATE_LIMIT = 5
+OTP_VERIFY_RATE_WINDOW_SECONDS = 60.0
+
+def _hash_otp(identifier: str, purpose: str, otp_code: str) -> str:
+    """Keyed digest of an OTP, so stored codes are useless without the server secret."""
+    message = f"{identifier}:{purpose}:{otp_code}".encode()
+    return hmac.new(config.OTP_HASH_SECRET.encode(), message, hashlib.sha256).hexdigest()
+
+def _is_transient_smtp_error(error: Exception) -> bool:
+    """Whether a failed send is worth retrying (4xx replies, dropped or timed out connections)."""
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return isinstance(error, (smtplib.SMTPServerDisconnected, TimeoutError, ConnectionError))
+
 class OTPService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
         self.otp_expiry_minutes = 10
         
+        # OTP emails are delivered by a background worker so request
+        # handlers never wait on SMTP
+        self.email_queue: asyncio.Queue = asyncio.Queue(maxsize=OTP_EMAIL_QUEUE_SIZE)
+        self._email_worker_task: Optional[asyncio.Task] = None
+        
+        # Recent verify timestamps per identifier; idle identifiers age out
+        self._verify_hits = TTLCache(OTP_VERIFY_RATE_WINDOW_SECONDS, 10000)
+        
+        # In-flight OTP issues by (operation, identifier, purpose); concurrent
+        # duplicate requests share one result instead of issuing again
+        self._inflight: Dict[Tuple[str, str, str], asyncio.Future] = {}
+        
     def generate_otp(self, length: int = 6) -> str:
-        """Generate a random OTP code."""
-        return ''.join(random.choices(string.digits, k=length))
+        """Generate a random OTP code from the OS CSPRNG."""
+        return f"{secrets.randbelow(10 ** length):0{length}d}"
     
     async def create_otp(self, identifier: str, purpose: str, identifier_type: str = "email") -> Dict[str, Any]:
         """
@@ -30,37 +70,103 @@ class OTPService:
             purpose: Purpose of OTP (registration, login, verify_email, verify_phone)
             identifier_type: Type of identifier (email or phone)
         """
-        otp_code = self.generate_otp()
-        expires_at = datetime.utcnow() + timedelta(minutes=self.otp_expiry_minutes)
+        return await self._singleflight(
+            ("create", identifier, purpose),
+            lambda: self._create_otp(identifier, purpose, identifier_type)
+        )
+    
+    async def _create_otp(self, identifier: str, purpose: str, identifier_type: str) -> Dict[str, Any]:
+        otp_code, otp_document = self._new_otp(identifier, purpose, identifier_type)
+        await self._persist_otp(otp_document)
         
-        otp_document = {
-            "identifier": identifier,
-            "identifier_type": identifier_type,
+        return {
             "otp_code": otp_code,
-            "purpose": purpose,
-            "expires_at": expires_at,
-            "created_at": datetime.utcnow(),
-            "is_used": False,
-            "attempts": 0,
-            "max_attempts": 3
+            "expires_at": otp_document["expires_at"],
+            "identifier": identifier,
+            "purpose": purpose
         }
+    
+    async def create_and_send_otp(self, identifier: str, purpose: str, identifier_type: str = "email") -> Dict[str, Any]:
+        """
+        Create an OTP and deliver it, storing and sending concurrently.
         
-        # Remove any existing unused OTPs for this identifier and purpose
-        await self.db.otps.delete_many({
-            "identifier": identifier,
-            "purpose": purpose,
-            "is_used": False
-        })
+        Args:
+            identifier: Email address or phone number
+            purpose: Purpose of OTP (registration, login, verify_email, verify_phone)
+            identifier_type: Type of identifier (email or phone)
+            
+        Returns:
+            Dict like create_otp's, plus a "sent" flag; raises if the OTP could not be stored
+        """
+        return await self._singleflight(
+            ("create_and_send", identifier, purpose),
+            lambda: self._create_and_send_otp(identifier, purpose, identifier_type)
+        )
+    
+    async def _create_and_send_otp(self, identifier: str, purpose: str, identifier_type: str) -> Dict[str, Any]:
+        otp_code, otp_document = self._new_otp(identifier, purpose, identifier_type)
         
-        # Store the new OTP
-        await self.db.otps.insert_one(otp_document)
+        # The code is known up front, so the write and the delivery can overlap
+        _, sent = await asyncio.gather(
+            self._persist_otp(otp_document),
+            self._dispatch_otp(identifier, otp_code, purpose, identifier_type)
+        )
         
         return {
             "otp_code": otp_code,
-            "expires_at": expires_at,
+            "expires_at": otp_document["expires_at"],
             "identifier": identifier,
-            "purpose": purpose
+            "purpose": purpose,
+            "sent": sent
+        }
+    
+    async def _singleflight(self, key: Tuple[str, str, str], operation: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Run operation once for concurrent callers with the same key, sharing its result."""
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(operation())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        
+        # Shielded so one caller disconnecting doesn't cancel the others' issue
+        return await asyncio.shield(future)
+    
+    def _new_otp(self, identifier: str, purpose: str, identifier_type: str) -> Tuple[str, Dict[str, Any]]:
+        """Generate a code and the document that stores it."""
+        otp_code = self.generate_otp()
+        now = datetime.utcnow()
+        
+        otp_document = {
+            "identifier": identifier,
+            "identifier_type": identifier_type,
+            "otp_hash": _hash_otp(identifier, purpose, otp_code),
+            "purpose": purpose,
+            "expires_at": now + timedelta(minutes=self.otp_expiry_minutes),
+            "created_at": now,
+            "is_used": False,
+            "attempts": 0,
+            "max_attempts": 3
         }
+        return otp_code, otp_document
+    
+    async def _persist_otp(self, otp_document: Dict[str, Any]):
+        """Store an OTP, replacing any unused one for the same identifier and purpose."""
+        await self.db.otps.update_one(
+            {
+                "identifier": otp_document["identifier"],
+                "purpose": otp_document["purpose"],
+                "is_used": False
+            },
+            # Drop the plaintext code left by OTPs issued before hashing
+            {"$set": otp_document, "$unset": {"otp_code": ""}},
+            upsert=True
+        )
+    
+    async def _dispatch_otp(self, identifier: str, otp_code: str, purpose: str, identifier_type: str) -> bool:
+        """Send an OTP over the channel matching the identifier type."""
+        if identifier_type == "phone":
+            return await self.send_sms_otp(identifier, otp_code, purpose)
+        return await self.send_email_otp(identifier, otp_code, purpose)
     
     async def verify_otp(self, identifier: str, otp_code: str, purpose: str) -> Dict[str, Any]:
         """
@@ -74,12 +180,41 @@ class OTPService:
         Returns:
             Dict with verification result
         """
-        # Find the OTP
-        otp_doc = await self.db.otps.find_one({
-            "identifier": identifier,
-            "purpose": purpose,
-            "is_used": False
-        })
+        # Throttle per identifier before touching the database
+        if self._verify_rate_limited(identifier):
+            return {
+                "success": False,
+                "error": "Too many verification attempts, please try again later"
+            }
+        
+        # Check and consume the OTP in one atomic write; every condition is
+        # judged against the stored document, so concurrent submissions of
+        # the right code cannot both succeed
+        now = datetime.utcnow()
+        expired = {"$gt": [now, "$expires_at"]}
+        exhausted = {"$gte": ["$attempts", "$max_attempts"]}
+        matched = {"$eq": ["$otp_hash", {"$literal": _hash_otp(identifier, purpose, otp_code)}]}
+        verified = {"$and": [{"$not": [expired]}, {"$not": [exhausted]}, matched]}
+        settled = {"$or": [expired, exhausted, matched]}
+        
+        otp_doc = await self.db.otps.find_one_and_update(
+            {
+                "identifier": identifier,
+                "purpose": purpose,
+                "is_used": False
+            },
+            [{"$set": {
+                # Expired, exhausted and correctly answered OTPs are all spent
+                "is_used": settled,
+                # Only a wrong guess on a live OTP counts as an attempt. It is
+                # counted in this same write, not deferred to a batch, so a burst
+                # of guesses can never get past max_attempts
+                "attempts": {"$cond": [settled, "$attempts", {"$add": ["$attempts", 1]}]},
+                "verified_at": {"$cond": [verified, now, "$$REMOVE"]}
+            }}],
+            projection={"_id": 0, "is_used": 1, "verified_at": 1, "expires_at": 1},
+            return_document=ReturnDocument.AFTER
+        )
         
         if not otp_doc:
             return {
@@ -87,53 +222,47 @@ class OTPService:
                 "error": "OTP not found or already used"
             }
         
-        # Check if OTP is expired
-        if datetime.utcnow() > otp_doc["expires_at"]:
-            await self.db.otps.update_one(
-                {"_id": otp_doc["_id"]},
-                {"$set": {"is_used": True}}
-            )
+        if otp_doc.get("verified_at"):
             return {
-                "success": False,
-                "error": "OTP has expired"
+                "success": True,
+                "message": "OTP verified successfully"
             }
         
-        # Check attempts
-        if otp_doc["attempts"] >= otp_doc["max_attempts"]:
-            await self.db.otps.update_one(
-                {"_id": otp_doc["_id"]},
-                {"$set": {"is_used": True}}
-            )
+        # Otherwise report why it was rejected: expiry first, then spent attempts
+        if now > otp_doc["expires_at"]:
             return {
                 "success": False,
-                "error": "Maximum verification attempts exceeded"
+                "error": "OTP has expired"
             }
         
-        # Verify OTP code
-        if otp_doc["otp_code"] != otp_code:
-            await self.db.otps.update_one(
-                {"_id": otp_doc["_id"]},
-                {"$inc": {"attempts": 1}}
-            )
+        if otp_doc["is_used"]:
             return {
                 "success": False,
-                "error": "Invalid OTP code"
+                "error": "Maximum verification attempts exceeded"
             }
         
-        # Mark OTP as used
-        await self.db.otps.update_one(
-            {"_id": otp_doc["_id"]},
-            {"$set": {"is_used": True, "verified_at": datetime.utcnow()}}
-        )
-        
         return {
-            "success": True,
-            "message": "OTP verified successfully"
+            "success": False,
+            "error": "Invalid OTP code"
         }
     
+    def _verify_rate_limited(self, identifier: str) -> bool:
+        """Record a verification attempt, returning True if the identifier is over its limit."""
+        now = time.monotonic()
+        hits = self._verify_hits.get(identifier) or deque()
+        while hits and hits[0] <= now - OTP_VERIFY_RATE_WINDOW_SECONDS:
+            hits.popleft()
+        
+        if len(hits) >= OTP_VERIFY_RATE_LIMIT:
+            return True
+        
+        hits.append(now)
+        self._verify_hits.set(identifier, hits)
+        return False
+    
     async def send_email_otp(self, email: str, otp_code: str, purpose: str) -> bool:
         """
-        Send OTP via email using the enhanced email service.
+        Queue an OTP email for background delivery.
         
         Args:
             email: Recipient email address
@@ -141,25 +270,71 @@ class OTPService:
             purpose: Purpose of the OTP
             
         Returns:
-            Boolean indicating success
+            Boolean indicating the email was accepted for delivery
         """
+        from services.email_service import email_service
+        
+        if not email_service._validate_config():
+            return False
+        
+        return self._enqueue_email({
+            "email": email,
+            "otp_code": otp_code,
+            "purpose": purpose,
+            "attempt": 0,
+            "next_retry_at": None
+        })
+    
+    def _enqueue_email(self, item: Dict[str, Any]) -> bool:
+        """Put an email on the delivery queue, starting the worker if needed."""
+        if self._email_worker_task is None or self._email_worker_task.done():
+            self._email_worker_task = asyncio.create_task(self._email_worker())
+        
         try:
-            from services.email_service import email_service
-            
-            # Send OTP using the enhanced email service
-            result = await email_service.send_otp_email(email, otp_code, purpose)
-            
-            if result['success']:
-                logger.info(f"OTP email sent successfully to {email}")
-                return True
-            else:
-                logger.error(f"Failed to send OTP email to {email}: {result.get('error', 'Unknown error')}")
-                return False
-            
-        except Exception as e:
-            logger.error(f"Failed to send OTP email: {str(e)}")
+            self.email_queue.put_nowait(item)
+            return True
+        except asyncio.QueueFull:
+            logger.error(f"OTP email queue full, dropping email to {item['email']}")
             return False
     
+    async def _email_worker(self):
+        """Deliver queued OTP emails, retrying transient SMTP failures."""
+        while True:
+            item = await self.email_queue.get()
+            try:
+                await self._deliver_email_otp(item["email"], item["otp_code"], item["purpose"])
+                logger.info(f"OTP email sent successfully to {item['email']}")
+            except Exception as e:
+                self._schedule_email_retry(item, e)
+            finally:
+                self.email_queue.task_done()
+    
+    def _schedule_email_retry(self, item: Dict[str, Any], error: Exception):
+        """Re-queue a failed email with exponential backoff, or give up on it."""
+        attempt = item["attempt"] + 1
+        if not _is_transient_smtp_error(error) or attempt >= OTP_EMAIL_MAX_ATTEMPTS:
+            logger.error(f"Failed to send OTP email to {item['email']} after {attempt} attempt(s): {str(error)}")
+            return
+        
+        delay = min(2 ** attempt + random.random() * 0.5, OTP_EMAIL_MAX_BACKOFF_SECONDS)
+        logger.warning(f"OTP email to {item['email']} failed ({str(error)}), retrying in {delay:.1f}s")
+        retry_item = {**item, "attempt": attempt, "next_retry_at": datetime.utcnow() + timedelta(seconds=delay)}
+        asyncio.get_running_loop().call_later(delay, self._enqueue_email, retry_item)
+    
+    async def _deliver_email_otp(self, email: str, otp_code: str, purpose: str):
+        """Send one OTP email through the email service; raises if delivery fails."""
+        from services.email_service import email_service
+        
+        result = await email_service.send_otp_email(email, otp_code, purpose)
+        if not result['success']:
+            raise RuntimeError(result.get('error', 'Unknown error'))
+    
+    async def close(self):
+        """Stop the email worker."""
+        if self._email_worker_task is not None:
+            self._email_worker_task.cancel()
+            self._email_worker_task = None
+    
     async def send_sms_otp(self, phone: str, otp_code: str, purpose: str) -> bool:
         """
         Send OTP via SMS using the SMS service.
@@ -187,26 +362,16 @@ class OTPService:
             # Send SMS using the SMS service
             result = await sms_service.send_sms(phone, sms_text)
             
-            if result['success']:
-                logger.info(f"SMS OTP sent successfully to {phone} via {result['provider']}")
+            if result.success:
+                logger.info(f"SMS OTP sent successfully to {phone} via {result.provider}")
                 return True
             else:
-                logger.error(f"Failed to send SMS OTP to {phone}: {result.get('error', 'Unknown error')}")
+                logger.error(f"Failed to send SMS OTP to {phone}: {result.error or 'Unknown error'}")
                 return False
             
         except Exception as e:
             logger.error(f"Failed to send SMS OTP: {str(e)}")
             return False
-    
-    async def cleanup_expired_otps(self):
-        """Clean up expired OTP records."""
-        try:
-            result = await self.db.otps.delete_many({
-                "expires_at": {"$lt": datetime.utcnow()}
-            })
-            logger.info(f"Cleaned up {result.deleted_count} expired OTP records")
-        except Exception as e:
-            logger.error(f"Failed to cleanup expired OTPs: {str(e)}")
 
 # Create a global OTP service instance (will be initialized with database)
 otp_service = None
@@ -216,4 +381,9 @@ def get_otp_service(db: AsyncIOMotorDatabase) -> OTPService:
     global otp_service
     if otp_service is None:
         otp_service = OTPService(db)
-    return otp_service
\ No newline at end of file
+    return otp_service
+
+async def close_otp_service():
+    """Release resources held by the shared OTP service, if it was created."""
+    if otp_service is not None:
+        await otp_service.close()
@@ -1,16 +1,204 @@
-from typing import List, Optional, Dict, Any
+import asyncio
+from typing import List, Optional, Dict, Any, Tuple
+from collections import Counter
 from datetime import datetime, timedelta
+from functools import lru_cache
+from operator import attrgetter
 import random
 import re
-import httpx
 import logging
+from pymongo import UpdateOne
 
-from models.shipment import Shipment, ShipmentStatus, TrackingEvent
+from models.shipment import Shipment, ShipmentStatus, parse_stored_datetime
 from models.admin import AutoTrackingConfig
 from services.booking_service import BookingService
+from utils.cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# Fields read by get_enhanced_tracking_info
+TRACKING_INFO_PROJECTION = {
+    "id": 1,
+    "shipment_number": 1,
+    "status": 1,
+    "carrier_info": 1,
+    "sender.name": 1,
+    "sender.city": 1,
+    "sender.state": 1,
+    "recipient.name": 1,
+    "recipient.city": 1,
+    "recipient.state": 1,
+    "package_info": 1,
+    "chargeable_weight": 1,
+    "volumetric_weight": 1,
+    "final_cost": 1,
+    "tracking_events": 1,
+    "signature_required": 1,
+    "insurance_required": 1,
+    "created_at": 1,
+    "updated_at": 1,
+    "delivery_date": 1
+}
+
+# Fields read when simulating status progression
+SIMULATION_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "status": 1,
+    "carrier_info.tracking_number": 1,
+    "carrier_info.carrier_name": 1
+}
+
+# Progress shown for each shipment status. Status tables are keyed by the
+# stored string value: shipments built with from_document carry plain strings
+_STATUS_PROGRESS = {
+    ShipmentStatus.DRAFT.value: 0,
+    ShipmentStatus.BOOKED.value: 15,
+    ShipmentStatus.PICKUP_SCHEDULED.value: 25,
+    ShipmentStatus.PICKED_UP.value: 40,
+    ShipmentStatus.IN_TRANSIT.value: 60,
+    ShipmentStatus.OUT_FOR_DELIVERY.value: 85,
+    ShipmentStatus.DELIVERED.value: 100,
+    ShipmentStatus.RETURNED.value: 100,
+    ShipmentStatus.CANCELLED.value: 0,
+    ShipmentStatus.LOST.value: 0
+}
+
+# Milestones in display order: static fields, the statuses that complete
+# the milestone, and the status in which it is the current step
+_MILESTONES = (
+    (
+        {"id": "booked", "title": "Booking Confirmed", "description": "Your shipment has been booked", "icon": "check-circle"},
+        frozenset({
+            ShipmentStatus.BOOKED.value, ShipmentStatus.PICKUP_SCHEDULED.value,
+            ShipmentStatus.PICKED_UP.value, ShipmentStatus.IN_TRANSIT.value,
+            ShipmentStatus.OUT_FOR_DELIVERY.value, ShipmentStatus.DELIVERED.value
+        }),
+        None
+    ),
+    (
+        {"id": "pickup_scheduled", "title": "Pickup Scheduled", "description": "Pickup has been scheduled", "icon": "calendar"},
+        frozenset({
+            ShipmentStatus.PICKUP_SCHEDULED.value, ShipmentStatus.PICKED_UP.value,
+            ShipmentStatus.IN_TRANSIT.value, ShipmentStatus.OUT_FOR_DELIVERY.value,
+            ShipmentStatus.DELIVERED.value
+        }),
+        ShipmentStatus.BOOKED.value
+    ),
+    (
+        {"id": "picked_up", "title": "Package Picked Up", "description": "Package collected from sender", "icon": "truck"},
+        frozenset({
+            ShipmentStatus.PICKED_UP.value, ShipmentStatus.IN_TRANSIT.value,
+            ShipmentStatus.OUT_FOR_DELIVERY.value, ShipmentStatus.DELIVERED.value
+        }),
+        ShipmentStatus.PICKUP_SCHEDULED.value
+    ),
+    (
+        {"id": "in_transit", "title": "In Transit", "description": "Package is on the way", "icon": "navigation"},
+        frozenset({
+            ShipmentStatus.IN_TRANSIT.value, ShipmentStatus.OUT_FOR_DELIVERY.value,
+            ShipmentStatus.DELIVERED.value
+        }),
+        ShipmentStatus.PICKED_UP.value
+    ),
+    (
+        {"id": "out_for_delivery", "title": "Out for Delivery", "description": "Package is out for delivery", "icon": "map-pin"},
+        frozenset({ShipmentStatus.OUT_FOR_DELIVERY.value, ShipmentStatus.DELIVERED.value}),
+        ShipmentStatus.IN_TRANSIT.value
+    ),
+    (
+        {"id": "delivered", "title": "Delivered", "description": "Package successfully delivered", "icon": "check-circle-2"},
+        frozenset({ShipmentStatus.DELIVERED.value}),
+        ShipmentStatus.OUT_FOR_DELIVERY.value
+    )
+)
+
+# Next status in the simulated progression
+_NEXT_STATUS = {
+    ShipmentStatus.BOOKED.value: ShipmentStatus.PICKUP_SCHEDULED.value,
+    ShipmentStatus.PICKUP_SCHEDULED.value: ShipmentStatus.PICKED_UP.value,
+    ShipmentStatus.PICKED_UP.value: ShipmentStatus.IN_TRANSIT.value,
+    ShipmentStatus.IN_TRANSIT.value: ShipmentStatus.OUT_FOR_DELIVERY.value,
+    ShipmentStatus.OUT_FOR_DELIVERY.value: ShipmentStatus.DELIVERED.value
+}
+
+# Statuses counted as finished in the delivery success rate
+_COMPLETED_STATUSES = (ShipmentStatus.DELIVERED.value, ShipmentStatus.RETURNED.value)
+
+# Event text recorded for each simulated status change
+_STATUS_DESCRIPTIONS = {
+    status.value: f"Status updated to {status.value.replace('_', ' ').title()}"
+    for status in ShipmentStatus
+}
+
+# Event text that marks each milestone, already lowercased
+_MILESTONE_KEYWORDS = {
+    "pickup_scheduled": ("scheduled", "pickup scheduled"),
+    "picked_up": ("picked up", "collected", "pickup"),
+    "in_transit": ("in transit", "departed", "forwarded"),
+    "out_for_delivery": ("out for delivery", "delivery", "final mile")
+}
+
+# What the next tracking update should be for each status
+_NEXT_UPDATES = {
+    ShipmentStatus.BOOKED.value: {
+        "expected_status": "Pickup Scheduled",
+        "hours_estimate": 2,
+        "description": "Pickup will be scheduled soon"
+    },
+    ShipmentStatus.PICKUP_SCHEDULED.value: {
+        "expected_status": "Picked Up",
+        "hours_estimate": 24,
+        "description": "Package will be picked up within 24 hours"
+    },
+    ShipmentStatus.PICKED_UP.value: {
+        "expected_status": "In Transit",
+        "hours_estimate": 4,
+        "description": "Package will start moving to destination"
+    },
+    ShipmentStatus.IN_TRANSIT.value: {
+        "expected_status": "Out for Delivery",
+        "hours_estimate": 12,
+        "description": "Package will reach destination hub"
+    },
+    ShipmentStatus.OUT_FOR_DELIVERY.value: {
+        "expected_status": "Delivered",
+        "hours_estimate": 8,
+        "description": "Package will be delivered today"
+    }
+}
+
+# Tracking event fields echoed in the enhanced tracking payload
+_EVENT_FIELDS = ("timestamp", "status", "location", "description")
+_get_event_fields = attrgetter(*_EVENT_FIELDS)
+
+# Enhanced tracking payloads by (AWB, updated_at) for polling bulk trackers;
+# the short TTL bounds drift in the clock-derived fields
+_enhanced_tracking_cache = TTLCache(30, 4096)
+
+# Server-side budget for the analytics scan
+ANALYTICS_MAX_TIME_MS = 2000
+
+# Common AWB patterns
+AWB_PATTERN = re.compile(
+    r'^(?:'
+    r'XF\d{10}'        # XFas Self Network: XF1234567890
+    r'|FX\d{10}'       # FedEx: FX1234567890
+    r'|DH\d{10}'       # DHL: DH1234567890
+    r'|AR\d{10}'       # Aramex: AR1234567890
+    r'|UP\d{10}'       # UPS: UP1234567890
+    r'|\d{10,15}'      # Generic numeric: 1234567890
+    r')$'
+)
+
+@lru_cache(maxsize=8192)
+def _is_valid_awb(awb: str) -> bool:
+    awb = awb.strip() if awb else ""
+    if len(awb) < 6:
+        return False
+    
+    return AWB_PATTERN.match(awb.upper()) is not None
+
 class TrackingService(BookingService):
     def __init__(self):
         super().__init__()
@@ -26,18 +214,42 @@ class TrackingService(BookingService):
             "summary": {}
         }
         
-        for awb in awb_list:
-            awb = awb.strip().upper()
-            if not awb:
-                continue
-                
+        # Normalized and de-duplicated, keeping the caller's first-seen order
+        awbs = list(dict.fromkeys(awb.strip().upper() for awb in awb_list if awb.strip()))
+        
+        # Malformed AWBs can't match a shipment, so they are left out of the
+        # query and simply end up in not_found below
+        valid_awbs, _ = self.validate_many(awbs)
+        
+        # One round trip for the whole batch instead of a find_one per AWB
+        shipments_by_awb = {}
+        if valid_awbs:
+            try:
+                cursor = db.shipments.find(
+                    {"carrier_info.tracking_number": {"$in": valid_awbs}},
+                    TRACKING_INFO_PROJECTION
+                )
+                shipments_by_awb = {
+                    shipment_data["carrier_info"]["tracking_number"]: shipment_data
+                    async for shipment_data in cursor
+                }
+            except Exception as e:
+                logger.error(f"Bulk AWB lookup failed: {e}")
+        
+        # Keep the caller's order; one clock read for the whole batch
+        now = datetime.utcnow()
+        for awb in awbs:
             try:
-                # Find shipment by AWB
-                shipment_data = await db.shipments.find_one({"carrier_info.tracking_number": awb})
+                shipment_data = shipments_by_awb.get(awb)
                 
                 if shipment_data:
-                    shipment = Shipment(**shipment_data)
-                    tracking_info = self.get_enhanced_tracking_info(shipment)
+                    # updated_at changes with every status change, so it keys out stale entries
+                    cache_key = (awb, parse_stored_datetime(shipment_data.get("updated_at")))
+                    tracking_info = _enhanced_tracking_cache.get(cache_key)
+                    if tracking_info is None:
+                        shipment = Shipment.from_document(shipment_data)
+                        tracking_info = self.get_enhanced_tracking_info(shipment, now)
+                        _enhanced_tracking_cache.set(cache_key, tracking_info)
                     results["shipments"].append(tracking_info)
                     results["tracked_count"] += 1
                 else:
@@ -53,9 +265,24 @@ class TrackingService(BookingService):
         
         return results
     
-    def get_enhanced_tracking_info(self, shipment: Shipment) -> Dict[str, Any]:
+    def get_enhanced_tracking_info_batch(self, shipments_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Enrich a page of stored shipment documents in one pass.
+        
+        Tracking events are embedded in the shipment, so no further queries are
+        needed; the clock is read once for the whole page.
+        """
+        
+        now = datetime.utcnow()
+        return [
+            self.get_enhanced_tracking_info(Shipment.from_document(shipment_data), now)
+            for shipment_data in shipments_data
+        ]
+    
+    def get_enhanced_tracking_info(self, shipment: Shipment, now: Optional[datetime] = None) -> Dict[str, Any]:
         """Get enhanced tracking information with milestones and progress."""
         
+        now = now or datetime.utcnow()
+        
         # Calculate progress percentage
         progress_percentage = self._calculate_progress_percentage(shipment.status)
         
@@ -63,10 +290,10 @@ class TrackingService(BookingService):
         milestones = self._get_milestone_status(shipment)
         
         # Estimate next update
-        next_update = self._estimate_next_update(shipment)
+        next_update = self._estimate_next_update(shipment, now)
         
         # Get delivery insights
-        delivery_insights = self._get_delivery_insights(shipment)
+        delivery_insights = self._get_delivery_insights(shipment, now)
         
         return {
             "id": shipment.id,  # Include internal ID for API calls
@@ -96,12 +323,7 @@ class TrackingService(BookingService):
             "final_cost": shipment.final_cost,
             "milestones": milestones,
             "tracking_events": [
-                {
-                    "timestamp": event.timestamp,
-                    "status": event.status,
-                    "location": event.location,
-                    "description": event.description
-                }
+                dict(zip(_EVENT_FIELDS, _get_event_fields(event)))
                 for event in shipment.tracking_events
             ],
             "estimated_delivery": shipment.carrier_info.estimated_delivery,
@@ -114,152 +336,64 @@ class TrackingService(BookingService):
     def _calculate_progress_percentage(self, status: ShipmentStatus) -> int:
         """Calculate progress percentage based on shipment status."""
         
-        status_progress = {
-            ShipmentStatus.DRAFT: 0,
-            ShipmentStatus.BOOKED: 15,
-            ShipmentStatus.PICKUP_SCHEDULED: 25,
-            ShipmentStatus.PICKED_UP: 40,
-            ShipmentStatus.IN_TRANSIT: 60,
-            ShipmentStatus.OUT_FOR_DELIVERY: 85,
-            ShipmentStatus.DELIVERED: 100,
-            ShipmentStatus.RETURNED: 100,
-            ShipmentStatus.CANCELLED: 0,
-            ShipmentStatus.LOST: 0
-        }
-        
-        return status_progress.get(status, 0)
+        return _STATUS_PROGRESS.get(getattr(status, "value", status), 0)
     
     def _get_milestone_status(self, shipment: Shipment) -> List[Dict[str, Any]]:
         """Get milestone status with icons and colors."""
         
-        current_status = shipment.status
-        
-        milestones = [
-            {
-                "id": "booked",
-                "title": "Booking Confirmed",
-                "description": "Your shipment has been booked",
-                "icon": "check-circle",
-                "status": "completed" if current_status in [
-                    ShipmentStatus.BOOKED, ShipmentStatus.PICKUP_SCHEDULED, 
-                    ShipmentStatus.PICKED_UP, ShipmentStatus.IN_TRANSIT,
-                    ShipmentStatus.OUT_FOR_DELIVERY, ShipmentStatus.DELIVERED
-                ] else "pending",
-                "timestamp": shipment.created_at
-            },
-            {
-                "id": "pickup_scheduled",
-                "title": "Pickup Scheduled",
-                "description": "Pickup has been scheduled",
-                "icon": "calendar",
-                "status": "completed" if current_status in [
-                    ShipmentStatus.PICKUP_SCHEDULED, ShipmentStatus.PICKED_UP,
-                    ShipmentStatus.IN_TRANSIT, ShipmentStatus.OUT_FOR_DELIVERY,
-                    ShipmentStatus.DELIVERED
-                ] else "current" if current_status == ShipmentStatus.BOOKED else "pending",
-                "timestamp": self._get_milestone_timestamp(shipment, "pickup_scheduled")
-            },
-            {
-                "id": "picked_up",
-                "title": "Package Picked Up",
-                "description": "Package collected from sender",
-                "icon": "truck",
-                "status": "completed" if current_status in [
-                    ShipmentStatus.PICKED_UP, ShipmentStatus.IN_TRANSIT,
-                    ShipmentStatus.OUT_FOR_DELIVERY, ShipmentStatus.DELIVERED
-                ] else "current" if current_status == ShipmentStatus.PICKUP_SCHEDULED else "pending",
-                "timestamp": self._get_milestone_timestamp(shipment, "picked_up")
-            },
-            {
-                "id": "in_transit",
-                "title": "In Transit",
-                "description": "Package is on the way",
-                "icon": "navigation",
-                "status": "completed" if current_status in [
-                    ShipmentStatus.IN_TRANSIT, ShipmentStatus.OUT_FOR_DELIVERY,
-                    ShipmentStatus.DELIVERED
-                ] else "current" if current_status == ShipmentStatus.PICKED_UP else "pending",
-                "timestamp": self._get_milestone_timestamp(shipment, "in_transit")
-            },
-            {
-                "id": "out_for_delivery",
-                "title": "Out for Delivery",
-                "description": "Package is out for delivery",
-                "icon": "map-pin",
-                "status": "completed" if current_status in [
-                    ShipmentStatus.OUT_FOR_DELIVERY, ShipmentStatus.DELIVERED
-                ] else "current" if current_status == ShipmentStatus.IN_TRANSIT else "pending",
-                "timestamp": self._get_milestone_timestamp(shipment, "out_for_delivery")
-            },
-            {
-                "id": "delivered",
-                "title": "Delivered",
-                "description": "Package successfully delivered",
-                "icon": "check-circle-2",
-                "status": "completed" if current_status == ShipmentStatus.DELIVERED else "current" if current_status == ShipmentStatus.OUT_FOR_DELIVERY else "pending",
-                "timestamp": shipment.delivery_date if current_status == ShipmentStatus.DELIVERED else None
-            }
-        ]
+        current_status = getattr(shipment.status, "value", shipment.status)
+        event_timestamps = self._collect_milestone_timestamps(shipment)
+        milestones = []
+        
+        for static_fields, completed_statuses, current_before in _MILESTONES:
+            milestone_id = static_fields["id"]
+            if milestone_id == "booked":
+                timestamp = shipment.created_at
+            elif milestone_id == "delivered":
+                timestamp = shipment.delivery_date if current_status == ShipmentStatus.DELIVERED else None
+            else:
+                timestamp = event_timestamps.get(milestone_id)
+            
+            if current_status in completed_statuses:
+                milestone_status = "completed"
+            elif current_status == current_before:
+                milestone_status = "current"
+            else:
+                milestone_status = "pending"
+            
+            milestones.append({**static_fields, "status": milestone_status, "timestamp": timestamp})
         
         return milestones
     
-    def _get_milestone_timestamp(self, shipment: Shipment, milestone_id: str) -> Optional[datetime]:
-        """Get timestamp for a specific milestone from tracking events."""
-        
-        milestone_keywords = {
-            "pickup_scheduled": ["scheduled", "pickup scheduled"],
-            "picked_up": ["picked up", "collected", "pickup"],
-            "in_transit": ["in transit", "departed", "forwarded"],
-            "out_for_delivery": ["out for delivery", "delivery", "final mile"]
-        }
+    def _collect_milestone_timestamps(self, shipment: Shipment) -> Dict[str, datetime]:
+        """Latest matching tracking event timestamp for each milestone, in one pass."""
         
-        keywords = milestone_keywords.get(milestone_id, [])
+        timestamps = {}
         
         for event in reversed(shipment.tracking_events):
-            for keyword in keywords:
-                if keyword.lower() in event.status.lower() or keyword.lower() in event.description.lower():
-                    return event.timestamp
+            status_text = event.status.lower()
+            description_text = event.description.lower()
+            for milestone_id, keywords in _MILESTONE_KEYWORDS.items():
+                if milestone_id in timestamps:
+                    continue
+                if any(keyword in status_text or keyword in description_text for keyword in keywords):
+                    timestamps[milestone_id] = event.timestamp
+            
+            if len(timestamps) == len(_MILESTONE_KEYWORDS):
+                break
         
-        return None
+        return timestamps
     
-    def _estimate_next_update(self, shipment: Shipment) -> Optional[Dict[str, Any]]:
+    def _estimate_next_update(self, shipment: Shipment, now: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
         """Estimate when the next tracking update will occur."""
         
         if shipment.status == ShipmentStatus.DELIVERED:
             return None
         
-        status_next_updates = {
-            ShipmentStatus.BOOKED: {
-                "expected_status": "Pickup Scheduled",
-                "hours_estimate": 2,
-                "description": "Pickup will be scheduled soon"
-            },
-            ShipmentStatus.PICKUP_SCHEDULED: {
-                "expected_status": "Picked Up",
-                "hours_estimate": 24,
-                "description": "Package will be picked up within 24 hours"
-            },
-            ShipmentStatus.PICKED_UP: {
-                "expected_status": "In Transit",
-                "hours_estimate": 4,
-                "description": "Package will start moving to destination"
-            },
-            ShipmentStatus.IN_TRANSIT: {
-                "expected_status": "Out for Delivery",
-                "hours_estimate": 12,
-                "description": "Package will reach destination hub"
-            },
-            ShipmentStatus.OUT_FOR_DELIVERY: {
-                "expected_status": "Delivered",
-                "hours_estimate": 8,
-                "description": "Package will be delivered today"
-            }
-        }
-        
-        next_update_info = status_next_updates.get(shipment.status)
+        next_update_info = _NEXT_UPDATES.get(getattr(shipment.status, "value", shipment.status))
         
         if next_update_info:
-            estimated_time = datetime.utcnow() + timedelta(hours=next_update_info["hours_estimate"])
+            estimated_time = (now or datetime.utcnow()) + timedelta(hours=next_update_info["hours_estimate"])
             return {
                 "expected_status": next_update_info["expected_status"],
                 "estimated_time": estimated_time,
@@ -268,7 +402,7 @@ class TrackingService(BookingService):
         
         return None
     
-    def _get_delivery_insights(self, shipment: Shipment) -> Dict[str, Any]:
+    def _get_delivery_insights(self, shipment: Shipment, now: Optional[datetime] = None) -> Dict[str, Any]:
         """Get delivery insights and recommendations."""
         
         insights = {
@@ -280,7 +414,7 @@ class TrackingService(BookingService):
         
         # Check if delivery is delayed
         if shipment.carrier_info.estimated_delivery:
-            if datetime.utcnow() > shipment.carrier_info.estimated_delivery and shipment.status != ShipmentStatus.DELIVERED:
+            if (now or datetime.utcnow()) > shipment.carrier_info.estimated_delivery and shipment.status != ShipmentStatus.DELIVERED:
                 insights["is_delayed"] = True
                 insights["delivery_confidence"] = "medium"
                 insights["recommendations"].append("Contact customer service for updated delivery timeline")
@@ -307,31 +441,15 @@ class TrackingService(BookingService):
         if not shipments:
             return {}
         
-        status_counts = {}
-        carrier_counts = {}
-        total_value = 0
-        delayed_count = 0
-        
-        for shipment in shipments:
-            # Status distribution
-            status = shipment["status"]
-            status_counts[status] = status_counts.get(status, 0) + 1
-            
-            # Carrier distribution
-            carrier = shipment["carrier"]
-            carrier_counts[carrier] = carrier_counts.get(carrier, 0) + 1
-            
-            # Total declared value
-            total_value += shipment["package_info"]["declared_value"]
-            
-            # Delayed count
-            if shipment["delivery_insights"]["is_delayed"]:
-                delayed_count += 1
+        status_counts = Counter(shipment["status"] for shipment in shipments)
+        carrier_counts = Counter(shipment["carrier"] for shipment in shipments)
+        total_value = sum(shipment["package_info"]["declared_value"] for shipment in shipments)
+        delayed_count = sum(1 for shipment in shipments if shipment["delivery_insights"]["is_delayed"])
         
         return {
             "total_shipments": len(shipments),
-            "status_distribution": status_counts,
-            "carrier_distribution": carrier_counts,
+            "status_distribution": dict(status_counts),
+            "carrier_distribution": dict(carrier_counts),
             "total_declared_value": total_value,
             "delayed_shipments": delayed_count,
             "on_time_percentage": ((len(shipments) - delayed_count) / len(shipments)) * 100
@@ -340,22 +458,15 @@ class TrackingService(BookingService):
     def validate_awb_format(self, awb: str) -> bool:
         """Validate AWB format based on carrier patterns."""
         
-        if not awb or len(awb.strip()) < 6:
-            return False
-        
-        awb = awb.strip().upper()
-        
-        # Common AWB patterns
-        patterns = [
-            r'^XF\d{10}$',      # XFas Self Network: XF1234567890
-            r'^FX\d{10}$',      # FedEx: FX1234567890
-            r'^DH\d{10}$',      # DHL: DH1234567890
-            r'^AR\d{10}$',      # Aramex: AR1234567890
-            r'^UP\d{10}$',      # UPS: UP1234567890
-            r'^\d{10,15}$',     # Generic numeric: 1234567890
-        ]
+        return _is_valid_awb(awb)
+    
+    def validate_many(self, awbs: List[str]) -> Tuple[List[str], List[str]]:
+        """Split AWBs into (valid, invalid) by carrier format, keeping their order."""
         
-        return any(re.match(pattern, awb) for pattern in patterns)
+        valid, invalid = [], []
+        for awb in awbs:
+            (valid if _is_valid_awb(awb) else invalid).append(awb)
+        return valid, invalid
     
     async def get_tracking_analytics(self, user_id: Optional[str], db) -> Dict[str, Any]:
         """Get tracking analytics for dashboard."""
@@ -364,31 +475,31 @@ class TrackingService(BookingService):
         if user_id:
             query["user_id"] = user_id
         
-        # Get all shipments
-        shipments_cursor = db.shipments.find(query)
-        shipments_data = await shipments_cursor.to_list(length=1000)
+        # Count per status on the server; the (user_id, status, created_at)
+        # and status indexes cover this, so no shipment documents are loaded
+        pipeline = [
+            {"$match": query},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+        ]
+        cursor = db.shipments.aggregate(pipeline, maxTimeMS=ANALYTICS_MAX_TIME_MS)
+        status_rows = await cursor.to_list(length=None)
         
-        if not shipments_data:
+        total_shipments = sum(row["count"] for row in status_rows)
+        if not total_shipments:
             return {"total_shipments": 0}
         
         analytics = {
-            "total_shipments": len(shipments_data),
-            "status_breakdown": {},
+            "total_shipments": total_shipments,
+            "status_breakdown": {(row["_id"] or "unknown"): row["count"] for row in status_rows},
             "carrier_performance": {},
             "monthly_trends": {},
             "average_delivery_time": 0,
             "delivery_success_rate": 0
         }
         
-        # Status breakdown
-        for shipment_data in shipments_data:
-            status = shipment_data.get('status', 'unknown')
-            analytics["status_breakdown"][status] = analytics["status_breakdown"].get(status, 0) + 1
-        
         # Calculate delivery success rate
-        completed_statuses = [ShipmentStatus.DELIVERED, ShipmentStatus.RETURNED]
-        completed_count = sum(analytics["status_breakdown"].get(status, 0) for status in completed_statuses)
-        analytics["delivery_success_rate"] = (completed_count / len(shipments_data)) * 100 if shipments_data else 0
+        completed_count = sum(analytics["status_breakdown"].get(status, 0) for status in _COMPLETED_STATUSES)
+        analytics["delivery_success_rate"] = (completed_count / total_shipments) * 100
         
         return analytics
     
@@ -433,57 +544,62 @@ class TrackingService(BookingService):
                     ShipmentStatus.PICKED_UP.value,
                     ShipmentStatus.IN_TRANSIT.value
                 ]}
-            }).limit(5)
+            }, SIMULATION_PROJECTION).limit(5)
             
             shipments = await cursor.to_list(length=5)
             
+            # Imported here: the admin event model shares its name with the shipment one
+            from models.admin import TrackingEvent
+            
+            now = datetime.utcnow()
+            status_updates = []
+            tracking_events = []
+            
             for shipment in shipments:
                 # Simulate random status progression
                 current_status = shipment.get("status")
                 new_status = self._get_next_status(current_status)
                 
                 if new_status and new_status != current_status:
-                    await db.shipments.update_one(
+                    status_updates.append(UpdateOne(
                         {"id": shipment["id"]},
                         {
                             "$set": {
                                 "status": new_status,
-                                "updated_at": datetime.utcnow().isoformat(),
-                                "last_tracking_update": datetime.utcnow().isoformat()
+                                "updated_at": now,
+                                "last_tracking_update": now
                             }
                         }
-                    )
+                    ))
                     
                     # Create a tracking event
-                    from models.admin import TrackingEvent
+                    carrier_info = shipment.get("carrier_info", {})
                     tracking_event = TrackingEvent(
                         shipment_id=shipment["id"],
-                        tracking_number=shipment.get("carrier_info", {}).get("tracking_number", ""),
-                        event_time=datetime.utcnow(),
+                        tracking_number=carrier_info.get("tracking_number", ""),
+                        event_time=now,
                         event_code=new_status.upper(),
-                        event_description=f"Status updated to {new_status.replace('_', ' ').title()}",
+                        event_description=_STATUS_DESCRIPTIONS[new_status],
                         location="Processing Center",
-                        carrier_name=shipment.get("carrier_info", {}).get("carrier_name", "XFas Self Network")
+                        carrier_name=carrier_info.get("carrier_name", "XFas Self Network")
                     )
-                    
-                    await db.tracking_events.insert_one(tracking_event.dict())
-                    
+                    tracking_events.append(tracking_event.dict())
+            
+            # One round trip per collection for the whole batch, sent together
+            if status_updates:
+                await asyncio.gather(
+                    db.shipments.bulk_write(status_updates, ordered=False),
+                    db.tracking_events.insert_many(tracking_events, ordered=False)
+                )
+            
         except Exception as e:
             logger.error(f"Error simulating tracking updates: {str(e)}")
     
     def _get_next_status(self, current_status: str) -> Optional[str]:
         """Get the next logical status for simulation."""
         
-        status_progression = {
-            ShipmentStatus.BOOKED.value: ShipmentStatus.PICKUP_SCHEDULED.value,
-            ShipmentStatus.PICKUP_SCHEDULED.value: ShipmentStatus.PICKED_UP.value,
-            ShipmentStatus.PICKED_UP.value: ShipmentStatus.IN_TRANSIT.value,
-            ShipmentStatus.IN_TRANSIT.value: ShipmentStatus.OUT_FOR_DELIVERY.value,
-            ShipmentStatus.OUT_FOR_DELIVERY.value: ShipmentStatus.DELIVERED.value
-        }
-        
         # Random chance to progress (30% chance)
         if random.random() < 0.3:
-            return status_progression.get(current_status)
+            return _NEXT_STATUS.get(current_status)
         
         return None
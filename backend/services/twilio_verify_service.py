@@ -1,10 +1,15 @@
+import asyncio
 import os
+import re
 import logging
 from typing import Optional, Dict, Any, Literal
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
+_NON_DIGIT = re.compile(r"\D+")
+_DIGIT = re.compile(r"\d")
+
 class TwilioVerifyService:
     """
     Twilio Verify service for phone and email verification.
@@ -80,10 +85,11 @@ class TwilioVerifyService:
             if custom_message:
                 verification_params['custom_message'] = custom_message
             
-            # Send verification
-            verification = self.client.verify.v2.services(
-                self.verify_service_sid
-            ).verifications.create(**verification_params)
+            # Send verification; the Twilio SDK is synchronous, so keep it off the event loop
+            verification = await asyncio.to_thread(
+                self.client.verify.v2.services(self.verify_service_sid).verifications.create,
+                **verification_params
+            )
             
             logger.info(f"Twilio verification sent successfully to {to} via {channel}")
             
@@ -148,10 +154,9 @@ class TwilioVerifyService:
                 if formatted_to:
                     to = formatted_to
             
-            # Check verification
-            verification_check = self.client.verify.v2.services(
-                self.verify_service_sid
-            ).verification_checks.create(
+            # Check verification off the event loop
+            verification_check = await asyncio.to_thread(
+                self.client.verify.v2.services(self.verify_service_sid).verification_checks.create,
                 to=to,
                 code=code
             )
@@ -202,7 +207,7 @@ class TwilioVerifyService:
             return None
         
         # Clean the phone number
-        clean_phone = ''.join(filter(str.isdigit, phone))
+        clean_phone = _NON_DIGIT.sub("", phone)
         
         # Handle Indian numbers
         if len(clean_phone) == 10 and clean_phone[0] in '6789':
@@ -222,7 +227,7 @@ class TwilioVerifyService:
     
     def _is_phone_number(self, contact: str) -> bool:
         """Check if the contact is a phone number (vs email)."""
-        return '@' not in contact and any(char.isdigit() for char in contact)
+        return '@' not in contact and _DIGIT.search(contact) is not None
 
 # Global Twilio Verify service instance
 twilio_verify_service = TwilioVerifyService()
\ No newline at end of file
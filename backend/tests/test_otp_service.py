@@ -0,0 +1,174 @@
+import asyncio
+import copy
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from services.otp_service import OTPService, _hash_otp
+
+_REMOVE = object()
+
+def _evaluate(expression, document):
+    """Evaluate the aggregation expressions used by verify_otp against a document"""
+    if isinstance(expression, str):
+        if expression == "$$REMOVE":
+            return _REMOVE
+        if expression.startswith("$"):
+            return document.get(expression[1:])
+        return expression
+    if isinstance(expression, list):
+        return [_evaluate(item, document) for item in expression]
+    if not isinstance(expression, dict):
+        return expression
+
+    (operator, operand), = expression.items()
+    if operator == "$literal":
+        return operand
+    if operator == "$cond":
+        condition, then, otherwise = operand
+        return _evaluate(then if _evaluate(condition, document) else otherwise, document)
+
+    args = _evaluate(operand, document)
+    if operator == "$gt":
+        return args[0] > args[1]
+    if operator == "$gte":
+        return args[0] >= args[1]
+    if operator == "$eq":
+        return args[0] == args[1]
+    if operator == "$add":
+        return sum(args)
+    if operator == "$and":
+        return all(args)
+    if operator == "$or":
+        return any(args)
+    if operator == "$not":
+        return not args[0]
+    raise AssertionError(f"Unexpected operator {operator}")
+
+class _FakeOtpCollection:
+    """Holds one OTP document and applies pipeline updates the way MongoDB would"""
+    def __init__(self, document):
+        self.document = document
+        self.pipelines = []
+
+    async def find_one_and_update(self, query, pipeline, projection, return_document):
+        self.pipelines.append(pipeline)
+        if any(self.document.get(field) != value for field, value in query.items()):
+            return None
+
+        current = copy.deepcopy(self.document)
+        for stage in pipeline:
+            for field, expression in stage["$set"].items():
+                value = _evaluate(expression, current)
+                if value is _REMOVE:
+                    self.document.pop(field, None)
+                else:
+                    self.document[field] = value
+
+        return {field: self.document[field] for field in projection if field != "_id" and field in self.document}
+
+def _otp_document(otp_code="123456", **overrides):
+    document = {
+        "identifier": "john@example.com",
+        "identifier_type": "email",
+        "otp_hash": _hash_otp("john@example.com", "login", otp_code),
+        "purpose": "login",
+        "expires_at": datetime.utcnow() + timedelta(minutes=10),
+        "created_at": datetime.utcnow(),
+        "is_used": False,
+        "attempts": 0,
+        "max_attempts": 3
+    }
+    document.update(overrides)
+    return document
+
+@pytest.fixture
+def otp_collection():
+    return _FakeOtpCollection(_otp_document())
+
+@pytest.fixture
+def otp_service(otp_collection):
+    db = MagicMock()
+    db.otps = otp_collection
+    return OTPService(db)
+
+def _verify(service, otp_code):
+    return asyncio.run(service.verify_otp("john@example.com", otp_code, "login"))
+
+class TestOtpHashing:
+    """Tests for keyed OTP hashing"""
+
+    def test_hash_is_bound_to_identifier_and_purpose(self):
+        digest = _hash_otp("john@example.com", "login", "123456")
+
+        assert digest != "123456"
+        assert digest == _hash_otp("john@example.com", "login", "123456")
+        assert digest != _hash_otp("jane@example.com", "login", "123456")
+        assert digest != _hash_otp("john@example.com", "registration", "123456")
+
+    def test_stored_otp_holds_hash_not_code(self):
+        db = MagicMock()
+        db.otps.update_one = AsyncMock()
+        service = OTPService(db)
+
+        result = asyncio.run(service.create_otp("john@example.com", "login"))
+
+        update = db.otps.update_one.call_args.args[1]
+        assert update["$set"]["otp_hash"] == _hash_otp("john@example.com", "login", result["otp_code"])
+        assert result["otp_code"] not in update["$set"].values()
+        assert update["$unset"] == {"otp_code": ""}
+
+class TestVerifyOtp:
+    """Tests for the atomic verify-and-consume update"""
+
+    def test_correct_code_is_verified_and_consumed(self, otp_service, otp_collection):
+        result = _verify(otp_service, "123456")
+
+        assert result == {"success": True, "message": "OTP verified successfully"}
+        assert otp_collection.document["is_used"] is True
+        assert otp_collection.document["attempts"] == 0
+        assert "verified_at" in otp_collection.document
+
+    def test_pipeline_compares_hash_not_code(self, otp_service, otp_collection):
+        _verify(otp_service, "123456")
+
+        pipeline = otp_collection.pipelines[0]
+        assert "123456" not in repr(pipeline)
+        assert _hash_otp("john@example.com", "login", "123456") in repr(pipeline)
+        assert set(pipeline[0]["$set"]) == {"is_used", "attempts", "verified_at"}
+
+    def test_wrong_code_increments_attempts(self, otp_service, otp_collection):
+        result = _verify(otp_service, "000000")
+
+        assert result == {"success": False, "error": "Invalid OTP code"}
+        assert otp_collection.document["is_used"] is False
+        assert otp_collection.document["attempts"] == 1
+        assert "verified_at" not in otp_collection.document
+
+    def test_exhausted_after_max_attempts(self, otp_service, otp_collection):
+        for _ in range(3):
+            assert _verify(otp_service, "000000")["error"] == "Invalid OTP code"
+
+        result = _verify(otp_service, "123456")
+
+        assert result == {"success": False, "error": "Maximum verification attempts exceeded"}
+        assert otp_collection.document["is_used"] is True
+        assert otp_collection.document["attempts"] == 3
+        assert "verified_at" not in otp_collection.document
+
+    def test_expired_code_is_rejected(self, otp_service, otp_collection):
+        otp_collection.document["expires_at"] = datetime.utcnow() - timedelta(seconds=1)
+
+        result = _verify(otp_service, "123456")
+
+        assert result == {"success": False, "error": "OTP has expired"}
+        assert otp_collection.document["is_used"] is True
+        assert "verified_at" not in otp_collection.document
+
+    def test_reused_code_is_rejected(self, otp_service):
+        assert _verify(otp_service, "123456")["success"] is True
+
+        result = _verify(otp_service, "123456")
+
+        assert result == {"success": False, "error": "OTP not found or already used"}
@@ -0,0 +1,82 @@
+import asyncio
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from models.shipment import Shipment
+from services.tracking_service import TrackingService
+
+class _Cursor:
+    """Async iterator over a fixed list of documents"""
+    def __init__(self, documents):
+        self._documents = list(documents)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._documents:
+            raise StopAsyncIteration
+        return self._documents.pop(0)
+
+def _shipment_document(**overrides):
+    document = {
+        "id": "shipment-123",
+        "shipment_number": "XF-2024-000123",
+        "status": "in_transit",
+        "sender": {"name": "John Doe", "city": "Mumbai", "state": "Maharashtra"},
+        "recipient": {"name": "Jane Doe", "city": "Delhi", "state": "Delhi"},
+        "package_info": {
+            "dimensions": {"length": 10, "width": 10, "height": 10, "weight": 1.5},
+            "contents_description": "Books",
+            "declared_value": 500.0,
+            "fragile": False
+        },
+        "carrier_info": {
+            "carrier_name": "XFas Self Network",
+            "service_type": "express",
+            "tracking_number": "XF1234567890",
+            "estimated_delivery": "2024-01-05T10:00:00"
+        },
+        "tracking_events": [{
+            "id": "event-1",
+            "timestamp": "2024-01-01T09:00:00",
+            "status": "in_transit",
+            "location": "Mumbai Hub",
+            "description": "Shipment in transit",
+            "created_at": "2024-01-01T09:00:00"
+        }],
+        "signature_required": False,
+        "insurance_required": False,
+        "created_at": datetime(2023, 12, 31, 12, 0),
+        "updated_at": "2024-01-01T09:00:00"
+    }
+    document.update(overrides)
+    return document
+
+class TestShipmentFromDocument:
+    """Tests for building shipments from stored documents"""
+
+    def test_string_timestamps_are_parsed(self):
+        shipment = Shipment.from_document(_shipment_document())
+
+        assert shipment.updated_at == datetime(2024, 1, 1, 9, 0)
+        assert shipment.created_at == datetime(2023, 12, 31, 12, 0)
+        assert shipment.carrier_info.estimated_delivery == datetime(2024, 1, 5, 10, 0)
+        assert shipment.tracking_events[0].timestamp == datetime(2024, 1, 1, 9, 0)
+
+    def test_utc_offset_is_normalised_to_naive(self):
+        shipment = Shipment.from_document(_shipment_document(updated_at="2024-01-01T14:30:00+05:30"))
+
+        assert shipment.updated_at == datetime(2024, 1, 1, 9, 0)
+
+class TestTrackMultipleAwbs:
+    """Tests for bulk tracking"""
+
+    def test_tracks_shipment_with_string_updated_at(self):
+        db = MagicMock()
+        db.shipments.find.return_value = _Cursor([_shipment_document()])
+
+        results = asyncio.run(TrackingService().track_multiple_awbs(["XF1234567890"], db))
+
+        assert results["tracked_count"] == 1
+        assert results["shipments"][0]["last_updated"] == datetime(2024, 1, 1, 9, 0)
@@ -0,0 +1,49 @@
+"""
+Database Utility
+Shared Motor client so every request reuses one connection pool
+"""
+
+from typing import Optional
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+
+from config import config
+
+_client: Optional[AsyncIOMotorClient] = None
+_database: Optional[AsyncIOMotorDatabase] = None
+
+
+def get_client() -> AsyncIOMotorClient:
+    """Return the process-wide Motor client, creating it on first use."""
+    global _client
+
+    if _client is None:
+        _client = AsyncIOMotorClient(
+            config.get_database_url(),
+            serverSelectionTimeoutMS=config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            connectTimeoutMS=config.MONGO_CONNECT_TIMEOUT_MS,
+            socketTimeoutMS=config.MONGO_SOCKET_TIMEOUT_MS,
+            maxPoolSize=config.MONGO_MAX_POOL_SIZE,
+            retryWrites=True
+        )
+
+    return _client
+
+
+async def get_database() -> AsyncIOMotorDatabase:
+    """Database dependency backed by the shared client."""
+    global _database
+
+    if _database is None:
+        _database = get_client()[config.DB_NAME]
+
+    return _database
+
+
+def close_client() -> None:
+    """Close the shared client; the next get_client() call opens a new one."""
+    global _client, _database
+
+    if _client is not None:
+        _client.close()
+    _client = None
+    _database = None
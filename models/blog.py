@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, validator
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 from enum import Enum
@@ -78,6 +78,11 @@ class BlogPostCreate(BaseModel):
     featured: bool = False
     sticky: bool = False
 
+    @validator('tags')
+    def normalize_tags(cls, v):
+        # Tags are searched by case-sensitive prefix on the lowercase form
+        return [tag.strip().lower() for tag in v] if v else v
+
 class BlogPostUpdate(BaseModel):
     title: Optional[str] = None
     slug: Optional[str] = None
@@ -95,6 +100,11 @@ class BlogPostUpdate(BaseModel):
     featured: Optional[bool] = None
     sticky: Optional[bool] = None
 
+    @validator('tags')
+    def normalize_tags(cls, v):
+        # Tags are searched by case-sensitive prefix on the lowercase form
+        return [tag.strip().lower() for tag in v] if v else v
+
 class BlogPostResponse(BaseModel):
     id: str
     title: str
@@ -119,6 +129,18 @@ class BlogPostResponse(BaseModel):
     sticky: bool
     created_at: datetime
     updated_at: datetime
+    
+    @classmethod
+    def from_document(cls, data: Dict[str, Any]) -> "BlogPostResponse":
+        """Build a response from a stored post without re-validating it.
+        
+        Stored posts were written from validated models; only the enum fields
+        are converted back so serialization sees the declared types.
+        """
+        fields = dict(data)
+        fields["category"] = PostCategory(fields["category"])
+        fields["status"] = PostStatus(fields["status"])
+        return cls.model_construct(**fields)
 
 class Comment(BaseModel):
     id: str = Field(default_factory=lambda: __import__('uuid').uuid4().hex)
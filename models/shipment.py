@@ -1,9 +1,32 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, validator
 from typing import Optional, List, Dict, Any
-from datetime import datetime
+from datetime import datetime, timezone
 from enum import Enum
 import uuid
 
+def parse_stored_datetime(value: Any) -> Any:
+    """Return a stored timestamp as a naive UTC datetime.
+    
+    Some writers store ISO strings instead of BSON dates; other values pass through.
+    """
+    if not isinstance(value, str):
+        return value
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def _parse_datetime_fields(document: Dict[str, Any], names) -> Dict[str, Any]:
+    """Copy a document with the named timestamp fields parsed where present."""
+    parsed = dict(document)
+    for name in names:
+        if name in parsed:
+            parsed[name] = parse_stored_datetime(parsed[name])
+    return parsed
+
+# Top-level shipment timestamps coerced by Shipment.from_document
+_SHIPMENT_DATETIME_FIELDS = ("created_at", "updated_at", "pickup_date", "delivery_date")
+
 class ShipmentType(str, Enum):
     PARCEL = "parcel"
     DOCUMENT = "document"
@@ -67,6 +90,11 @@ class CarrierInfo(BaseModel):
     tracking_number: Optional[str] = None
     estimated_delivery: Optional[datetime] = None
     carrier_reference: Optional[str] = None
+    
+    @validator('tracking_number')
+    def normalize_tracking_number(cls, v):
+        # AWBs are looked up by exact match on the uppercase form
+        return v.strip().upper() if v else v
 
 class TrackingEvent(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -126,6 +154,35 @@ class Shipment(BaseModel):
     # Internal notes
     notes: Optional[str] = None
     custom_reference: Optional[str] = None
+    
+    @classmethod
+    def from_document(cls, data: Dict[str, Any]) -> "Shipment":
+        """Build a shipment from a stored document without re-validating it.
+        
+        Stored documents were written from validated models, so read-only paths
+        can skip field coercion, except for timestamps that some writers store as
+        ISO strings. Nested models are constructed the same way so attribute
+        access keeps working; sub-documents left out by a projection are simply
+        not set.
+        """
+        fields = _parse_datetime_fields(data, _SHIPMENT_DATETIME_FIELDS)
+        if "carrier_info" in fields:
+            fields["carrier_info"] = _parse_datetime_fields(fields["carrier_info"], ("estimated_delivery",))
+        for name, model in (("sender", Address), ("recipient", Address),
+                            ("carrier_info", CarrierInfo), ("payment_info", PaymentInfo)):
+            if name in fields:
+                fields[name] = model.model_construct(**fields[name])
+        if "package_info" in fields:
+            package = dict(fields["package_info"])
+            if "dimensions" in package:
+                package["dimensions"] = PackageDimensions.model_construct(**package["dimensions"])
+            fields["package_info"] = PackageInfo.model_construct(**package)
+        if "tracking_events" in fields:
+            fields["tracking_events"] = [
+                TrackingEvent.model_construct(**_parse_datetime_fields(event, ("timestamp", "created_at")))
+                for event in fields["tracking_events"]
+            ]
+        return cls.model_construct(**fields)
 
 class ShipmentCreate(BaseModel):
     quote_id: Optional[str] = None
@@ -478,7 +478,7 @@ async def update_booking_status(
             {
                 "$set": {
                     "status": new_status,
-                    "updated_at": datetime.utcnow().isoformat(),
+                    "updated_at": datetime.utcnow(),
                     "updated_by": admin_user.id
                 }
             }
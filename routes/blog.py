@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse
 from typing import Optional, List
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
@@ -22,6 +22,23 @@ async def get_database() -> AsyncIOMotorDatabase:
 
 router = APIRouter(prefix="/blog", tags=["Blog"])
 
+async def ensure_blog_indexes(db: AsyncIOMotorDatabase):
+    """Ensure indexes backing the blog listing exist."""
+    # Serves the search box on /posts; title hits outrank body hits
+    await db.blog_posts.create_index(
+        [("title", "text"), ("excerpt", "text"), ("content", "text"), ("tags", "text")],
+        weights={"title": 10, "tags": 5, "excerpt": 3, "content": 1},
+        name="blog_text"
+    )
+    # Slug lookups on every post page; also guards against duplicate slugs
+    await db.blog_posts.create_index("slug", unique=True)
+    # Prefix matches on the lowercase tags in the regex search fallback
+    await db.blog_posts.create_index("tags")
+    # Listing filters in the listing's sort order, so /posts never sorts in memory
+    await db.blog_posts.create_index([("status", 1), ("sticky", -1), ("published_at", -1)])
+    await db.blog_posts.create_index([("status", 1), ("category", 1), ("sticky", -1), ("published_at", -1)])
+    await db.blog_posts.create_index([("status", 1), ("featured", 1), ("sticky", -1), ("published_at", -1)])
+
 # ===== BLOG POSTS =====
 
 @router.post("/posts", response_model=BlogPost)
@@ -308,21 +325,13 @@ async def export_csv_data(
 ):
     """Export data to CSV format."""
     
-    try:
-        blog_service = BlogService()
-        csv_content = await blog_service.export_to_csv(entity_type, {}, db)
-        
-        return Response(
-            content=csv_content,
-            media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename={entity_type}_export.csv"}
-        )
-        
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error exporting CSV data: {str(e)}"
-        )
+    blog_service = BlogService()
+    
+    return StreamingResponse(
+        blog_service.export_to_csv(entity_type, {}, db),
+        media_type="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={entity_type}_export.csv"}
+    )
 
 # ===== SEO MANAGEMENT =====
 
@@ -1,16 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
-from typing import Optional, List, Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from typing import Optional, List, Dict, Any, IO, Iterator
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import datetime, timedelta
+from functools import lru_cache
+from queue import LifoQueue, Empty, Full
+from tempfile import SpooledTemporaryFile
+from xml.sax.saxutils import escape
+import asyncio
 import io
+import time
 import uuid
 
+from reportlab.graphics.barcode.code128 import Code128
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_RIGHT, TA_CENTER
+from reportlab.lib.pagesizes import A4, letter
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.platypus.flowables import Flowable, HRFlowable
+
 from models.user import User
-from models.shipment import Shipment, ShipmentStatus, ShipmentUpdate
+from models.shipment import Shipment, ShipmentStatus, ShipmentUpdate, TrackingEvent, parse_stored_datetime
 from services.tracking_service import TrackingService
-from services.notification_service import NotificationService
 from utils.auth import get_current_user
+from utils.cache import TTLCache
 
 # Database dependency
 async def get_database() -> AsyncIOMotorDatabase:
@@ -20,7 +36,58 @@ async def get_database() -> AsyncIOMotorDatabase:
     client = AsyncIOMotorClient(mongo_url)
     return client[os.environ.get('DB_NAME', 'xfas_logistics')]
 
-router = APIRouter(prefix="/orders", tags=["Order Management"])
+router = APIRouter(prefix="/orders", tags=["Order Management"], default_response_class=ORJSONResponse)
+
+# Stateless service shared by all handlers
+_tracking_service = TrackingService()
+
+# (updated_at, payload) for assembled shipment details keyed by (user_id, shipment_id);
+# an entry is served only while the stored updated_at still matches
+_shipment_detail_cache = TTLCache(ttl_seconds=60, max_size=2048)
+
+# Status sets used for per-shipment capability checks
+_CANCELLABLE = frozenset({ShipmentStatus.DRAFT, ShipmentStatus.BOOKED, ShipmentStatus.PICKUP_SCHEDULED})
+_RESCHEDULABLE = frozenset({ShipmentStatus.BOOKED, ShipmentStatus.PICKUP_SCHEDULED})
+_NO_DOC_STATUSES = frozenset({ShipmentStatus.DRAFT, ShipmentStatus.CANCELLED})
+
+# PDFs are spooled in memory up to this size before spilling to disk
+PDF_SPOOL_MAX_SIZE = 1024 * 1024
+PDF_STREAM_CHUNK_SIZE = 64 * 1024
+
+# Reusable in-memory buffers for label rendering
+_BUFFER_POOL: "LifoQueue[io.BytesIO]" = LifoQueue(maxsize=32)
+
+# Fields read when building a shipment list row (Shipment model + enhanced tracking info)
+SHIPMENT_LIST_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "user_id": 1,
+    "shipment_number": 1,
+    "status": 1,
+    "sender": 1,
+    "recipient": 1,
+    "package_info": 1,
+    "carrier_info": 1,
+    "payment_info": 1,
+    "tracking_events": 1,
+    "chargeable_weight": 1,
+    "volumetric_weight": 1,
+    "final_cost": 1,
+    "insurance_required": 1,
+    "signature_required": 1,
+    "created_at": 1,
+    "updated_at": 1,
+    "delivery_date": 1
+}
+
+async def ensure_order_indexes(db: AsyncIOMotorDatabase):
+    """Ensure indexes backing the order management queries exist."""
+    # Serves /my-shipments: equality on user_id (+ optional status), sorted by newest first
+    await db.shipments.create_index([
+        ("user_id", 1),
+        ("status", 1),
+        ("created_at", -1)
+    ])
 
 class CancelOrderRequest(BaseModel):
     reason: str
@@ -48,26 +115,24 @@ async def get_user_shipments(
             query["status"] = status_filter
         
         # Get shipments with pagination
-        shipments_cursor = db.shipments.find(query).sort("created_at", -1).limit(limit).skip(offset)
-        shipments_data = await shipments_cursor.to_list(length=limit)
+        shipments_cursor = db.shipments.find(query, SHIPMENT_LIST_PROJECTION).sort("created_at", -1).limit(limit).skip(offset).batch_size(limit)
         
         # Get total count
         total_count = await db.shipments.count_documents(query)
         
         # Process shipments with enhanced tracking info
-        tracking_service = TrackingService()
         processed_shipments = []
         
-        for shipment_data in shipments_data:
+        async for shipment_data in shipments_cursor:
             shipment = Shipment(**shipment_data)
-            enhanced_info = tracking_service.get_enhanced_tracking_info(shipment)
+            enhanced_info = _tracking_service.get_enhanced_tracking_info(shipment)
             
             # Add order management specific info
             enhanced_info.update({
-                "can_cancel": shipment.status in [ShipmentStatus.DRAFT, ShipmentStatus.BOOKED, ShipmentStatus.PICKUP_SCHEDULED],
-                "can_reschedule": shipment.status in [ShipmentStatus.BOOKED, ShipmentStatus.PICKUP_SCHEDULED],
-                "invoice_available": shipment.status not in [ShipmentStatus.DRAFT, ShipmentStatus.CANCELLED],
-                "label_available": shipment.status not in [ShipmentStatus.DRAFT, ShipmentStatus.CANCELLED],
+                "can_cancel": shipment.status in _CANCELLABLE,
+                "can_reschedule": shipment.status in _RESCHEDULABLE,
+                "invoice_available": shipment.status not in _NO_DOC_STATUSES,
+                "label_available": shipment.status not in _NO_DOC_STATUSES,
                 "payment_status": shipment.payment_info.status,
                 "total_amount": shipment.payment_info.amount
             })
@@ -106,11 +171,23 @@ async def get_shipment_details(
     """Get detailed information about a specific shipment."""
     
     try:
+        shipment_filter = {"id": shipment_id, "user_id": current_user.id}
+        
+        # Cache key includes the owner so one user can never read another's entry.
+        # Any writer (admin, carrier sync, other workers) bumps updated_at, so a
+        # cheap stamp read tells whether the cached payload is still current
+        cache_key = (current_user.id, shipment_id)
+        cached = _shipment_detail_cache.get(cache_key)
+        if cached is not None:
+            stamp = await db.shipments.find_one(shipment_filter, {"_id": 0, "updated_at": 1})
+            if stamp and parse_stored_datetime(stamp.get("updated_at")) == cached[0]:
+                return {
+                    "success": True,
+                    "data": cached[1]
+                }
+        
         # Find shipment
-        shipment_data = await db.shipments.find_one({
-            "id": shipment_id,
-            "user_id": current_user.id
-        })
+        shipment_data = await db.shipments.find_one(shipment_filter)
         
         if not shipment_data:
             raise HTTPException(
@@ -119,17 +196,16 @@ async def get_shipment_details(
             )
         
         shipment = Shipment(**shipment_data)
-        tracking_service = TrackingService()
         
         # Get enhanced tracking info
-        enhanced_info = tracking_service.get_enhanced_tracking_info(shipment)
+        enhanced_info = _tracking_service.get_enhanced_tracking_info(shipment)
         
         # Add detailed order management info
         enhanced_info.update({
-            "can_cancel": shipment.status in [ShipmentStatus.DRAFT, ShipmentStatus.BOOKED, ShipmentStatus.PICKUP_SCHEDULED],
-            "can_reschedule": shipment.status in [ShipmentStatus.BOOKED, ShipmentStatus.PICKUP_SCHEDULED],
-            "invoice_available": shipment.status not in [ShipmentStatus.DRAFT, ShipmentStatus.CANCELLED],
-            "label_available": shipment.status not in [ShipmentStatus.DRAFT, ShipmentStatus.CANCELLED],
+            "can_cancel": shipment.status in _CANCELLABLE,
+            "can_reschedule": shipment.status in _RESCHEDULABLE,
+            "invoice_available": shipment.status not in _NO_DOC_STATUSES,
+            "label_available": shipment.status not in _NO_DOC_STATUSES,
             "cancellation_deadline": _get_cancellation_deadline(shipment),
             "reschedule_options": _get_reschedule_options(shipment),
             "payment_details": {
@@ -146,6 +222,8 @@ async def get_shipment_details(
             }
         })
         
+        _shipment_detail_cache.set(cache_key, (shipment.updated_at, enhanced_info))
+        
         return {
             "success": True,
             "data": enhanced_info
@@ -184,7 +262,7 @@ async def cancel_shipment(
         shipment = Shipment(**shipment_data)
         
         # Check if cancellation is allowed
-        if shipment.status not in [ShipmentStatus.DRAFT, ShipmentStatus.BOOKED, ShipmentStatus.PICKUP_SCHEDULED]:
+        if shipment.status not in _CANCELLABLE:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Shipment cannot be cancelled at this stage"
@@ -206,7 +284,6 @@ async def cancel_shipment(
         )
         
         # Add tracking event
-        from models.shipment import TrackingEvent
         tracking_event = TrackingEvent(
             timestamp=datetime.utcnow(),
             status="CANCELLED",
@@ -218,6 +295,7 @@ async def cancel_shipment(
             {"id": shipment_id},
             {"$push": {"tracking_events": tracking_event.dict()}}
         )
+        _shipment_detail_cache.delete((current_user.id, shipment_id))
         
         # Process refund if requested
         refund_status = "pending"
@@ -226,7 +304,6 @@ async def cancel_shipment(
             refund_status = "processing"
         
         # Send cancellation notification
-        notification_service = NotificationService()
         # TODO: Add cancellation notification template
         
         return {
@@ -273,7 +350,7 @@ async def reschedule_shipment(
         shipment = Shipment(**shipment_data)
         
         # Check if rescheduling is allowed
-        if shipment.status not in [ShipmentStatus.BOOKED, ShipmentStatus.PICKUP_SCHEDULED]:
+        if shipment.status not in _RESCHEDULABLE:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Shipment cannot be rescheduled at this stage"
@@ -301,7 +378,6 @@ async def reschedule_shipment(
         )
         
         # Add tracking event
-        from models.shipment import TrackingEvent
         tracking_event = TrackingEvent(
             timestamp=datetime.utcnow(),
             status="RESCHEDULED",
@@ -313,6 +389,7 @@ async def reschedule_shipment(
             {"id": shipment_id},
             {"$push": {"tracking_events": tracking_event.dict()}}
         )
+        _shipment_detail_cache.delete((current_user.id, shipment_id))
         
         # Send reschedule notification
         # TODO: Add reschedule notification template
@@ -359,17 +436,18 @@ async def download_invoice(
         shipment = Shipment(**shipment_data)
         
         # Check if invoice is available
-        if shipment.status in [ShipmentStatus.DRAFT, ShipmentStatus.CANCELLED]:
+        if shipment.status in _NO_DOC_STATUSES:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invoice not available for this shipment"
             )
         
-        # Generate invoice (mock implementation)
-        invoice_content = _generate_invoice_pdf(shipment)
+        # Generate invoice (mock implementation); rendered before the response
+        # starts so failures still reach the handler below
+        invoice_spool = await _render_invoice(shipment)
         
-        return Response(
-            content=invoice_content,
+        return StreamingResponse(
+            _stream_spool(invoice_spool),
             media_type="application/pdf",
             headers={
                 "Content-Disposition": f"attachment; filename=invoice_{shipment.shipment_number}.pdf"
@@ -408,17 +486,17 @@ async def download_shipping_label(
         shipment = Shipment(**shipment_data)
         
         # Check if label is available
-        if shipment.status in [ShipmentStatus.DRAFT, ShipmentStatus.CANCELLED]:
+        if shipment.status in _NO_DOC_STATUSES:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Shipping label not available for this shipment"
             )
         
         # Generate shipping label (mock implementation)
-        label_content = _generate_shipping_label_pdf(shipment)
+        label_buffer = await _generate_shipping_label_pdf(shipment)
         
-        return Response(
-            content=label_content,
+        return StreamingResponse(
+            _stream_pooled_pdf(label_buffer),
             media_type="application/pdf",
             headers={
                 "Content-Disposition": f"attachment; filename=label_{shipment.carrier_info.tracking_number}.pdf"
@@ -442,7 +520,6 @@ async def get_order_analytics(
     """Get order analytics summary for user."""
     
     try:
-        from datetime import timedelta
         start_date = datetime.utcnow() - timedelta(days=days)
         
         # Get shipments in date range
@@ -451,43 +528,45 @@ async def get_order_analytics(
             "created_at": {"$gte": start_date}
         }
         
-        shipments_cursor = db.shipments.find(query)
-        shipments_data = await shipments_cursor.to_list(length=1000)
+        # Let Mongo compute the breakdowns and totals in a single round trip
+        pipeline = [
+            {"$match": query},
+            {"$facet": {
+                "by_status": [
+                    {"$group": {"_id": {"$ifNull": ["$status", "unknown"]}, "count": {"$sum": 1}}}
+                ],
+                "by_carrier": [
+                    {"$group": {"_id": {"$ifNull": ["$carrier_info.carrier_name", "unknown"]}, "count": {"$sum": 1}}}
+                ],
+                "totals": [
+                    {"$group": {
+                        "_id": None,
+                        "count": {"$sum": 1},
+                        "total_spent": {"$sum": "$payment_info.amount"},
+                        "delivered": {"$sum": {"$cond": [{"$eq": ["$status", ShipmentStatus.DELIVERED.value]}, 1, 0]}}
+                    }}
+                ]
+            }}
+        ]
+        
+        facets = (await db.shipments.aggregate(pipeline).to_list(length=1))[0]
+        totals = facets["totals"][0] if facets["totals"] else {"count": 0, "total_spent": 0, "delivered": 0}
+        total_shipments = totals["count"]
         
         analytics = {
             "period": f"Last {days} days",
-            "total_shipments": len(shipments_data),
+            "total_shipments": total_shipments,
             "total_spent": 0,
-            "status_breakdown": {},
-            "carrier_usage": {},
+            "status_breakdown": {item["_id"]: item["count"] for item in facets["by_status"]},
+            "carrier_usage": {item["_id"]: item["count"] for item in facets["by_carrier"]},
             "average_shipment_value": 0,
             "delivery_success_rate": 0
         }
         
-        if shipments_data:
-            total_amount = 0
-            delivered_count = 0
-            
-            for shipment_data in shipments_data:
-                # Status breakdown
-                status = shipment_data.get('status', 'unknown')
-                analytics["status_breakdown"][status] = analytics["status_breakdown"].get(status, 0) + 1
-                
-                # Carrier usage
-                carrier = shipment_data.get('carrier_info', {}).get('carrier_name', 'unknown')
-                analytics["carrier_usage"][carrier] = analytics["carrier_usage"].get(carrier, 0) + 1
-                
-                # Total spent
-                amount = shipment_data.get('payment_info', {}).get('amount', 0)
-                total_amount += amount
-                
-                # Delivery success
-                if status == ShipmentStatus.DELIVERED.value:
-                    delivered_count += 1
-            
-            analytics["total_spent"] = total_amount
-            analytics["average_shipment_value"] = total_amount / len(shipments_data)
-            analytics["delivery_success_rate"] = (delivered_count / len(shipments_data)) * 100
+        if total_shipments:
+            analytics["total_spent"] = totals["total_spent"]
+            analytics["average_shipment_value"] = totals["total_spent"] / total_shipments
+            analytics["delivery_success_rate"] = (totals["delivered"] / total_shipments) * 100
         
         return {
             "success": True,
@@ -526,7 +605,6 @@ def _get_cancellation_deadline(shipment: Shipment) -> Optional[datetime]:
     
     if shipment.pickup_date:
         # Allow cancellation up to 2 hours before pickup
-        from datetime import timedelta
         return shipment.pickup_date - timedelta(hours=2)
     
     return None
@@ -534,8 +612,6 @@ def _get_cancellation_deadline(shipment: Shipment) -> Optional[datetime]:
 def _get_reschedule_options(shipment: Shipment) -> Dict[str, Any]:
     """Get reschedule options for a shipment."""
     
-    from datetime import timedelta
-    
     today = datetime.utcnow()
     
     return {
@@ -549,21 +625,113 @@ def _get_reschedule_options(shipment: Shipment) -> Dict[str, Any]:
         ]
     }
 
-def _generate_invoice_pdf(shipment: Shipment) -> bytes:
-    """Generate professional invoice PDF using reportlab."""
-    
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
-    from reportlab.lib import colors
-    from reportlab.lib.units import inch, cm
-    from reportlab.lib.enums import TA_LEFT, TA_RIGHT, TA_CENTER
-    from reportlab.graphics.shapes import Drawing, Line
-    from reportlab.platypus.flowables import HRFlowable
-    
-    buffer = io.BytesIO()
+_STYLES = getSampleStyleSheet()
+
+async def _render_invoice(shipment: Shipment) -> SpooledTemporaryFile:
+    """Render the invoice in a worker thread so the event loop stays free."""
+    
+    return await asyncio.to_thread(_render_invoice_sync, shipment)
+
+def _render_invoice_sync(shipment: Shipment) -> SpooledTemporaryFile:
+    """Render the invoice into a spooled buffer, rewound and owned by the caller."""
+    
+    spool = SpooledTemporaryFile(max_size=PDF_SPOOL_MAX_SIZE)
+    try:
+        _generate_invoice_pdf(shipment, spool)
+    except Exception:
+        spool.close()
+        raise
+    
+    spool.seek(0)
+    return spool
+
+def _stream_spool(spool: SpooledTemporaryFile) -> Iterator[bytes]:
+    """Yield a finished spooled file chunk by chunk, then close it."""
+    
+    try:
+        while True:
+            chunk = spool.read(PDF_STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        spool.close()
+
+@lru_cache(maxsize=None)
+def _invoice_template() -> Dict[str, Any]:
+    """Build the static parts of the invoice once: table styles and fixed markup."""
+    
+    return {
+        "company_markup": "<b>XFas Logistics Private Limited</b><br/>Logistics &amp; Supply Chain Solutions<br/>Madhuban Tower, A-200 Road no 4, Gali no 10, Mahipalpur<br/>New Delhi 110037, India<br/>GST: 27XXXXX1234X1ZX<br/>Phone: 011-47501136<br/>WhatsApp: 9821984141<br/>Email: contact@xfas.in",
+        "terms_markup": """
+        <b>Terms & Conditions:</b><br/>
+        • Payment is due within 30 days of invoice date<br/>
+        • All shipments are subject to XFas Logistics terms and conditions<br/>
+        • For any queries, please contact our customer service at support@xfaslogistics.com<br/>
+        • This is a computer-generated invoice and does not require a signature
+        """,
+        "header": TableStyle([
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 0),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+            ('TOPPADDING', (0, 0), (-1, -1), 0),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 15),
+        ]),
+        "addresses": TableStyle([
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 15),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 15),
+            ('TOPPADDING', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 15),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f7fafc')),
+            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e2e8f0')),
+        ]),
+        "service": TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2d3748')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('ALIGN', (3, 0), (3, -1), 'RIGHT'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 12),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 12),
+            ('TOPPADDING', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
+            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e2e8f0')),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#ffffff')),
+        ]),
+        "package": TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f7fafc')),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 12),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 12),
+            ('TOPPADDING', (0, 0), (-1, -1), 8),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e2e8f0')),
+        ]),
+        "summary": TableStyle([
+            ('FONTNAME', (1, 0), (-1, 1), 'Helvetica'),
+            ('FONTNAME', (1, 2), (-1, 2), 'Helvetica-Bold'),
+            ('FONTSIZE', (1, 0), (-1, -1), 11),
+            ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+            ('VALIGN', (1, 0), (-1, -1), 'MIDDLE'),
+            ('TOPPADDING', (1, 0), (-1, -1), 8),
+            ('BOTTOMPADDING', (1, 0), (-1, -1), 8),
+            ('BACKGROUND', (1, 2), (-1, 2), colors.HexColor('#2d3748')),
+            ('TEXTCOLOR', (1, 2), (-1, 2), colors.whitesmoke),
+            ('LINEABOVE', (1, 2), (-1, 2), 2, colors.HexColor('#2d3748')),
+        ])
+    }
+
+def _generate_invoice_pdf(shipment: Shipment, output: IO[bytes]) -> None:
+    """Generate professional invoice PDF using reportlab into ``output``."""
+    
     doc = SimpleDocTemplate(
-        buffer, 
+        output, 
         pagesize=A4,
         topMargin=1*inch,
         bottomMargin=0.8*inch,
@@ -572,7 +740,8 @@ def _generate_invoice_pdf(shipment: Shipment) -> bytes:
     )
     
     # Custom styles
-    styles = getSampleStyleSheet()
+    styles = _STYLES
+    template = _invoice_template()
     
     # Company header style
     company_style = ParagraphStyle(
@@ -639,18 +808,12 @@ def _generate_invoice_pdf(shipment: Shipment) -> bytes:
     )
     
     header_data = [[
-        Paragraph("<b>XFas Logistics Private Limited</b><br/>Logistics &amp; Supply Chain Solutions<br/>Madhuban Tower, A-200 Road no 4, Gali no 10, Mahipalpur<br/>New Delhi 110037, India<br/>GST: 27XXXXX1234X1ZX<br/>Phone: 011-47501136<br/>WhatsApp: 9821984141<br/>Email: contact@xfas.in", company_info),
+        Paragraph(template["company_markup"], company_info),
         Paragraph(f"<b>INVOICE</b><br/><br/><b>Invoice No:</b> INV-{shipment.shipment_number}<br/><b>Invoice Date:</b> {datetime.utcnow().strftime('%d %B, %Y')}<br/><b>AWB No:</b> {shipment.carrier_info.tracking_number or 'N/A'}<br/><b>Due Date:</b> {datetime.utcnow().strftime('%d %B, %Y')}", invoice_details)
     ]]
     
     header_table = Table(header_data, colWidths=[4*inch, 3*inch])
-    header_table.setStyle(TableStyle([
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 0),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-        ('TOPPADDING', (0, 0), (-1, -1), 0),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 15),
-    ]))
+    header_table.setStyle(template["header"])
     
     content.append(header_table)
     content.append(HRFlowable(width="100%", thickness=2, color=colors.HexColor('#e2e8f0')))
@@ -675,15 +838,7 @@ def _generate_invoice_pdf(shipment: Shipment) -> bytes:
     ]]
     
     addresses_table = Table(addresses_data, colWidths=[3.5*inch, 3.5*inch])
-    addresses_table.setStyle(TableStyle([
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 15),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 15),
-        ('TOPPADDING', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 15),
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f7fafc')),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e2e8f0')),
-    ]))
+    addresses_table.setStyle(template["addresses"])
     
     content.append(addresses_table)
     content.append(Spacer(1, 25))
@@ -691,25 +846,11 @@ def _generate_invoice_pdf(shipment: Shipment) -> bytes:
     # Service details table
     service_data = [
         ['Service Description', 'Carrier', 'AWB Number', 'Amount (₹)'],
-        [f"{shipment.carrier_info.service_type.value.title() if hasattr(shipment.carrier_info.service_type, 'value') else str(shipment.carrier_info.service_type).title()} Shipping", shipment.carrier_info.carrier_name, shipment.carrier_info.tracking_number or 'N/A', f"{shipment.payment_info.amount:.2f}"]
+        [f"{_enum_text(shipment.carrier_info.service_type).title()} Shipping", shipment.carrier_info.carrier_name, shipment.carrier_info.tracking_number or 'N/A', f"{shipment.payment_info.amount:.2f}"]
     ]
     
     service_table = Table(service_data, colWidths=[2.5*inch, 1.5*inch, 2*inch, 1*inch])
-    service_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2d3748')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('ALIGN', (3, 0), (3, -1), 'RIGHT'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 12),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 12),
-        ('TOPPADDING', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e2e8f0')),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#ffffff')),
-    ]))
+    service_table.setStyle(template["service"])
     
     content.append(service_table)
     content.append(Spacer(1, 15))
@@ -720,22 +861,11 @@ def _generate_invoice_pdf(shipment: Shipment) -> bytes:
         ['Weight', f"{shipment.package_info.dimensions.weight} kg"],
         ['Dimensions (L×W×H)', f"{shipment.package_info.dimensions.length}×{shipment.package_info.dimensions.width}×{shipment.package_info.dimensions.height} cm"],
         ['Declared Value', f"₹{shipment.package_info.declared_value:.2f}"],
-        ['Package Type', shipment.package_info.type.value if hasattr(shipment.package_info.type, 'value') else str(shipment.package_info.type).title()]
+        ['Package Type', _enum_text(shipment.package_info.type)]
     ]
     
     package_table = Table(package_data, colWidths=[3*inch, 2*inch])
-    package_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f7fafc')),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 12),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 12),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e2e8f0')),
-    ]))
+    package_table.setStyle(template["package"])
     
     content.append(package_table)
     content.append(Spacer(1, 25))
@@ -748,18 +878,7 @@ def _generate_invoice_pdf(shipment: Shipment) -> bytes:
     ]
     
     summary_table = Table(summary_data, colWidths=[3*inch, 2*inch, 1.5*inch])
-    summary_table.setStyle(TableStyle([
-        ('FONTNAME', (1, 0), (-1, 1), 'Helvetica'),
-        ('FONTNAME', (1, 2), (-1, 2), 'Helvetica-Bold'),
-        ('FONTSIZE', (1, 0), (-1, -1), 11),
-        ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
-        ('VALIGN', (1, 0), (-1, -1), 'MIDDLE'),
-        ('TOPPADDING', (1, 0), (-1, -1), 8),
-        ('BOTTOMPADDING', (1, 0), (-1, -1), 8),
-        ('BACKGROUND', (1, 2), (-1, 2), colors.HexColor('#2d3748')),
-        ('TEXTCOLOR', (1, 2), (-1, 2), colors.whitesmoke),
-        ('LINEABOVE', (1, 2), (-1, 2), 2, colors.HexColor('#2d3748')),
-    ]))
+    summary_table.setStyle(template["summary"])
     
     content.append(summary_table)
     content.append(Spacer(1, 30))
@@ -768,7 +887,7 @@ def _generate_invoice_pdf(shipment: Shipment) -> bytes:
     payment_info = f"""
     <b>Payment Information:</b><br/>
     Payment Method: {(shipment.payment_info.payment_method or 'N/A').title()}<br/>
-    Payment Status: <b>{shipment.payment_info.status.value.title() if hasattr(shipment.payment_info.status, 'value') else str(shipment.payment_info.status).title()}</b><br/>
+    Payment Status: <b>{_enum_text(shipment.payment_info.status).title()}</b><br/>
     Transaction ID: {shipment.payment_info.transaction_id or 'N/A'}<br/>
     Currency: {shipment.payment_info.currency}
     """
@@ -777,15 +896,7 @@ def _generate_invoice_pdf(shipment: Shipment) -> bytes:
     content.append(Spacer(1, 20))
     
     # Terms and footer
-    terms_text = """
-    <b>Terms & Conditions:</b><br/>
-    • Payment is due within 30 days of invoice date<br/>
-    • All shipments are subject to XFas Logistics terms and conditions<br/>
-    • For any queries, please contact our customer service at support@xfaslogistics.com<br/>
-    • This is a computer-generated invoice and does not require a signature
-    """
-    
-    content.append(Paragraph(terms_text, ParagraphStyle(
+    content.append(Paragraph(template["terms_markup"], ParagraphStyle(
         'Terms',
         parent=styles['Normal'],
         fontSize=8,
@@ -807,23 +918,270 @@ def _generate_invoice_pdf(shipment: Shipment) -> bytes:
     
     # Build PDF
     doc.build(content)
+
+# Label styles are built once at import; getSampleStyleSheet() and
+# ParagraphStyle/TableStyle construction are too costly to repeat per label
+
+# Title style for shipping label
+_LABEL_TITLE_STYLE = ParagraphStyle(
+    'LabelTitle',
+    parent=_STYLES['Title'],
+    fontSize=16,
+    fontName='Helvetica-Bold',
+    textColor=colors.HexColor('#1a365d'),
+    alignment=TA_CENTER,
+    spaceAfter=10
+)
+
+# Company header style
+_LABEL_COMPANY_STYLE = ParagraphStyle(
+    'CompanyHeader',
+    parent=_STYLES['Normal'],
+    fontSize=12,
+    fontName='Helvetica-Bold',
+    textColor=colors.HexColor('#2d3748'),
+    alignment=TA_CENTER,
+    spaceAfter=15
+)
+
+# AWB style
+_LABEL_AWB_STYLE = ParagraphStyle(
+    'AWBStyle',
+    parent=_STYLES['Normal'],
+    fontSize=14,
+    fontName='Helvetica-Bold',
+    textColor=colors.HexColor('#1a365d'),
+    alignment=TA_CENTER,
+    spaceAfter=5
+)
+
+# Address styles
+_LABEL_ADDRESS_HEADER_STYLE = ParagraphStyle(
+    'AddressHeader',
+    parent=_STYLES['Normal'],
+    fontSize=12,
+    fontName='Helvetica-Bold',
+    textColor=colors.whitesmoke,
+    alignment=TA_CENTER
+)
+
+_LABEL_ADDRESS_CONTENT_STYLE = ParagraphStyle(
+    'AddressContent',
+    parent=_STYLES['Normal'],
+    fontSize=11,
+    fontName='Helvetica',
+    textColor=colors.HexColor('#2d3748')
+)
+
+_LABEL_SERVICE_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#f7fafc')),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('LEFTPADDING', (0, 0), (-1, -1), 8),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 8),
+    ('TOPPADDING', (0, 0), (-1, -1), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+    ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e2e8f0')),
+])
+
+_LABEL_ADDRESSES_TABLE_STYLE = TableStyle([
+    # Header row styling
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2d3748')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    
+    # Content styling
+    ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 10),
+    
+    # General styling
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('LEFTPADDING', (0, 0), (-1, -1), 15),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 15),
+    ('TOPPADDING', (0, 0), (-1, 0), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('TOPPADDING', (0, 1), (-1, -1), 20),
+    ('BOTTOMPADDING', (0, 1), (-1, -1), 20),
+    ('GRID', (0, 0), (-1, -1), 2, colors.HexColor('#2d3748')),
+])
+
+_LABEL_NOTICES_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#fed7d7')),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('FONTSIZE', (0, 1), (-1, -1), 8),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.HexColor('#742a2a')),
+    ('TEXTCOLOR', (0, 1), (-1, -1), colors.HexColor('#744210')),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('LEFTPADDING', (0, 0), (-1, -1), 12),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 12),
+    ('TOPPADDING', (0, 0), (-1, -1), 8),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#fc8181')),
+])
+
+_LABEL_FOOTER_TABLE_STYLE = TableStyle([
+    ('FONTSIZE', (0, 0), (-1, -1), 8),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#718096')),
+    ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+    ('ALIGN', (1, 0), (1, -1), 'CENTER'),
+    ('ALIGN', (2, 0), (2, -1), 'RIGHT'),
+    ('LEFTPADDING', (0, 0), (-1, -1), 0),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+    ('TOPPADDING', (0, 0), (-1, -1), 5),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+])
+
+# Invariant label content shared by every render
+_LABEL_NOTICES_ROWS = [
+    ["IMPORTANT NOTICES"],
+    ["• This label must be securely attached to the package"],
+    ["• Package contents should match the declared description"],
+    ["• Contact customer service for any delivery issues: 1800-XFA-SHIP"],
+    ["• For tracking updates, visit www.xfaslogistics.com or call +91-22-1234-5678"]
+]
+
+class _PackageInfoBlock(Flowable):
+    """Package information grid drawn straight onto the canvas.
+    
+    Renders the same header/label/value grid as a styled Table would, but
+    without going through reportlab's table layout engine.
+    """
+    
+    col_width = 1.6 * inch
+    header_height = 33
+    row_height = 32
+    padding = 12
+    
+    def __init__(self, rows: List[List[str]]):
+        super().__init__()
+        self.hAlign = 'CENTER'
+        self.rows = rows
+        self.width = self.col_width * 4
+        self.height = self.header_height + self.row_height * (len(rows) - 1)
+    
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+    
+    def draw(self):
+        canv = self.canv
+        top = self.height
+        
+        # Header bar spanning all columns
+        canv.setFillColor(colors.HexColor('#1a365d'))
+        canv.rect(0, top - self.header_height, self.width, self.header_height, stroke=0, fill=1)
+        canv.setFillColor(colors.whitesmoke)
+        canv.setFont('Helvetica-Bold', 11)
+        canv.drawCentredString(self.width / 2, top - self.header_height / 2 - 4, self.rows[0][0])
+        
+        # Label/value rows with alternating backgrounds
+        y = top - self.header_height
+        for index, row in enumerate(self.rows[1:], start=1):
+            y -= self.row_height
+            if index % 2:
+                canv.setFillColor(colors.HexColor('#f7fafc'))
+                canv.rect(0, y, self.width, self.row_height, stroke=0, fill=1)
+            
+            canv.setFillColor(colors.black)
+            baseline = y + self.row_height / 2 - 3.5
+            for column, text in enumerate(row):
+                canv.setFont('Helvetica-Bold' if column % 2 == 0 else 'Helvetica', 10)
+                canv.drawString(column * self.col_width + self.padding, baseline, text)
+        
+        # Grid lines
+        canv.setStrokeColor(colors.HexColor('#cbd5e0'))
+        canv.setLineWidth(1)
+        canv.rect(0, 0, self.width, self.height, stroke=1, fill=0)
+        row_top = top - self.header_height
+        while row_top > 0:
+            canv.line(0, row_top, self.width, row_top)
+            row_top -= self.row_height
+        for column in range(1, 4):
+            x = column * self.col_width
+            canv.line(x, 0, x, top - self.header_height)
+
+def _enum_text(value) -> str:
+    """Plain text for an enum member, or the value itself for raw strings."""
+    
+    text = getattr(value, 'value', None)
+    return text if text is not None else str(value)
+
+@lru_cache(maxsize=4)
+def _format_minute(minute: int, fmt: str) -> str:
+    """Format a UTC minute bucket; labels rendered in the same minute share the string."""
+    
+    return datetime.utcfromtimestamp(minute * 60).strftime(fmt)
+
+def _address_markup(address) -> str:
+    """Build escaped label markup for an address block."""
+    
+    return "<br/>".join((
+        escape(address.name),
+        escape(address.street),
+        f"{escape(address.city)}, {escape(address.state)}",
+        escape(address.postal_code),
+        f"Phone: {escape(address.phone)}"
+    ))
+
+async def _generate_shipping_label_pdf(shipment: Shipment) -> io.BytesIO:
+    """Render the shipping label in a worker thread so the event loop stays free."""
+    
+    return await asyncio.to_thread(_generate_shipping_label_pdf_sync, shipment)
+
+def _generate_shipping_label_pdf_sync(shipment: Shipment) -> io.BytesIO:
+    """Generate professional shipping label PDF into a pooled buffer.
+    
+    The caller owns the buffer until it is handed back via _stream_pooled_pdf.
+    """
+    
+    try:
+        buffer = _BUFFER_POOL.get_nowait()
+    except Empty:
+        buffer = io.BytesIO()
+    
+    try:
+        _build_shipping_label(shipment, buffer)
+    except Exception:
+        _release_buffer(buffer)
+        raise
+    
+    return buffer
+
+def _stream_pooled_pdf(buffer: io.BytesIO) -> Iterator[bytes]:
+    """Yield a rendered PDF straight from its buffer, then return it to the pool."""
+    
+    try:
+        buffer.seek(0)
+        while True:
+            chunk = buffer.read(PDF_STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        _release_buffer(buffer)
+
+def _release_buffer(buffer: io.BytesIO) -> None:
+    """Reset a buffer and put it back in the pool if there is room."""
+    
     buffer.seek(0)
-    return buffer.getvalue()
+    buffer.truncate(0)
+    try:
+        _BUFFER_POOL.put_nowait(buffer)
+    except Full:
+        pass
 
-def _generate_shipping_label_pdf(shipment: Shipment) -> bytes:
-    """Generate professional shipping label PDF using reportlab."""
-    
-    from reportlab.lib.pagesizes import letter
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-    from reportlab.lib import colors
-    from reportlab.lib.units import inch, cm
-    from reportlab.lib.enums import TA_LEFT, TA_RIGHT, TA_CENTER
-    from reportlab.graphics.shapes import Drawing, Rect, String
-    from reportlab.graphics import renderPDF
-    from reportlab.platypus.flowables import HRFlowable
-    
-    buffer = io.BytesIO()
+def _build_shipping_label(shipment: Shipment, buffer: io.BytesIO) -> None:
+    """Lay out the shipping label into ``buffer``."""
+    
+    # One clock read so the service bar and footer always agree
+    minute = int(time.time()) // 60
+    
     doc = SimpleDocTemplate(
         buffer, 
         pagesize=letter, 
@@ -833,140 +1191,48 @@ def _generate_shipping_label_pdf(shipment: Shipment) -> bytes:
         rightMargin=0.3*inch
     )
     
-    # Custom styles
-    styles = getSampleStyleSheet()
-    
-    # Title style for shipping label
-    title_style = ParagraphStyle(
-        'LabelTitle',
-        parent=styles['Title'],
-        fontSize=16,
-        fontName='Helvetica-Bold',
-        textColor=colors.HexColor('#1a365d'),
-        alignment=TA_CENTER,
-        spaceAfter=10
-    )
-    
-    # Company header style
-    company_style = ParagraphStyle(
-        'CompanyHeader',
-        parent=styles['Normal'],
-        fontSize=12,
-        fontName='Helvetica-Bold',
-        textColor=colors.HexColor('#2d3748'),
-        alignment=TA_CENTER,
-        spaceAfter=15
-    )
-    
-    # AWB style
-    awb_style = ParagraphStyle(
-        'AWBStyle',
-        parent=styles['Normal'],
-        fontSize=14,
-        fontName='Helvetica-Bold',
-        textColor=colors.HexColor('#1a365d'),
-        alignment=TA_CENTER,
-        spaceAfter=5
-    )
-    
-    # Address styles
-    address_header_style = ParagraphStyle(
-        'AddressHeader',
-        parent=styles['Normal'],
-        fontSize=12,
-        fontName='Helvetica-Bold',
-        textColor=colors.whitesmoke,
-        alignment=TA_CENTER
-    )
-    
-    address_content_style = ParagraphStyle(
-        'AddressContent',
-        parent=styles['Normal'],
-        fontSize=11,
-        fontName='Helvetica',
-        textColor=colors.HexColor('#2d3748')
-    )
-    
     # Build content
     content = []
     
     # Header with company info
-    content.append(Paragraph("XFAS LOGISTICS", company_style))
-    content.append(Paragraph("SHIPPING LABEL", title_style))
+    content.append(Paragraph("XFAS LOGISTICS", _LABEL_COMPANY_STYLE))
+    content.append(Paragraph("SHIPPING LABEL", _LABEL_TITLE_STYLE))
     content.append(HRFlowable(width="100%", thickness=3, color=colors.HexColor('#1a365d')))
     content.append(Spacer(1, 15))
     
-    # AWB number with barcode simulation
-    content.append(Paragraph(f"AWB: {shipment.carrier_info.tracking_number or 'N/A'}", awb_style))
+    # AWB number with scannable barcode
+    content.append(Paragraph(f"AWB: {shipment.carrier_info.tracking_number or 'N/A'}", _LABEL_AWB_STYLE))
     
-    # Barcode placeholder (using text representation)
-    barcode_text = f"||||| {shipment.carrier_info.tracking_number} |||||"
-    content.append(Paragraph(barcode_text, ParagraphStyle(
-        'Barcode',
-        parent=styles['Normal'],
-        fontSize=14,
-        fontName='Courier-Bold',
-        alignment=TA_CENTER,
-        spaceAfter=20
-    )))
+    if shipment.carrier_info.tracking_number:
+        barcode = Code128(shipment.carrier_info.tracking_number, barHeight=0.5*inch, barWidth=0.012*inch)
+        barcode.hAlign = 'CENTER'
+        content.append(barcode)
+    content.append(Spacer(1, 20))
     
     # Service information bar  
     service_data = [[
         f"Carrier: {shipment.carrier_info.carrier_name}",
-        f"Service: {shipment.carrier_info.service_type.value.title() if hasattr(shipment.carrier_info.service_type, 'value') else str(shipment.carrier_info.service_type).title()}",
-        f"Date: {datetime.utcnow().strftime('%d %b %Y')}"
+        f"Service: {_enum_text(shipment.carrier_info.service_type).title()}",
+        f"Date: {_format_minute(minute, '%d %b %Y')}"
     ]]
     
     service_table = Table(service_data, colWidths=[2.2*inch, 2.2*inch, 2.2*inch])
-    service_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#f7fafc')),
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 8),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-        ('TOPPADDING', (0, 0), (-1, -1), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e2e8f0')),
-    ]))
+    service_table.setStyle(_LABEL_SERVICE_TABLE_STYLE)
     
     content.append(service_table)
     content.append(Spacer(1, 20))
     
     # From and To addresses in professional layout
     addresses_data = [
-        [Paragraph("FROM", address_header_style), Paragraph("TO", address_header_style)],
+        [Paragraph("FROM", _LABEL_ADDRESS_HEADER_STYLE), Paragraph("TO", _LABEL_ADDRESS_HEADER_STYLE)],
         [
-            Paragraph(f"{shipment.sender.name}<br/>{shipment.sender.street}<br/>{shipment.sender.city}, {shipment.sender.state}<br/>{shipment.sender.postal_code}<br/>Phone: {shipment.sender.phone}", address_content_style),
-            Paragraph(f"{shipment.recipient.name}<br/>{shipment.recipient.street}<br/>{shipment.recipient.city}, {shipment.recipient.state}<br/>{shipment.recipient.postal_code}<br/>Phone: {shipment.recipient.phone}", address_content_style)
+            Paragraph(_address_markup(shipment.sender), _LABEL_ADDRESS_CONTENT_STYLE),
+            Paragraph(_address_markup(shipment.recipient), _LABEL_ADDRESS_CONTENT_STYLE)
         ]
     ]
     
     addresses_table = Table(addresses_data, colWidths=[3.2*inch, 3.2*inch])
-    addresses_table.setStyle(TableStyle([
-        # Header row styling
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2d3748')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        
-        # Content styling
-        ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-        
-        # General styling
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 15),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 15),
-        ('TOPPADDING', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('TOPPADDING', (0, 1), (-1, -1), 20),
-        ('BOTTOMPADDING', (0, 1), (-1, -1), 20),
-        ('GRID', (0, 0), (-1, -1), 2, colors.HexColor('#2d3748')),
-    ]))
+    addresses_table.setStyle(_LABEL_ADDRESSES_TABLE_STYLE)
     
     content.append(addresses_table)
     content.append(Spacer(1, 20))
@@ -975,96 +1241,31 @@ def _generate_shipping_label_pdf(shipment: Shipment) -> bytes:
     package_data = [
         ["PACKAGE INFORMATION", "", "", ""],
         ["Weight", f"{shipment.package_info.dimensions.weight} kg", "Dimensions", f"{shipment.package_info.dimensions.length}×{shipment.package_info.dimensions.width}×{shipment.package_info.dimensions.height} cm"],
-        ["Package Type", shipment.package_info.type.value if hasattr(shipment.package_info.type, 'value') else str(shipment.package_info.type).title(), "Declared Value", f"₹{shipment.package_info.declared_value:.2f}"],
+        ["Package Type", _enum_text(shipment.package_info.type), "Declared Value", f"₹{shipment.package_info.declared_value:.2f}"],
         ["Special Instructions", "Handle with care - Fragile contents", "COD Amount", "N/A"]
     ]
     
-    package_table = Table(package_data, colWidths=[1.6*inch, 1.6*inch, 1.6*inch, 1.6*inch])
-    package_table.setStyle(TableStyle([
-        # Header
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1a365d')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 11),
-        ('SPAN', (0, 0), (3, 0)),
-        ('ALIGN', (0, 0), (3, 0), 'CENTER'),
-        
-        # Content
-        ('FONTNAME', (0, 1), (0, -1), 'Helvetica-Bold'),  # Labels
-        ('FONTNAME', (2, 1), (2, -1), 'Helvetica-Bold'),  # Labels
-        ('FONTNAME', (1, 1), (1, -1), 'Helvetica'),       # Values
-        ('FONTNAME', (3, 1), (3, -1), 'Helvetica'),       # Values
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-        
-        # General styling
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 12),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 12),
-        ('TOPPADDING', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#cbd5e0')),
-        
-        # Alternating row colors
-        ('BACKGROUND', (0, 1), (-1, 1), colors.HexColor('#f7fafc')),
-        ('BACKGROUND', (0, 3), (-1, 3), colors.HexColor('#f7fafc')),
-    ]))
-    
-    content.append(package_table)
+    content.append(_PackageInfoBlock(package_data))
     content.append(Spacer(1, 25))
     
     # Important notices
-    notices_data = [
-        ["IMPORTANT NOTICES"],
-        ["• This label must be securely attached to the package"],
-        ["• Package contents should match the declared description"],
-        ["• Contact customer service for any delivery issues: 1800-XFA-SHIP"],
-        ["• For tracking updates, visit www.xfaslogistics.com or call +91-22-1234-5678"]
-    ]
-    
-    notices_table = Table(notices_data, colWidths=[6.5*inch])
-    notices_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#fed7d7')),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('FONTSIZE', (0, 1), (-1, -1), 8),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.HexColor('#742a2a')),
-        ('TEXTCOLOR', (0, 1), (-1, -1), colors.HexColor('#744210')),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 12),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 12),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#fc8181')),
-    ]))
+    notices_table = Table(_LABEL_NOTICES_ROWS, colWidths=[6.5*inch])
+    notices_table.setStyle(_LABEL_NOTICES_TABLE_STYLE)
     
     content.append(notices_table)
     content.append(Spacer(1, 15))
     
     # Footer with generation info
     footer_table_data = [[
-        f"Generated: {datetime.utcnow().strftime('%d %B %Y, %I:%M %p IST')}",
+        f"Generated: {_format_minute(minute, '%d %B %Y, %I:%M %p IST')}",
         "XFas Logistics Pvt Ltd",
         "www.xfaslogistics.com"
     ]]
     
     footer_table = Table(footer_table_data, colWidths=[2.2*inch, 2.2*inch, 2.2*inch])
-    footer_table.setStyle(TableStyle([
-        ('FONTSIZE', (0, 0), (-1, -1), 8),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#718096')),
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('ALIGN', (1, 0), (1, -1), 'CENTER'),
-        ('ALIGN', (2, 0), (2, -1), 'RIGHT'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 0),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-        ('TOPPADDING', (0, 0), (-1, -1), 5),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-    ]))
+    footer_table.setStyle(_LABEL_FOOTER_TABLE_STYLE)
     
     content.append(footer_table)
     
     # Build PDF
     doc.build(content)
-    buffer.seek(0)
-    return buffer.getvalue()
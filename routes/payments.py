@@ -22,6 +22,9 @@ async def get_database() -> AsyncIOMotorDatabase:
 
 router = APIRouter(prefix="/payments", tags=["Payments"])
 
+# Stateless service shared by all handlers
+_payment_service = PaymentService()
+
 # Request/Response Models
 class WalletTopupRequest(BaseModel):
     amount: float
@@ -50,12 +53,11 @@ async def get_wallet_balance(
     """Get user's wallet balance and limits."""
     
     try:
-        payment_service = PaymentService()
-        wallet = await payment_service.get_or_create_wallet(current_user.id, db)
+        wallet = await _payment_service.get_or_create_wallet(current_user.id, db)
         
         # Get spending analytics
         today = __import__('datetime').datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-        daily_transactions = await payment_service.get_wallet_transactions(current_user.id, db)
+        daily_transactions = await _payment_service.get_wallet_transactions(current_user.id, db)
         
         daily_spent = sum(tx.amount for tx in daily_transactions 
                          if tx.transaction_type.value == "WALLET_DEDUCT" 
@@ -103,8 +105,6 @@ async def topup_wallet(
                 detail="Minimum top-up amount is ₹10"
             )
         
-        payment_service = PaymentService()
-        
         # Create payment for wallet top-up
         payment_data = PaymentCreate(
             amount=request.amount,
@@ -116,7 +116,7 @@ async def topup_wallet(
             description=f"Wallet top-up of ₹{request.amount}"
         )
         
-        payment_response = await payment_service.create_payment(payment_data, current_user.id, db)
+        payment_response = await _payment_service.create_payment(payment_data, current_user.id, db)
         
         return {
             "success": True,
@@ -144,8 +144,7 @@ async def get_wallet_transactions(
     """Get wallet transaction history."""
     
     try:
-        payment_service = PaymentService()
-        transactions = await payment_service.get_wallet_transactions(current_user.id, db, limit, offset)
+        transactions = await _payment_service.get_wallet_transactions(current_user.id, db, limit, offset)
         
         # Get total count
         total_count = await db.wallet_transactions.count_documents({"user_id": current_user.id})
@@ -185,8 +184,7 @@ async def calculate_cod_charges(
                 detail="Shipment value must be positive"
             )
         
-        payment_service = PaymentService()
-        cod_charges = payment_service.calculate_cod_charges(request.shipment_value)
+        cod_charges = _payment_service.calculate_cod_charges(request.shipment_value)
         
         return {
             "success": True,
@@ -214,8 +212,7 @@ async def check_cod_availability(
     """Check if COD is available for a postal code."""
     
     try:
-        payment_service = PaymentService()
-        is_available = payment_service.is_cod_available(postal_code)
+        is_available = _payment_service.is_cod_available(postal_code)
         
         return {
             "success": True,
@@ -249,8 +246,7 @@ async def get_payment_summary(
                 detail="Invalid amount values"
             )
         
-        payment_service = PaymentService()
-        summary = await payment_service.get_shipment_payment_summary(
+        summary = await _payment_service.get_shipment_payment_summary(
             request.shipment_id,
             current_user.id,
             request.shipment_value,
@@ -280,8 +276,6 @@ async def process_payment(
     """Process payment for a shipment."""
     
     try:
-        payment_service = PaymentService()
-        
         # Get shipment details to calculate amount
         shipment_data = await db.shipments.find_one({
             "id": request.shipment_id,
@@ -299,14 +293,14 @@ async def process_payment(
         shipping_charges = shipment_data.get("payment_info", {}).get("amount", 0) - shipment_value
         
         # Calculate breakdown
-        breakdown = await payment_service.calculate_payment_breakdown(
+        breakdown = await _payment_service.calculate_payment_breakdown(
             shipment_value, shipping_charges, request.payment_method, current_user.id, db
         )
         
         # Process based on payment method
         if request.payment_method == PaymentMethod.COD:
             # Process COD payment
-            payment_response = await payment_service.process_cod_payment(
+            payment_response = await _payment_service.process_cod_payment(
                 request.shipment_id, current_user.id, breakdown.total_amount, db
             )
         elif request.payment_method == PaymentMethod.WALLET:
@@ -320,7 +314,7 @@ async def process_payment(
                 customer_name=current_user.name,
                 description=f"Payment for shipment {request.shipment_id}"
             )
-            payment_response = await payment_service.create_payment(payment_data, current_user.id, db)
+            payment_response = await _payment_service.create_payment(payment_data, current_user.id, db)
         else:
             # Process gateway payment
             payment_data = PaymentCreate(
@@ -332,7 +326,7 @@ async def process_payment(
                 customer_name=current_user.name,
                 description=f"Payment for shipment {request.shipment_id}"
             )
-            payment_response = await payment_service.create_payment(payment_data, current_user.id, db)
+            payment_response = await _payment_service.create_payment(payment_data, current_user.id, db)
         
         return {
             "success": True,
@@ -404,8 +398,7 @@ async def get_payment_details(
     """Get payment details by ID."""
     
     try:
-        payment_service = PaymentService()
-        payment = await payment_service.get_payment(payment_id, current_user.id, db)
+        payment = await _payment_service.get_payment(payment_id, current_user.id, db)
         
         if not payment:
             raise HTTPException(
@@ -437,8 +430,7 @@ async def create_refund(
     """Request refund for a payment."""
     
     try:
-        payment_service = PaymentService()
-        refund_response = await payment_service.create_refund(refund_request, current_user.id, db)
+        refund_response = await _payment_service.create_refund(refund_request, current_user.id, db)
         
         return {
             "success": True,
@@ -465,8 +457,7 @@ async def get_payment_analytics(
     """Get payment analytics summary."""
     
     try:
-        payment_service = PaymentService()
-        analytics = await payment_service.get_payment_analytics(current_user.id, days, db)
+        analytics = await _payment_service.get_payment_analytics(current_user.id, days, db)
         
         return {
             "success": True,
@@ -499,8 +490,7 @@ async def razorpay_webhook(
             payload=payload
         )
         
-        payment_service = PaymentService()
-        success = await payment_service.process_webhook(webhook_data, db)
+        success = await _payment_service.process_webhook(webhook_data, db)
         
         return {
             "success": success,
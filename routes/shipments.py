@@ -22,6 +22,9 @@ async def get_database() -> AsyncIOMotorDatabase:
 
 router = APIRouter(prefix="/shipments", tags=["Shipments"])
 
+# Stateless service shared by all handlers
+_payment_service = PaymentService()
+
 @router.post("/", response_model=ShipmentResponse)
 async def create_shipment(
     shipment_data: ShipmentCreate,
@@ -118,12 +121,11 @@ async def get_user_shipments(
         query["status"] = status
     
     # Find shipments
-    shipments_cursor = db.shipments.find(query).sort("created_at", -1).limit(limit).skip(skip)
-    shipments_data = await shipments_cursor.to_list(length=limit)
+    shipments_cursor = db.shipments.find(query).sort("created_at", -1).limit(limit).skip(skip).batch_size(limit)
     
     # Convert to response objects
     responses = []
-    for shipment_data in shipments_data:
+    async for shipment_data in shipments_cursor:
         shipment = Shipment(**shipment_data)
         response = ShipmentResponse(
             id=shipment.id,
@@ -252,8 +254,7 @@ async def initiate_payment(
         )
     
     # Create payment order
-    payment_service = PaymentService()
-    payment_order = await payment_service.create_payment_order(
+    payment_order = await _payment_service.create_payment_order(
         amount=shipment.payment_info.amount,
         order_id=shipment.id
     )
@@ -1,21 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from typing import Optional, List, Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.responses import ORJSONResponse
+from typing import Optional, List, Dict, Any, Tuple, Union
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from pydantic import BaseModel
+from bson import ObjectId
+from pymongo.errors import ExecutionTimeout
+from datetime import datetime, timezone
+from functools import lru_cache
+import asyncio
+import base64
+import re
 
+from models.shipment import Shipment, parse_stored_datetime
 from models.user import User
-from services.tracking_service import TrackingService
+from services.tracking_service import TrackingService, TRACKING_INFO_PROJECTION
 from utils.auth import get_optional_current_user, get_current_user
+from utils.cache import TTLCache
+from utils.database import get_database
 
 # Request/Response models
 class BulkTrackingRequest(BaseModel):
     awb_numbers: List[str]
 
-class TrackingResponse(BaseModel):
-    success: bool
-    data: Optional[Dict[str, Any]] = None
-    error: Optional[str] = None
-
 class NotificationSetupRequest(BaseModel):
     email: Optional[str] = None
     phone: Optional[str] = None
@@ -24,36 +30,124 @@ class NotificationSetupRequest(BaseModel):
 class CarrierSyncRequest(BaseModel):
     carrier_name: Optional[str] = None
 
-# Database dependency
-async def get_database() -> AsyncIOMotorDatabase:
-    from motor.motor_asyncio import AsyncIOMotorClient
-    import os
-    mongo_url = os.environ['MONGO_URL']
-    client = AsyncIOMotorClient(mongo_url)
-    return client[os.environ.get('DB_NAME', 'xfas_logistics')]
+router = APIRouter(prefix="/tracking", tags=["Tracking"], default_response_class=ORJSONResponse)
+
+# Stateless service shared by all handlers
+_tracking_service = TrackingService()
+
+# Status distribution payloads keyed by user_id (None for the public view)
+_status_distribution_cache = TTLCache(30, 4096)
+
+# (tracking_info, etag) for recently tracked AWBs; pollers hit this instead of Mongo
+_awb_tracking_cache = TTLCache(5, 10000)
+
+async def ensure_tracking_indexes(db: AsyncIOMotorDatabase):
+    """Ensure indexes backing the tracking search exist."""
+    # Serves /search: whole-word matches on identifiers and party names
+    await db.shipments.create_index([
+        ("carrier_info.tracking_number", "text"),
+        ("shipment_number", "text"),
+        ("custom_reference", "text"),
+        ("sender.name", "text"),
+        ("recipient.name", "text")
+    ], name="shipments_text")
+    await db.shipments.create_index("shipment_number")
+    # Keyset pagination of /search results, anonymous and per user
+    await db.shipments.create_index([("created_at", -1), ("_id", -1)])
+    await db.shipments.create_index([("user_id", 1), ("created_at", -1), ("_id", -1)])
+    # Lets the anonymous /status-distribution group straight off the index
+    await db.shipments.create_index("status")
+    # AWB equality lookups and the anchored prefix fallback; drafts have no AWB yet.
+    # Built last: existing duplicate AWBs fail this build without blocking the others
+    await db.shipments.create_index(
+        "carrier_info.tracking_number",
+        unique=True,
+        partialFilterExpression={"carrier_info.tracking_number": {"$type": "string"}},
+        name="awb_unique"
+    )
+
+# Server-side budgets; a query that runs over is killed by mongod and
+# surfaces as a 503 through the app's ExecutionTimeout handler
+SEARCH_MAX_TIME_MS = 1500
+STATUS_DISTRIBUTION_MAX_TIME_MS = 2000
+
+# Upper bound for the optional /search total before it is reported as unknown
+SEARCH_COUNT_MAX_TIME_MS = 500
+
+# Shown by /validate-awb alongside the verdict
+AWB_EXPECTED_FORMATS = (
+    "XF + 10 digits (XFas)",
+    "FX + 10 digits (FedEx)",
+    "DH + 10 digits (DHL)",
+    "AR + 10 digits (Aramex)",
+    "UP + 10 digits (UPS)",
+    "10-15 digits (Generic)"
+)
+
+# Longest /validate-awb input memoized; every accepted format is at most 15 characters
+AWB_VALIDATION_CACHE_MAX_LENGTH = 20
+
+# Public tracking payloads may be reused briefly by browsers and proxies
+TRACKING_CACHE_CONTROL = "public, max-age=15"
+
+def _shipment_etag(updated_at: Union[datetime, str]) -> str:
+    """Weak validator that changes whenever the shipment is updated."""
+    return f'W/"{parse_stored_datetime(updated_at).isoformat()}"'
+
+async def _check_not_modified(request: Request, db: AsyncIOMotorDatabase, awb_filter: Dict[str, Any]) -> Optional[Response]:
+    """Answer a conditional GET from updated_at alone, before loading the shipment.
+    
+    Returns a 304 response when the client's If-None-Match is still current.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    
+    stamp = await db.shipments.find_one(awb_filter, {"_id": 0, "updated_at": 1})
+    if not stamp:
+        return None
+    
+    etag = _shipment_etag(stamp["updated_at"])
+    if if_none_match != etag:
+        return None
+    
+    return _not_modified(etag)
 
-router = APIRouter(prefix="/tracking", tags=["Tracking"])
+def _not_modified(etag: str) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": TRACKING_CACHE_CONTROL}
+    )
 
 
 @router.get("/awb/{awb}")
 async def track_single_awb(
     awb: str,
+    request: Request,
+    response: Response,
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Track a single shipment by AWB number (public endpoint)."""
     
-    try:
-        tracking_service = TrackingService()
+    # Validate AWB format
+    if not _tracking_service.validate_awb_format(awb):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid AWB format"
+        )
+    
+    awb_key = awb.upper()
+    cached = _awb_tracking_cache.get(awb_key)
+    
+    if cached is None:
+        awb_filter = {"carrier_info.tracking_number": awb_key}
         
-        # Validate AWB format
-        if not tracking_service.validate_awb_format(awb):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid AWB format"
-            )
+        not_modified = await _check_not_modified(request, db, awb_filter)
+        if not_modified:
+            return not_modified
         
         # Find shipment by AWB
-        shipment_data = await db.shipments.find_one({"carrier_info.tracking_number": awb.upper()})
+        shipment_data = await db.shipments.find_one(awb_filter, TRACKING_INFO_PROJECTION)
         
         if not shipment_data:
             raise HTTPException(
@@ -61,24 +155,23 @@ async def track_single_awb(
                 detail="Tracking number not found"
             )
         
-        from models.shipment import Shipment
-        shipment = Shipment(**shipment_data)
+        shipment = Shipment.from_document(shipment_data)
         
         # Get enhanced tracking info
-        tracking_info = tracking_service.get_enhanced_tracking_info(shipment)
-        
-        return TrackingResponse(
-            success=True,
-            data=tracking_info
-        )
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error tracking shipment: {str(e)}"
-        )
+        cached = (_tracking_service.get_enhanced_tracking_info(shipment), _shipment_etag(shipment.updated_at))
+        _awb_tracking_cache.set(awb_key, cached)
+    
+    tracking_info, etag = cached
+    if request.headers.get("if-none-match") == etag:
+        return _not_modified(etag)
+    
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = TRACKING_CACHE_CONTROL
+    
+    return {
+        "success": True,
+        "data": tracking_info
+    }
 
 @router.post("/bulk")
 async def track_multiple_awbs(
@@ -87,105 +180,163 @@ async def track_multiple_awbs(
 ):
     """Track multiple shipments by AWB numbers (public endpoint)."""
     
-    try:
-        if not request.awb_numbers:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="At least one AWB number is required"
-            )
-        
-        if len(request.awb_numbers) > 50:  # Limit bulk tracking to 50 AWBs
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Maximum 50 AWB numbers allowed per request"
-            )
-        
-        tracking_service = TrackingService()
-        
-        # Track multiple AWBs
-        results = await tracking_service.track_multiple_awbs(request.awb_numbers, db)
-        
-        return TrackingResponse(
-            success=True,
-            data=results
+    if not request.awb_numbers:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="At least one AWB number is required"
         )
-        
-    except HTTPException:
-        raise
-    except Exception as e:
+    
+    if len(request.awb_numbers) > 50:  # Limit bulk tracking to 50 AWBs
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error tracking shipments: {str(e)}"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Maximum 50 AWB numbers allowed per request"
         )
+    
+    # Track multiple AWBs
+    results = await _tracking_service.track_multiple_awbs(request.awb_numbers, db)
+    
+    # Returned as a response so the nested payload goes straight to orjson
+    # instead of first being walked by jsonable_encoder
+    return ORJSONResponse({
+        "success": True,
+        "data": results
+    })
+
+def _encode_search_cursor(mode: str, shipment_data: Dict[str, Any]) -> str:
+    """Opaque keyset cursor pointing just past ``shipment_data``."""
+    created_at = parse_stored_datetime(shipment_data['created_at'])
+    raw = f"{mode}|{created_at.isoformat()}|{shipment_data['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_search_cursor(cursor: str) -> Tuple[str, datetime, ObjectId]:
+    """Inverse of _encode_search_cursor; raises ValueError on malformed input."""
+    try:
+        mode, created_at, last_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return mode, datetime.fromisoformat(created_at), ObjectId(last_id)
+    except Exception as e:
+        raise ValueError("Invalid search cursor") from e
 
 @router.get("/search")
 async def search_shipments(
     q: str = Query(..., description="Search query (AWB, shipment number, or reference)"),
     limit: int = Query(20, le=100),
-    offset: int = Query(0, ge=0),
+    after: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    include_count: bool = Query(False, description="Also return the total number of matches"),
     current_user: Optional[User] = Depends(get_optional_current_user),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Search shipments by various criteria."""
     
-    try:
-        # Build search query
-        search_conditions = []
-        
-        # Search by AWB
-        search_conditions.append({"carrier_info.tracking_number": {"$regex": q, "$options": "i"}})
-        
-        # Search by shipment number
-        search_conditions.append({"shipment_number": {"$regex": q, "$options": "i"}})
-        
-        # Search by custom reference
-        search_conditions.append({"custom_reference": {"$regex": q, "$options": "i"}})
-        
-        # Search by sender/recipient names
-        search_conditions.append({"sender.name": {"$regex": q, "$options": "i"}})
-        search_conditions.append({"recipient.name": {"$regex": q, "$options": "i"}})
-        
-        query = {"$or": search_conditions}
+    mode = "text"
+    keyset = None
+    if after:
+        try:
+            mode, created_at, last_id = _decode_search_cursor(after)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
         
-        # If user is authenticated, show only their shipments, otherwise show public shipments
+        # Resume strictly after the last shipment of the previous page
+        keyset = {"$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": last_id}}
+        ]}
+    
+    async def fetch_page(query: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if keyset:
+            query = {"$and": [query, keyset]}
+        cursor = db.shipments.find(query, TRACKING_INFO_PROJECTION).sort([("created_at", -1), ("_id", -1)]).limit(limit + 1).batch_size(limit + 1).max_time_ms(SEARCH_MAX_TIME_MS)
+        return [shipment_data async for shipment_data in cursor]
+    
+    async def count_matches(query: Dict[str, Any]) -> Optional[int]:
+        # Counting walks every match; give up rather than hold the page back
+        try:
+            return await db.shipments.count_documents(query, maxTimeMS=SEARCH_COUNT_MAX_TIME_MS)
+        except ExecutionTimeout:
+            return None
+    
+    async def fetch(query: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        # The page and the count are independent round trips, so overlap them
+        if include_count:
+            return await asyncio.gather(fetch_page(query), count_matches(query))
+        return await fetch_page(query), None
+    
+    # Anything shaped like an AWB is an exact lookup on the unique index
+    if not after and _tracking_service.validate_awb_format(q):
+        query = {"carrier_info.tracking_number": q.strip().upper()}
         if current_user:
             query["user_id"] = current_user.id
         
-        # Execute search
-        shipments_cursor = db.shipments.find(query).sort("created_at", -1).limit(limit).skip(offset)
-        shipments_data = await shipments_cursor.to_list(length=limit)
-        
-        # Get total count
-        total_count = await db.shipments.count_documents(query)
-        
-        # Process results
-        tracking_service = TrackingService()
-        results = []
-        
-        for shipment_data in shipments_data:
-            from models.shipment import Shipment
-            shipment = Shipment(**shipment_data)
-            tracking_info = tracking_service.get_enhanced_tracking_info(shipment)
-            results.append(tracking_info)
-        
-        return {
-            "success": True,
-            "data": {
-                "results": results,
-                "total_count": total_count,
+        shipment_data = await db.shipments.find_one(query, TRACKING_INFO_PROJECTION)
+        if shipment_data:
+            data = {
+                "results": [_tracking_service.get_enhanced_tracking_info(Shipment.from_document(shipment_data))],
                 "page_info": {
                     "limit": limit,
-                    "offset": offset,
-                    "has_more": total_count > (offset + limit)
+                    "has_more": False,
+                    "next_cursor": None
                 }
             }
-        }
+            if include_count:
+                data["total_count"] = 1
+            
+            return {
+                "success": True,
+                "data": data
+            }
+    
+    # Full-word matches come from the text index
+    query = {"$text": {"$search": q}}
+    
+    # If user is authenticated, show only their shipments, otherwise show public shipments
+    if current_user:
+        query["user_id"] = current_user.id
+    
+    shipments_data, total_count = await fetch(query) if mode == "text" else ([], None)
+    
+    if mode == "text" and not shipments_data and keyset is None:
+        mode = "prefix"
+    
+    if mode == "prefix":
+        # Partial AWB / shipment numbers: both are stored uppercase, so an
+        # uppercased, anchored, case-sensitive prefix matches any input case
+        # and still seeks on the btree indexes
+        prefix = re.compile("^" + re.escape(q.strip().upper()))
+        query = {"$or": [
+            {"carrier_info.tracking_number": prefix},
+            {"shipment_number": prefix}
+        ]}
+        if current_user:
+            query["user_id"] = current_user.id
         
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error searching shipments: {str(e)}"
-        )
+        shipments_data, total_count = await fetch(query)
+    
+    # One extra document tells us whether another page exists
+    has_more = len(shipments_data) > limit
+    shipments_data = shipments_data[:limit]
+    
+    # Process results
+    results = _tracking_service.get_enhanced_tracking_info_batch(shipments_data)
+    
+    data = {
+        "results": results,
+        "page_info": {
+            "limit": limit,
+            "has_more": has_more,
+            "next_cursor": _encode_search_cursor(mode, shipments_data[-1]) if has_more else None
+        }
+    }
+    
+    # None when the count did not finish within SEARCH_COUNT_MAX_TIME_MS
+    if include_count:
+        data["total_count"] = total_count
+    
+    return {
+        "success": True,
+        "data": data
+    }
 
 @router.get("/analytics")
 async def get_tracking_analytics(
@@ -194,111 +345,102 @@ async def get_tracking_analytics(
 ):
     """Get tracking analytics for authenticated user."""
     
-    try:
-        tracking_service = TrackingService()
-        analytics = await tracking_service.get_tracking_analytics(current_user.id, db)
-        
-        return TrackingResponse(
-            success=True,
-            data=analytics
-        )
-        
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error getting analytics: {str(e)}"
-        )
+    analytics = await _tracking_service.get_tracking_analytics(current_user.id, db)
+    
+    return {
+        "success": True,
+        "data": analytics
+    }
 
 @router.get("/validate-awb/{awb}")
-async def validate_awb_format(awb: str):
+async def validate_awb_format(awb: str, response: Response):
     """Validate AWB format (public endpoint)."""
     
-    try:
-        tracking_service = TrackingService()
-        is_valid = tracking_service.validate_awb_format(awb)
-        
-        return {
-            "success": True,
-            "data": {
-                "awb": awb,
-                "is_valid": is_valid,
-                "format_info": {
-                    "length": len(awb),
-                    "pattern": "Valid AWB format" if is_valid else "Invalid AWB format",
-                    "expected_formats": [
-                        "XF + 10 digits (XFas)",
-                        "FX + 10 digits (FedEx)",
-                        "DH + 10 digits (DHL)",
-                        "AR + 10 digits (Aramex)",
-                        "UP + 10 digits (UPS)",
-                        "10-15 digits (Generic)"
-                    ]
-                }
+    # The answer depends only on the path, so it can be cached for a long time
+    response.headers["Cache-Control"] = "public, max-age=86400"
+    
+    # Only plausible AWBs are memoized, so long junk paths can't pin memory
+    if len(awb.strip()) <= AWB_VALIDATION_CACHE_MAX_LENGTH:
+        return _cached_awb_validation_payload(awb)
+    return _awb_validation_payload(awb)
+
+def _awb_validation_payload(awb: str) -> Dict[str, Any]:
+    """Build the /validate-awb response."""
+    is_valid = _tracking_service.validate_awb_format(awb)
+    
+    return {
+        "success": True,
+        "data": {
+            "awb": awb,
+            "is_valid": is_valid,
+            "format_info": {
+                "length": len(awb),
+                "pattern": "Valid AWB format" if is_valid else "Invalid AWB format",
+                "expected_formats": AWB_EXPECTED_FORMATS
             }
         }
-        
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error validating AWB: {str(e)}"
-        )
+    }
+
+_cached_awb_validation_payload = lru_cache(maxsize=65536)(_awb_validation_payload)
 
 @router.get("/status-distribution")
 async def get_status_distribution(
+    response: Response,
     current_user: Optional[User] = Depends(get_optional_current_user),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get shipment status distribution (public endpoint, filtered by user if authenticated)."""
     
-    try:
-        query = {}
-        if current_user:
-            query["user_id"] = current_user.id
-        
-        # Aggregate status distribution
-        pipeline = [
-            {"$match": query},
-            {"$group": {
-                "_id": "$status",
-                "count": {"$sum": 1}
-            }},
-            {"$sort": {"count": -1}}
-        ]
-        
-        cursor = db.shipments.aggregate(pipeline)
-        status_data = await cursor.to_list(length=50)
-        
-        # Format response
-        distribution = {}
-        total_count = 0
-        
-        for item in status_data:
-            status = item["_id"]
-            count = item["count"]
-            distribution[status] = count
-            total_count += count
-        
-        # Calculate percentages
-        distribution_with_percentages = {}
-        for status, count in distribution.items():
-            distribution_with_percentages[status] = {
-                "count": count,
-                "percentage": round((count / total_count) * 100, 2) if total_count > 0 else 0
-            }
-        
+    # Matches the server-side cache; per-user counts must not be shared
+    response.headers["Cache-Control"] = "private, max-age=30" if current_user else "public, max-age=30"
+    # Shared caches must key on the caller, or they could hand site-wide counts to a signed-in user
+    response.headers["Vary"] = "Authorization"
+    
+    cache_key = current_user.id if current_user else None
+    cached = _status_distribution_cache.get(cache_key)
+    if cached is not None:
         return {
             "success": True,
-            "data": {
-                "total_shipments": total_count,
-                "distribution": distribution_with_percentages
-            }
+            "data": cached
         }
-        
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error getting status distribution: {str(e)}"
-        )
+    
+    query = {}
+    if current_user:
+        query["user_id"] = current_user.id
+    
+    # Aggregate status distribution
+    pipeline = [
+        {"$match": query},
+        {"$group": {
+            "_id": "$status",
+            "count": {"$sum": 1}
+        }},
+        {"$sort": {"count": -1}}
+    ]
+    
+    cursor = db.shipments.aggregate(pipeline, maxTimeMS=STATUS_DISTRIBUTION_MAX_TIME_MS)
+    status_data = await cursor.to_list(length=50)
+    
+    # Format response in a single pass; percentages kept to two decimals
+    total_count = sum(item["count"] for item in status_data)
+    distribution = {
+        item["_id"]: {
+            "count": item["count"],
+            "percentage": item["count"] * 10000 // total_count / 100
+        }
+        for item in status_data
+    }
+    
+    data = {
+        "total_shipments": total_count,
+        "distribution": distribution
+    }
+    _status_distribution_cache.set(cache_key, data)
+    
+    return {
+        "success": True,
+        "data": data
+    }
 
 @router.post("/notify/{awb}")
 async def setup_tracking_notifications(
@@ -308,102 +450,112 @@ async def setup_tracking_notifications(
 ):
     """Setup tracking notifications for a shipment (public endpoint)."""
     
-    try:
-        # Find shipment
-        shipment_data = await db.shipments.find_one({"carrier_info.tracking_number": awb.upper()})
-        
-        if not shipment_data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Tracking number not found"
-            )
-        
-        from services.notification_service import NotificationService
-        notification_service = NotificationService()
-        
-        # Setup notifications
-        result = await notification_service.setup_tracking_notifications(
-            shipment_id=shipment_data["id"],
-            email=notification_request.email,
-            phone=notification_request.phone,
-            notification_types=notification_request.notification_types,
-            db=db
+    # Find shipment
+    shipment_data = await db.shipments.find_one(
+        {"carrier_info.tracking_number": awb.upper()},
+        {"_id": 0, "id": 1}
+    )
+    
+    if not shipment_data:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Tracking number not found"
         )
-        
-        return {
-            "success": True,
-            "data": {
-                "message": "Notifications setup successfully",
-                "notification_id": result["notification_id"],
-                "awb": awb,
-                "email": notification_request.email,
-                "phone": notification_request.phone,
-                "types": notification_request.notification_types
-            }
+    
+    from services.notification_service import NotificationService
+    notification_service = NotificationService()
+    
+    # Setup notifications
+    result = await notification_service.setup_tracking_notifications(
+        shipment_id=shipment_data["id"],
+        email=notification_request.email,
+        phone=notification_request.phone,
+        notification_types=notification_request.notification_types,
+        db=db
+    )
+    
+    return {
+        "success": True,
+        "data": {
+            "message": "Notifications setup successfully",
+            "notification_id": result["notification_id"],
+            "awb": awb,
+            "email": notification_request.email,
+            "phone": notification_request.phone,
+            "types": notification_request.notification_types
         }
-        
-    except HTTPException:
-        raise
-    except Exception as e:
+    }
+
+@lru_cache(maxsize=4096)
+def _parse_client_timestamp(value: str) -> datetime:
+    """Parse an ISO timestamp from a polling client into naive UTC.
+    
+    Pollers resend the same value until something changes, so parses are memoized.
+    """
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error setting up notifications: {str(e)}"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid last_update timestamp"
         )
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
 
 @router.get("/real-time/{awb}")
 async def get_real_time_updates(
     awb: str,
+    request: Request,
+    response: Response,
     last_update: Optional[str] = Query(None, description="ISO timestamp of last known update"),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get real-time updates for a shipment (public endpoint)."""
     
-    try:
-        # Find shipment
-        shipment_data = await db.shipments.find_one({"carrier_info.tracking_number": awb.upper()})
-        
-        if not shipment_data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Tracking number not found"
-            )
-        
-        from models.shipment import Shipment
-        shipment = Shipment(**shipment_data)
-        
-        # Check if there are new updates
-        has_updates = False
-        if last_update:
-            from datetime import datetime
-            last_update_dt = datetime.fromisoformat(last_update.replace('Z', '+00:00'))
-            has_updates = shipment.updated_at > last_update_dt
-        else:
-            has_updates = True
-        
-        tracking_service = TrackingService()
-        
-        response_data = {
-            "awb": awb,
-            "has_updates": has_updates,
-            "last_checked": datetime.utcnow().isoformat(),
-            "shipment_data": None
-        }
-        
-        if has_updates:
-            response_data["shipment_data"] = tracking_service.get_enhanced_tracking_info(shipment)
-        
-        return {
-            "success": True,
-            "data": response_data
-        }
-        
-    except HTTPException:
-        raise
-    except Exception as e:
+    awb_filter = {"carrier_info.tracking_number": awb.upper()}
+    
+    # If-None-Match is the header form of last_update
+    not_modified = await _check_not_modified(request, db, awb_filter)
+    if not_modified:
+        return not_modified
+    
+    # Find shipment
+    shipment_data = await db.shipments.find_one(awb_filter, TRACKING_INFO_PROJECTION)
+    
+    if not shipment_data:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error getting real-time updates: {str(e)}"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Tracking number not found"
         )
+    
+    shipment = Shipment.from_document(shipment_data)
+    
+    # Check if there are new updates
+    has_updates = False
+    if last_update:
+        last_update_dt = _parse_client_timestamp(last_update)
+        has_updates = shipment.updated_at > last_update_dt
+    else:
+        has_updates = True
+    
+    response_data = {
+        "awb": awb,
+        "has_updates": has_updates,
+        "last_checked": datetime.utcnow().isoformat(),
+        "shipment_data": None
+    }
+    
+    if has_updates:
+        response_data["shipment_data"] = _tracking_service.get_enhanced_tracking_info(shipment)
+    
+    response.headers["ETag"] = _shipment_etag(shipment.updated_at)
+    response.headers["Cache-Control"] = TRACKING_CACHE_CONTROL
+    
+    return {
+        "success": True,
+        "data": response_data
+    }
 
 @router.post("/carrier-sync")
 async def sync_carrier_data(
@@ -412,26 +564,17 @@ async def sync_carrier_data(
 ):
     """Sync tracking data from carrier APIs (admin endpoint - public for demo)."""
     
-    try:
-        tracking_service = TrackingService()
-        
-        carrier_name = None
-        if sync_request and sync_request.carrier_name:
-            carrier_name = sync_request.carrier_name
-        
-        # Sync carrier data
-        result = await tracking_service.sync_all_carriers(db, carrier_name)
-        
-        return {
-            "success": True,
-            "data": result
-        }
-        
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error syncing carrier data: {str(e)}"
-        )
+    carrier_name = None
+    if sync_request and sync_request.carrier_name:
+        carrier_name = sync_request.carrier_name
+    
+    # Sync carrier data
+    result = await _tracking_service.sync_all_carriers(db, carrier_name)
+    
+    return {
+        "success": True,
+        "data": result
+    }
 
 class NotificationSetupRequest(BaseModel):
     email: Optional[str] = None
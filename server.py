@@ -2,10 +2,13 @@
 import warnings
 warnings.filterwarnings("ignore", message=".*trapped.*error reading bcrypt version.*", category=UserWarning, module="passlib.handlers.bcrypt")
 
-from fastapi import FastAPI, APIRouter, Depends, HTTPException
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse
+from pymongo.errors import ExecutionTimeout
 from fastapi.security import HTTPBearer
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from starlette.middleware.gzip import GZipMiddleware
+from motor.motor_asyncio import AsyncIOMotorDatabase
 import logging
 from pydantic import BaseModel, Field
 from typing import List
@@ -16,20 +19,24 @@ from datetime import datetime
 from config import config
 
 # Import route modules
-from routes.auth import router as auth_router
-from routes.quotes import router as quotes_router
+from routes.auth import router as auth_router, ensure_otp_indexes
+from routes.quotes import router as quotes_router, ensure_quote_indexes
 from routes.shipments import router as shipments_router
 from routes.booking import router as booking_router
-from routes.tracking import router as tracking_router
+from routes.tracking import router as tracking_router, ensure_tracking_indexes
 from routes.dashboard import router as dashboard_router
 from routes.admin import router as admin_router
-from routes.blog import router as blog_router
-from routes.payment import router as payment_router
+from routes.blog import router as blog_router, ensure_blog_indexes
+from routes.payment import router as payment_router, ensure_payment_indexes
 from routes.payments import router as payments_router
 from routes.profile import router as profile_router
-from routes.orders import router as orders_router
+from routes.orders import router as orders_router, ensure_order_indexes
 from routes.address_book import router as address_book_router
 from routes.razorpay_routes import router as razorpay_router
+from services.otp_service import close_otp_service
+from services.sms_service import close_sms_service
+from services.priority_connections_service import close_priority_connections
+from utils.database import get_client, close_client
 
 # Configure logging using config
 logging.basicConfig(
@@ -52,14 +59,8 @@ def create_database_connection():
     
     if client is None:
         try:
-            client = AsyncIOMotorClient(
-                config.get_database_url(), 
-                serverSelectionTimeoutMS=config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
-                connectTimeoutMS=config.MONGO_CONNECT_TIMEOUT_MS,
-                socketTimeoutMS=config.MONGO_SOCKET_TIMEOUT_MS,
-                maxPoolSize=config.MONGO_MAX_POOL_SIZE,
-                retryWrites=True
-            )
+            # Same pool as the routes using utils.database.get_database
+            client = get_client()
             db = client[config.DB_NAME]
             logger.info("MongoDB client created successfully")
         except Exception as e:
@@ -76,6 +77,24 @@ app = FastAPI(
     version=config.API_VERSION
 )
 
+# Queries that exceed their maxTimeMS budget are reported as temporary overload
+@app.exception_handler(ExecutionTimeout)
+async def query_timeout_handler(request: Request, exc: ExecutionTimeout):
+    logger.warning(f"Query time limit exceeded on {request.method} {request.url.path}")
+    return JSONResponse(
+        status_code=503,
+        content={"success": False, "detail": "Request took too long, please try again"}
+    )
+
+# Last-resort handler so routes only need to raise their own HTTPExceptions
+@app.exception_handler(Exception)
+async def unhandled_exception_handler(request: Request, exc: Exception):
+    logger.exception(f"Unhandled error on {request.method} {request.url.path}")
+    return JSONResponse(
+        status_code=500,
+        content={"success": False, "detail": "Internal server error"}
+    )
+
 # Create a router with the configured API prefix
 api_router = APIRouter(prefix=config.API_PREFIX)
 
@@ -172,6 +191,9 @@ app.add_middleware(
     allow_headers=config.CORS_ALLOW_HEADERS if config.CORS_ALLOW_HEADERS != ['*'] else ["*"],
 )
 
+# Compress larger bodies (label/invoice PDFs, listings) on the way out
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 # Filter out bcrypt warning from passlib
 class BcryptWarningFilter(logging.Filter):
     def filter(self, record):
@@ -181,11 +203,26 @@ class BcryptWarningFilter(logging.Filter):
 logging.getLogger('passlib.handlers.bcrypt').addFilter(BcryptWarningFilter())
 logging.getLogger('passlib.handlers.bcrypt').setLevel(logging.ERROR)
 
+@app.on_event("startup")
+async def create_db_indexes():
+    database = create_database_connection()
+    if database is None:
+        return
+    for ensure_indexes in (ensure_order_indexes, ensure_payment_indexes, ensure_quote_indexes, ensure_tracking_indexes, ensure_blog_indexes, ensure_otp_indexes):
+        try:
+            await ensure_indexes(database)
+        except Exception as e:
+            logger.warning(f"Index creation failed in {ensure_indexes.__name__}: {e}")
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    global client
-    if client is not None:
-        client.close()
+    global client, db
+    await close_otp_service()
+    await close_sms_service()
+    await close_priority_connections()
+    close_client()
+    client = None
+    db = None
 
 
 # Main entry point for running the server
@@ -10,6 +10,11 @@ from models.admin import (
 )
 from models.shipment import ShipmentStatus
 from models.user import User
+from utils.search import literal_search_conditions
+
+# Fields matched by the admin search boxes
+USER_SEARCH_FIELDS = ("first_name", "last_name", "email")
+BOOKING_SEARCH_FIELDS = ("shipment_number", "carrier_info.tracking_number", "sender.name", "recipient.name")
 
 class AdminService:
     def __init__(self):
@@ -428,11 +433,7 @@ class AdminService:
         
         query = {}
         if search:
-            query["$or"] = [
-                {"first_name": {"$regex": search, "$options": "i"}},
-                {"last_name": {"$regex": search, "$options": "i"}},
-                {"email": {"$regex": search, "$options": "i"}}
-            ]
+            query["$or"] = literal_search_conditions(USER_SEARCH_FIELDS, search)
         
         # Get users with shipment statistics
         pipeline = [
@@ -507,12 +508,7 @@ class AdminService:
             query["status"] = status_filter
         
         if search:
-            query["$or"] = [
-                {"shipment_number": {"$regex": search, "$options": "i"}},
-                {"carrier_info.tracking_number": {"$regex": search, "$options": "i"}},
-                {"sender.name": {"$regex": search, "$options": "i"}},
-                {"recipient.name": {"$regex": search, "$options": "i"}}
-            ]
+            query["$or"] = literal_search_conditions(BOOKING_SEARCH_FIELDS, search)
         
         # Get bookings with user info
         pipeline = [
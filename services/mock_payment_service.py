@@ -4,6 +4,7 @@ Simulates Razorpay payments without actual API calls
 """
 
 import time
+import itertools
 import hashlib
 import hmac
 from typing import Dict, Any, Optional
@@ -12,12 +13,17 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Suffix that keeps IDs generated within the same clock tick distinct
+_ID_SEQUENCE = itertools.count()
+
 class MockPaymentService:
     """Mock payment service that simulates Razorpay for development"""
     
     def __init__(self):
         self.mock_key_id = "rzp_test_mock_development"
         self.mock_key_secret = "mock_secret_for_development"
+        # Keyed once; verify_payment copies it instead of re-deriving the key pads
+        self._hmac_template = hmac.new(self.mock_key_secret.encode('utf-8'), digestmod=hashlib.sha256)
         logger.info("Mock Payment Service initialized for development")
     
     def is_configured(self) -> bool:
@@ -31,8 +37,9 @@ class MockPaymentService:
             amount_paise = int(amount * 100)
             
             # Generate mock order ID
-            timestamp = int(time.time())
-            order_id = f"order_mock_{timestamp}"
+            now_ns = time.time_ns()
+            timestamp = now_ns // 1_000_000_000
+            order_id = f"order_mock_{now_ns}_{next(_ID_SEQUENCE)}"
             
             # Create mock order response
             order = {
@@ -72,14 +79,12 @@ class MockPaymentService:
             
             # Generate expected signature for validation
             payload = f"{razorpay_order_id}|{razorpay_payment_id}"
-            expected_signature = hmac.new(
-                self.mock_key_secret.encode('utf-8'),
-                payload.encode('utf-8'),
-                hashlib.sha256
-            ).hexdigest()
+            signer = self._hmac_template.copy()
+            signer.update(payload.encode('utf-8'))
+            expected_signature = signer.hexdigest()
             
-            # For mock, be lenient with signature verification
-            is_valid = len(razorpay_signature) > 10  # Just check it's not empty
+            # Same constant-time check as the real Razorpay verification
+            is_valid = hmac.compare_digest(expected_signature, razorpay_signature)
             logger.info(f"Mock signature verification: {is_valid}")
             
             return is_valid
@@ -92,7 +97,8 @@ class MockPaymentService:
         """Get mock payment details"""
         try:
             # Generate mock payment details
-            timestamp = int(time.time())
+            now_ns = time.time_ns()
+            timestamp = now_ns // 1_000_000_000
             
             payment_details = {
                 "id": payment_id,
@@ -100,7 +106,7 @@ class MockPaymentService:
                 "amount": 100000,  # ₹1000 in paise
                 "currency": "INR",
                 "status": "captured",
-                "order_id": f"order_mock_{timestamp}",
+                "order_id": f"order_mock_{now_ns}_{next(_ID_SEQUENCE)}",
                 "invoice_id": None,
                 "international": False,
                 "method": "card",
@@ -152,8 +158,9 @@ class MockPaymentService:
     async def refund_payment(self, payment_id: str, amount: Optional[float] = None) -> Dict[str, Any]:
         """Create mock refund"""
         try:
-            timestamp = int(time.time())
-            refund_id = f"rfnd_mock_{timestamp}"
+            now_ns = time.time_ns()
+            timestamp = now_ns // 1_000_000_000
+            refund_id = f"rfnd_mock_{now_ns}_{next(_ID_SEQUENCE)}"
             
             refund = {
                 "id": refund_id,
@@ -1,25 +1,134 @@
+import hashlib
+import hmac
 import random
-import string
+import secrets
 import asyncio
+import time
+from collections import deque
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple, Callable, Awaitable
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+
+from config import config
+from utils.cache import TTLCache
 import smtplib
 import os
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from email.message import EmailMessage
+from string import Template
 import logging
 
 logger = logging.getLogger(__name__)
 
+# SMTP settings are fixed per deployment, so read them once at import
+SMTP_HOST = os.getenv('SMTP_HOST', 'smtp.gmail.com')
+SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
+SMTP_USER = os.getenv('SMTP_USER')
+SMTP_PASSWORD = os.getenv('SMTP_PASSWORD')
+FROM_EMAIL = os.getenv('FROM_EMAIL', SMTP_USER)
+
+# Messages sent over one SMTP session before it is recycled
+SMTP_MAX_MESSAGES_PER_CONNECTION = 100
+
+# Background OTP email delivery: queue bound and retry policy
+OTP_EMAIL_QUEUE_SIZE = 1000
+OTP_EMAIL_MAX_ATTEMPTS = 5
+OTP_EMAIL_MAX_BACKOFF_SECONDS = 300
+
+# What the OTP email asks the recipient to do, by purpose
+OTP_EMAIL_PURPOSE_TEXT = {
+    'registration': 'complete your registration',
+    'login': 'log in to your account',
+    'verify_email': 'verify your email address',
+    'verify_phone': 'verify your phone number'
+}
+
+# Shorter wording for the SMS body, by purpose
+OTP_SMS_PURPOSE_TEXT = {
+    'registration': 'complete registration',
+    'login': 'login',
+    'verify_email': 'verify email',
+    'verify_phone': 'verify phone'
+}
+
+# Parsed once; CSS braces need no escaping since placeholders use $
+_OTP_EMAIL_HTML = Template("""
+<html>
+<head>
+    <style>
+        .container { font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; }
+        .header { background-color: #f97316; color: white; padding: 20px; text-align: center; }
+        .content { padding: 20px; background-color: #f9f9f9; }
+        .otp-box { background-color: #fff; padding: 20px; text-align: center; margin: 20px 0; border-radius: 8px; border: 2px dashed #f97316; }
+        .otp-code { font-size: 32px; font-weight: bold; letter-spacing: 8px; color: #f97316; }
+        .footer { background-color: #374151; color: white; padding: 15px; text-align: center; font-size: 12px; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h2>XFas Logistics</h2>
+            <p>Your OTP Verification Code</p>
+        </div>
+        <div class="content">
+            <p>Hello,</p>
+            <p>You requested an OTP to $purpose_text. Please use the code below:</p>
+            <div class="otp-box">
+                <div class="otp-code">$otp_code</div>
+            </div>
+            <p><strong>This code will expire in $minutes minutes.</strong></p>
+            <p>If you didn't request this code, please ignore this email.</p>
+        </div>
+        <div class="footer">
+            <p>&copy; 2024 XFas Logistics. All rights reserved.</p>
+            <p>This is an automated message, please do not reply to this email.</p>
+        </div>
+    </div>
+</body>
+</html>
+""")
+
+# Verification attempts allowed per identifier within the sliding window
+OTP_VERIFY_RATE_LIMIT = 5
+OTP_VERIFY_RATE_WINDOW_SECONDS = 60.0
+
+def _hash_otp(identifier: str, purpose: str, otp_code: str) -> str:
+    """Keyed digest of an OTP, so stored codes are useless without the server secret."""
+    message = f"{identifier}:{purpose}:{otp_code}".encode()
+    return hmac.new(config.OTP_HASH_SECRET.encode(), message, hashlib.sha256).hexdigest()
+
+def _is_transient_smtp_error(error: Exception) -> bool:
+    """Whether a failed send is worth retrying (4xx replies, dropped or timed out connections)."""
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return isinstance(error, (smtplib.SMTPServerDisconnected, TimeoutError, ConnectionError))
+
 class OTPService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
         self.otp_expiry_minutes = 10
         
+        # Persistent SMTP session reused across OTP emails; only touched
+        # from worker threads while holding _smtp_lock
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._smtp_messages = 0
+        self._smtp_lock = asyncio.Lock()
+        
+        # OTP emails are delivered by a background worker so request
+        # handlers never wait on SMTP
+        self.email_queue: asyncio.Queue = asyncio.Queue(maxsize=OTP_EMAIL_QUEUE_SIZE)
+        self._email_worker_task: Optional[asyncio.Task] = None
+        
+        # Recent verify timestamps per identifier; idle identifiers age out
+        self._verify_hits = TTLCache(OTP_VERIFY_RATE_WINDOW_SECONDS, 10000)
+        
+        # In-flight OTP issues by (operation, identifier, purpose); concurrent
+        # duplicate requests share one result instead of issuing again
+        self._inflight: Dict[Tuple[str, str, str], asyncio.Future] = {}
+        
     def generate_otp(self, length: int = 6) -> str:
-        """Generate a random OTP code."""
-        return ''.join(random.choices(string.digits, k=length))
+        """Generate a random OTP code from the OS CSPRNG."""
+        return f"{secrets.randbelow(10 ** length):0{length}d}"
     
     async def create_otp(self, identifier: str, purpose: str, identifier_type: str = "email") -> Dict[str, Any]:
         """
@@ -30,37 +139,103 @@ class OTPService:
             purpose: Purpose of OTP (registration, login, verify_email, verify_phone)
             identifier_type: Type of identifier (email or phone)
         """
-        otp_code = self.generate_otp()
-        expires_at = datetime.utcnow() + timedelta(minutes=self.otp_expiry_minutes)
+        return await self._singleflight(
+            ("create", identifier, purpose),
+            lambda: self._create_otp(identifier, purpose, identifier_type)
+        )
+    
+    async def _create_otp(self, identifier: str, purpose: str, identifier_type: str) -> Dict[str, Any]:
+        otp_code, otp_document = self._new_otp(identifier, purpose, identifier_type)
+        await self._persist_otp(otp_document)
         
-        otp_document = {
-            "identifier": identifier,
-            "identifier_type": identifier_type,
+        return {
             "otp_code": otp_code,
-            "purpose": purpose,
-            "expires_at": expires_at,
-            "created_at": datetime.utcnow(),
-            "is_used": False,
-            "attempts": 0,
-            "max_attempts": 3
+            "expires_at": otp_document["expires_at"],
+            "identifier": identifier,
+            "purpose": purpose
         }
+    
+    async def create_and_send_otp(self, identifier: str, purpose: str, identifier_type: str = "email") -> Dict[str, Any]:
+        """
+        Create an OTP and deliver it, storing and sending concurrently.
         
-        # Remove any existing unused OTPs for this identifier and purpose
-        await self.db.otps.delete_many({
-            "identifier": identifier,
-            "purpose": purpose,
-            "is_used": False
-        })
+        Args:
+            identifier: Email address or phone number
+            purpose: Purpose of OTP (registration, login, verify_email, verify_phone)
+            identifier_type: Type of identifier (email or phone)
+            
+        Returns:
+            Dict like create_otp's, plus a "sent" flag; raises if the OTP could not be stored
+        """
+        return await self._singleflight(
+            ("create_and_send", identifier, purpose),
+            lambda: self._create_and_send_otp(identifier, purpose, identifier_type)
+        )
+    
+    async def _create_and_send_otp(self, identifier: str, purpose: str, identifier_type: str) -> Dict[str, Any]:
+        otp_code, otp_document = self._new_otp(identifier, purpose, identifier_type)
         
-        # Store the new OTP
-        await self.db.otps.insert_one(otp_document)
+        # The code is known up front, so the write and the delivery can overlap
+        _, sent = await asyncio.gather(
+            self._persist_otp(otp_document),
+            self._dispatch_otp(identifier, otp_code, purpose, identifier_type)
+        )
         
         return {
             "otp_code": otp_code,
-            "expires_at": expires_at,
+            "expires_at": otp_document["expires_at"],
             "identifier": identifier,
-            "purpose": purpose
+            "purpose": purpose,
+            "sent": sent
+        }
+    
+    async def _singleflight(self, key: Tuple[str, str, str], operation: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Run operation once for concurrent callers with the same key, sharing its result."""
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(operation())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        
+        # Shielded so one caller disconnecting doesn't cancel the others' issue
+        return await asyncio.shield(future)
+    
+    def _new_otp(self, identifier: str, purpose: str, identifier_type: str) -> Tuple[str, Dict[str, Any]]:
+        """Generate a code and the document that stores it."""
+        otp_code = self.generate_otp()
+        now = datetime.utcnow()
+        
+        otp_document = {
+            "identifier": identifier,
+            "identifier_type": identifier_type,
+            "otp_hash": _hash_otp(identifier, purpose, otp_code),
+            "purpose": purpose,
+            "expires_at": now + timedelta(minutes=self.otp_expiry_minutes),
+            "created_at": now,
+            "is_used": False,
+            "attempts": 0,
+            "max_attempts": 3
         }
+        return otp_code, otp_document
+    
+    async def _persist_otp(self, otp_document: Dict[str, Any]):
+        """Store an OTP, replacing any unused one for the same identifier and purpose."""
+        await self.db.otps.update_one(
+            {
+                "identifier": otp_document["identifier"],
+                "purpose": otp_document["purpose"],
+                "is_used": False
+            },
+            # Drop the plaintext code left by OTPs issued before hashing
+            {"$set": otp_document, "$unset": {"otp_code": ""}},
+            upsert=True
+        )
+    
+    async def _dispatch_otp(self, identifier: str, otp_code: str, purpose: str, identifier_type: str) -> bool:
+        """Send an OTP over the channel matching the identifier type."""
+        if identifier_type == "phone":
+            return await self.send_sms_otp(identifier, otp_code, purpose)
+        return await self.send_email_otp(identifier, otp_code, purpose)
     
     async def verify_otp(self, identifier: str, otp_code: str, purpose: str) -> Dict[str, Any]:
         """
@@ -74,12 +249,41 @@ class OTPService:
         Returns:
             Dict with verification result
         """
-        # Find the OTP
-        otp_doc = await self.db.otps.find_one({
-            "identifier": identifier,
-            "purpose": purpose,
-            "is_used": False
-        })
+        # Throttle per identifier before touching the database
+        if self._verify_rate_limited(identifier):
+            return {
+                "success": False,
+                "error": "Too many verification attempts, please try again later"
+            }
+        
+        # Check and consume the OTP in one atomic write; every condition is
+        # judged against the stored document, so concurrent submissions of
+        # the right code cannot both succeed
+        now = datetime.utcnow()
+        expired = {"$gt": [now, "$expires_at"]}
+        exhausted = {"$gte": ["$attempts", "$max_attempts"]}
+        matched = {"$eq": ["$otp_hash", {"$literal": _hash_otp(identifier, purpose, otp_code)}]}
+        verified = {"$and": [{"$not": [expired]}, {"$not": [exhausted]}, matched]}
+        settled = {"$or": [expired, exhausted, matched]}
+        
+        otp_doc = await self.db.otps.find_one_and_update(
+            {
+                "identifier": identifier,
+                "purpose": purpose,
+                "is_used": False
+            },
+            [{"$set": {
+                # Expired, exhausted and correctly answered OTPs are all spent
+                "is_used": settled,
+                # Only a wrong guess on a live OTP counts as an attempt. It is
+                # counted in this same write, not deferred to a batch, so a burst
+                # of guesses can never get past max_attempts
+                "attempts": {"$cond": [settled, "$attempts", {"$add": ["$attempts", 1]}]},
+                "verified_at": {"$cond": [verified, now, "$$REMOVE"]}
+            }}],
+            projection={"_id": 0, "is_used": 1, "verified_at": 1, "expires_at": 1},
+            return_document=ReturnDocument.AFTER
+        )
         
         if not otp_doc:
             return {
@@ -87,53 +291,47 @@ class OTPService:
                 "error": "OTP not found or already used"
             }
         
-        # Check if OTP is expired
-        if datetime.utcnow() > otp_doc["expires_at"]:
-            await self.db.otps.update_one(
-                {"_id": otp_doc["_id"]},
-                {"$set": {"is_used": True}}
-            )
+        if otp_doc.get("verified_at"):
             return {
-                "success": False,
-                "error": "OTP has expired"
+                "success": True,
+                "message": "OTP verified successfully"
             }
         
-        # Check attempts
-        if otp_doc["attempts"] >= otp_doc["max_attempts"]:
-            await self.db.otps.update_one(
-                {"_id": otp_doc["_id"]},
-                {"$set": {"is_used": True}}
-            )
+        # Otherwise report why it was rejected: expiry first, then spent attempts
+        if now > otp_doc["expires_at"]:
             return {
                 "success": False,
-                "error": "Maximum verification attempts exceeded"
+                "error": "OTP has expired"
             }
         
-        # Verify OTP code
-        if otp_doc["otp_code"] != otp_code:
-            await self.db.otps.update_one(
-                {"_id": otp_doc["_id"]},
-                {"$inc": {"attempts": 1}}
-            )
+        if otp_doc["is_used"]:
             return {
                 "success": False,
-                "error": "Invalid OTP code"
+                "error": "Maximum verification attempts exceeded"
             }
         
-        # Mark OTP as used
-        await self.db.otps.update_one(
-            {"_id": otp_doc["_id"]},
-            {"$set": {"is_used": True, "verified_at": datetime.utcnow()}}
-        )
-        
         return {
-            "success": True,
-            "message": "OTP verified successfully"
+            "success": False,
+            "error": "Invalid OTP code"
         }
     
+    def _verify_rate_limited(self, identifier: str) -> bool:
+        """Record a verification attempt, returning True if the identifier is over its limit."""
+        now = time.monotonic()
+        hits = self._verify_hits.get(identifier) or deque()
+        while hits and hits[0] <= now - OTP_VERIFY_RATE_WINDOW_SECONDS:
+            hits.popleft()
+        
+        if len(hits) >= OTP_VERIFY_RATE_LIMIT:
+            return True
+        
+        hits.append(now)
+        self._verify_hits.set(identifier, hits)
+        return False
+    
     async def send_email_otp(self, email: str, otp_code: str, purpose: str) -> bool:
         """
-        Send OTP via email.
+        Queue an OTP email for background delivery.
         
         Args:
             email: Recipient email address
@@ -141,87 +339,127 @@ class OTPService:
             purpose: Purpose of the OTP
             
         Returns:
-            Boolean indicating success
+            Boolean indicating the email was accepted for delivery
         """
+        if not SMTP_USER or not SMTP_PASSWORD:
+            logger.error("SMTP credentials not configured")
+            return False
+        
+        return self._enqueue_email({
+            "email": email,
+            "otp_code": otp_code,
+            "purpose": purpose,
+            "attempt": 0,
+            "next_retry_at": None
+        })
+    
+    def _enqueue_email(self, item: Dict[str, Any]) -> bool:
+        """Put an email on the delivery queue, starting the worker if needed."""
+        if self._email_worker_task is None or self._email_worker_task.done():
+            self._email_worker_task = asyncio.create_task(self._email_worker())
+        
         try:
-            # Email configuration (you should set these in environment variables)
-            smtp_host = os.getenv('SMTP_HOST', 'smtp.gmail.com')
-            smtp_port = int(os.getenv('SMTP_PORT', '587'))
-            smtp_user = os.getenv('SMTP_USER')
-            smtp_password = os.getenv('SMTP_PASSWORD')
-            from_email = os.getenv('FROM_EMAIL', smtp_user)
-            
-            if not smtp_user or not smtp_password:
-                logger.error("SMTP credentials not configured")
-                return False
-            
-            # Create message
-            msg = MIMEMultipart()
-            msg['From'] = from_email
-            msg['To'] = email
-            msg['Subject'] = f"XFas Logistics - OTP Verification ({purpose.replace('_', ' ').title()})"
-            
-            # Email body
-            purpose_text = {
-                'registration': 'complete your registration',
-                'login': 'log in to your account',
-                'verify_email': 'verify your email address',
-                'verify_phone': 'verify your phone number'
-            }.get(purpose, 'verify your identity')
-            
-            body = f"""
-            <html>
-            <head>
-                <style>
-                    .container {{ font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; }}
-                    .header {{ background-color: #f97316; color: white; padding: 20px; text-align: center; }}
-                    .content {{ padding: 20px; background-color: #f9f9f9; }}
-                    .otp-box {{ background-color: #fff; padding: 20px; text-align: center; margin: 20px 0; border-radius: 8px; border: 2px dashed #f97316; }}
-                    .otp-code {{ font-size: 32px; font-weight: bold; letter-spacing: 8px; color: #f97316; }}
-                    .footer {{ background-color: #374151; color: white; padding: 15px; text-align: center; font-size: 12px; }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h2>XFas Logistics</h2>
-                        <p>Your OTP Verification Code</p>
-                    </div>
-                    <div class="content">
-                        <p>Hello,</p>
-                        <p>You requested an OTP to {purpose_text}. Please use the code below:</p>
-                        <div class="otp-box">
-                            <div class="otp-code">{otp_code}</div>
-                        </div>
-                        <p><strong>This code will expire in {self.otp_expiry_minutes} minutes.</strong></p>
-                        <p>If you didn't request this code, please ignore this email.</p>
-                    </div>
-                    <div class="footer">
-                        <p>&copy; 2024 XFas Logistics. All rights reserved.</p>
-                        <p>This is an automated message, please do not reply to this email.</p>
-                    </div>
-                </div>
-            </body>
-            </html>
-            """
-            
-            msg.attach(MIMEText(body, 'html'))
-            
-            # Send email
-            server = smtplib.SMTP(smtp_host, smtp_port)
-            server.starttls()
-            server.login(smtp_user, smtp_password)
-            text = msg.as_string()
-            server.sendmail(from_email, email, text)
-            server.quit()
-            
-            logger.info(f"OTP email sent successfully to {email}")
+            self.email_queue.put_nowait(item)
             return True
-            
-        except Exception as e:
-            logger.error(f"Failed to send OTP email: {str(e)}")
+        except asyncio.QueueFull:
+            logger.error(f"OTP email queue full, dropping email to {item['email']}")
             return False
     
+    async def _email_worker(self):
+        """Deliver queued OTP emails, retrying transient SMTP failures."""
+        while True:
+            item = await self.email_queue.get()
+            try:
+                await self._deliver_email_otp(item["email"], item["otp_code"], item["purpose"])
+                logger.info(f"OTP email sent successfully to {item['email']}")
+            except Exception as e:
+                self._schedule_email_retry(item, e)
+            finally:
+                self.email_queue.task_done()
+    
+    def _schedule_email_retry(self, item: Dict[str, Any], error: Exception):
+        """Re-queue a failed email with exponential backoff, or give up on it."""
+        attempt = item["attempt"] + 1
+        if not _is_transient_smtp_error(error) or attempt >= OTP_EMAIL_MAX_ATTEMPTS:
+            logger.error(f"Failed to send OTP email to {item['email']} after {attempt} attempt(s): {str(error)}")
+            return
+        
+        delay = min(2 ** attempt + random.random() * 0.5, OTP_EMAIL_MAX_BACKOFF_SECONDS)
+        logger.warning(f"OTP email to {item['email']} failed ({str(error)}), retrying in {delay:.1f}s")
+        retry_item = {**item, "attempt": attempt, "next_retry_at": datetime.utcnow() + timedelta(seconds=delay)}
+        asyncio.get_running_loop().call_later(delay, self._enqueue_email, retry_item)
+    
+    async def _deliver_email_otp(self, email: str, otp_code: str, purpose: str):
+        """Build and send one OTP email; raises if delivery fails."""
+        purpose_text = OTP_EMAIL_PURPOSE_TEXT.get(purpose, 'verify your identity')
+        
+        # Create message
+        msg = EmailMessage()
+        msg['From'] = FROM_EMAIL
+        msg['To'] = email
+        msg['Subject'] = f"XFas Logistics - OTP Verification ({purpose.replace('_', ' ').title()})"
+        msg.set_content(
+            f"Your XFas Logistics OTP to {purpose_text} is {otp_code}. "
+            f"This code will expire in {self.otp_expiry_minutes} minutes."
+        )
+        msg.add_alternative(
+            _OTP_EMAIL_HTML.substitute(
+                purpose_text=purpose_text,
+                otp_code=otp_code,
+                minutes=self.otp_expiry_minutes
+            ),
+            subtype='html'
+        )
+        
+        # Send email off the event loop, over the shared session
+        async with self._smtp_lock:
+            await asyncio.to_thread(
+                self._send_smtp_message_sync,
+                SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASSWORD,
+                FROM_EMAIL, email, msg.as_string()
+            )
+    
+    def _send_smtp_message_sync(self, smtp_host: str, smtp_port: int, smtp_user: str, smtp_password: str,
+                                from_email: str, to_email: str, message: str):
+        """Send one message, opening or recycling the SMTP session as needed."""
+        if self._smtp is not None and self._smtp_messages >= SMTP_MAX_MESSAGES_PER_CONNECTION:
+            self._close_smtp_sync()
+        
+        for attempt in range(2):
+            if self._smtp is None:
+                server = smtplib.SMTP(smtp_host, smtp_port, timeout=30)
+                server.starttls()
+                server.login(smtp_user, smtp_password)
+                self._smtp = server
+                self._smtp_messages = 0
+            
+            try:
+                self._smtp.sendmail(from_email, to_email, message)
+                self._smtp_messages += 1
+                return
+            except smtplib.SMTPServerDisconnected:
+                # Idle sessions get dropped by the server; reconnect once
+                self._smtp = None
+                if attempt:
+                    raise
+    
+    def _close_smtp_sync(self):
+        """Quit the SMTP session if one is open."""
+        server, self._smtp = self._smtp, None
+        if server is not None:
+            try:
+                server.quit()
+            except (smtplib.SMTPException, OSError):
+                server.close()
+    
+    async def close(self):
+        """Stop the email worker and release the persistent SMTP session."""
+        if self._email_worker_task is not None:
+            self._email_worker_task.cancel()
+            self._email_worker_task = None
+        async with self._smtp_lock:
+            await asyncio.to_thread(self._close_smtp_sync)
+    
     async def send_sms_otp(self, phone: str, otp_code: str, purpose: str) -> bool:
         """
         Send OTP via SMS using the SMS service.
@@ -237,38 +475,23 @@ class OTPService:
         try:
             from services.sms_service import sms_service
             
-            purpose_text = {
-                'registration': 'complete registration',
-                'login': 'login',
-                'verify_email': 'verify email',
-                'verify_phone': 'verify phone'
-            }.get(purpose, 'verification')
+            purpose_text = OTP_SMS_PURPOSE_TEXT.get(purpose, 'verification')
             
             sms_text = f"Your XFas Logistics OTP for {purpose_text} is: {otp_code}. Valid for {self.otp_expiry_minutes} minutes. Do not share with anyone."
             
             # Send SMS using the SMS service
             result = await sms_service.send_sms(phone, sms_text)
             
-            if result['success']:
-                logger.info(f"SMS OTP sent successfully to {phone} via {result['provider']}")
+            if result.success:
+                logger.info(f"SMS OTP sent successfully to {phone} via {result.provider}")
                 return True
             else:
-                logger.error(f"Failed to send SMS OTP to {phone}: {result.get('error', 'Unknown error')}")
+                logger.error(f"Failed to send SMS OTP to {phone}: {result.error or 'Unknown error'}")
                 return False
             
         except Exception as e:
             logger.error(f"Failed to send SMS OTP: {str(e)}")
             return False
-    
-    async def cleanup_expired_otps(self):
-        """Clean up expired OTP records."""
-        try:
-            result = await self.db.otps.delete_many({
-                "expires_at": {"$lt": datetime.utcnow()}
-            })
-            logger.info(f"Cleaned up {result.deleted_count} expired OTP records")
-        except Exception as e:
-            logger.error(f"Failed to cleanup expired OTPs: {str(e)}")
 
 # Create a global OTP service instance (will be initialized with database)
 otp_service = None
@@ -278,4 +501,9 @@ def get_otp_service(db: AsyncIOMotorDatabase) -> OTPService:
     global otp_service
     if otp_service is None:
         otp_service = OTPService(db)
-    return otp_service
\ No newline at end of file
+    return otp_service
+
+async def close_otp_service():
+    """Release resources held by the shared OTP service, if it was created."""
+    if otp_service is not None:
+        await otp_service.close()
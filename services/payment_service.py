@@ -1,4 +1,4 @@
-from typing import List, Optional, Dict, Any, Tuple
+from typing import List, Optional, Dict, Any, Tuple, Union
 from datetime import datetime, timedelta
 import hashlib
 import hmac
@@ -108,9 +108,8 @@ class PaymentService:
         """Get user's wallet transaction history."""
         
         cursor = db.wallet_transactions.find({"user_id": user_id}).sort("created_at", -1).skip(skip).limit(limit)
-        transactions_data = await cursor.to_list(length=limit)
         
-        return [WalletTransaction(**txn) for txn in transactions_data]
+        return [WalletTransaction(**txn) async for txn in cursor]
     
     # ===== PAYMENT PROCESSING =====
     
@@ -648,12 +647,15 @@ class PaymentService:
     
     # ===== UTILITY METHODS =====
     
-    def verify_razorpay_signature(self, payload: str, signature: str, secret: str) -> bool:
+    def verify_razorpay_signature(self, payload: Union[str, bytes], signature: str, secret: str) -> bool:
         """Verify Razorpay webhook signature."""
         
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        
         expected_signature = hmac.new(
             secret.encode('utf-8'),
-            payload.encode('utf-8'),
+            payload,
             hashlib.sha256
         ).hexdigest()
         
@@ -7,6 +7,24 @@ import ssl
 
 logger = logging.getLogger(__name__)
 
+# Shared client so Priority Connections calls reuse pooled keep-alive connections
+_http_client: Optional[httpx.AsyncClient] = None
+
+def _get_http_client() -> httpx.AsyncClient:
+    """Get or create the shared Priority Connections HTTP client."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        # Certificates aren't verified (development setup, as before)
+        _http_client = httpx.AsyncClient(timeout=30.0, verify=False)
+    return _http_client
+
+async def close_priority_connections() -> None:
+    """Close the shared Priority Connections HTTP client on shutdown."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
 class PriorityConnectionsService:
     """Service for integrating with Priority Connections APIs."""
     
@@ -21,11 +39,10 @@ class PriorityConnectionsService:
     async def get_countries_with_providers(self) -> List[Dict[str, Any]]:
         """Get all countries and their associated suppliers/providers."""
         try:
-            async with httpx.AsyncClient(timeout=self.timeout, verify=False) as client:
-                response = await client.get(f"{self.base_url}/countryproviders")
-                response.raise_for_status()
-                data = response.json()
-                return data.get('data', []) if isinstance(data, dict) else data
+            response = await _get_http_client().get(f"{self.base_url}/countryproviders")
+            response.raise_for_status()
+            data = response.json()
+            return data.get('data', []) if isinstance(data, dict) else data
         except Exception as e:
             logger.error(f"Error fetching countries with providers: {e}")
             return []
@@ -33,16 +50,15 @@ class PriorityConnectionsService:
     async def get_all_providers(self) -> List[Dict[str, Any]]:
         """Get all providers available in the system."""
         try:
-            async with httpx.AsyncClient(timeout=self.timeout, verify=False) as client:
-                response = await client.get(f"{self.base_url}/getinternationalrateprovider")
-                response.raise_for_status()
-                data = response.json()
-                providers_list = data.get('data', []) if isinstance(data, dict) else data
-                
-                # Convert string list to dict format for consistency
-                if providers_list and isinstance(providers_list[0], str):
-                    return [{'name': provider, 'providerName': provider} for provider in providers_list]
-                return providers_list
+            response = await _get_http_client().get(f"{self.base_url}/getinternationalrateprovider")
+            response.raise_for_status()
+            data = response.json()
+            providers_list = data.get('data', []) if isinstance(data, dict) else data
+            
+            # Convert string list to dict format for consistency
+            if providers_list and isinstance(providers_list[0], str):
+                return [{'name': provider, 'providerName': provider} for provider in providers_list]
+            return providers_list
         except Exception as e:
             logger.error(f"Error fetching all providers: {e}")
             return []
@@ -50,23 +66,22 @@ class PriorityConnectionsService:
     async def get_served_countries(self) -> List[Dict[str, Any]]:
         """Get countries currently served by Priority Connections."""
         try:
-            async with httpx.AsyncClient(timeout=self.timeout, verify=False) as client:
-                response = await client.get(f"{self.base_url}/countries")
-                response.raise_for_status()
-                data = response.json()
-                countries_list = data.get('data', []) if isinstance(data, dict) else data
-                
-                # Convert string list to dict format with unique identifiers
-                if countries_list and isinstance(countries_list[0], str):
-                    return [
-                        {
-                            'name': country, 
-                            'countryName': country, 
-                            'code': country.replace(' ', '_').replace(',', '').replace("'", '').upper()[:10]  # Use country name as unique code
-                        } 
-                        for country in countries_list
-                    ]
-                return countries_list
+            response = await _get_http_client().get(f"{self.base_url}/countries")
+            response.raise_for_status()
+            data = response.json()
+            countries_list = data.get('data', []) if isinstance(data, dict) else data
+            
+            # Convert string list to dict format with unique identifiers
+            if countries_list and isinstance(countries_list[0], str):
+                return [
+                    {
+                        'name': country, 
+                        'countryName': country, 
+                        'code': country.replace(' ', '_').replace(',', '').replace("'", '').upper()[:10]  # Use country name as unique code
+                    } 
+                    for country in countries_list
+                ]
+            return countries_list
         except Exception as e:
             logger.error(f"Error fetching served countries: {e}")
             return []
@@ -80,11 +95,10 @@ class PriorityConnectionsService:
                 "weight": str(weight)
             }
             
-            async with httpx.AsyncClient(timeout=self.timeout, verify=False) as client:
-                response = await client.get(f"{self.base_url}/providerrates", params=params)
-                response.raise_for_status()
-                data = response.json()
-                return data.get('data', []) if isinstance(data, dict) else data
+            response = await _get_http_client().get(f"{self.base_url}/providerrates", params=params)
+            response.raise_for_status()
+            data = response.json()
+            return data.get('data', []) if isinstance(data, dict) else data
         except Exception as e:
             logger.error(f"Error fetching provider rates for {country_name}: {e}")
             return []
@@ -295,15 +309,14 @@ class PriorityConnectionsService:
     async def health_check(self) -> Dict[str, Any]:
         """Check if Priority Connections API is accessible."""
         try:
-            async with httpx.AsyncClient(timeout=10.0, verify=False) as client:
-                response = await client.get(f"{self.base_url}/countries")
-                response.raise_for_status()
-                
-                return {
-                    "status": "healthy",
-                    "response_time": response.elapsed.total_seconds(),
-                    "status_code": response.status_code
-                }
+            response = await _get_http_client().get(f"{self.base_url}/countries", timeout=10.0)
+            response.raise_for_status()
+            
+            return {
+                "status": "healthy",
+                "response_time": response.elapsed.total_seconds(),
+                "status_code": response.status_code
+            }
         except Exception as e:
             return {
                 "status": "unhealthy",
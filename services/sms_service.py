@@ -1,51 +1,111 @@
+import asyncio
 import os
-import requests
+import random
+import re
+import httpx
 import logging
-from typing import Optional, Dict, Any
+import orjson
+from typing import Optional, Dict, Any, NamedTuple
 from abc import ABC, abstractmethod
 
+from utils.phone import is_valid_phone, to_e164, to_indian_mobile
+
 logger = logging.getLogger(__name__)
 
+# First 4-8 digit run in an OTP message is taken as the code
+_OTP_CODE = re.compile(r"\b\d{4,8}\b")
+
+# Connections kept open to SMS gateways across sends
+SMS_HTTP_MAX_CONNECTIONS = 50
+SMS_HTTP_TIMEOUT_SECONDS = 30.0
+
+# Wall-clock budget for one provider attempt; a timeout ends the send without falling back
+SMS_PROVIDER_TIMEOUT_SECONDS = 5.0
+
+# Backoff between providers after a transient failure
+SMS_FALLBACK_BASE_DELAY_SECONDS = 0.25
+SMS_FALLBACK_MAX_DELAY_SECONDS = 2.0
+
+# Shared client so gateway sends reuse pooled keep-alive connections
+_http_client: Optional[httpx.AsyncClient] = None
+
+def _get_http_client() -> httpx.AsyncClient:
+    """Get or create the shared SMS gateway HTTP client."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=SMS_HTTP_TIMEOUT_SECONDS,
+            limits=httpx.Limits(max_connections=SMS_HTTP_MAX_CONNECTIONS)
+        )
+    return _http_client
+
+async def close_sms_service() -> None:
+    """Close the shared SMS gateway HTTP client on shutdown."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+class SmsResult(NamedTuple):
+    """Outcome of one SMS send attempt."""
+    success: bool
+    provider: str
+    message: Optional[str] = None
+    error: Optional[str] = None
+    response: Optional[Dict[str, Any]] = None
+    # False when trying again cannot help (missing credentials, unsupported number)
+    retryable: bool = True
+
 class SMSProvider(ABC):
     """Abstract base class for SMS providers."""
     
+    __slots__ = ()
+    
+    def _is_configured(self) -> bool:
+        """Whether the credentials this provider needs are present."""
+        return True
+    
     @abstractmethod
-    async def send_sms(self, phone: str, message: str) -> Dict[str, Any]:
+    async def send_sms(self, phone: str, message: str) -> SmsResult:
         """Send SMS message to phone number."""
         pass
 
 class Fast2SMSProvider(SMSProvider):
     """Fast2SMS provider implementation (Popular in India)."""
     
+    __slots__ = ('api_key', 'sender_id', 'base_url', 'headers')
+    
     def __init__(self):
         self.api_key = os.getenv('FAST2SMS_API_KEY')
         self.sender_id = os.getenv('FAST2SMS_SENDER_ID', 'XFASLO')
         self.base_url = 'https://www.fast2sms.com/dev/bulkV2'
+        self.headers = {
+            'authorization': self.api_key,
+            'Content-Type': 'application/json'
+        }
+    
+    def _is_configured(self) -> bool:
+        return bool(self.api_key)
     
-    async def send_sms(self, phone: str, message: str) -> Dict[str, Any]:
+    async def send_sms(self, phone: str, message: str) -> SmsResult:
         if not self.api_key:
-            return {
-                'success': False,
-                'error': 'Fast2SMS API key not configured',
-                'provider': 'fast2sms'
-            }
+            return SmsResult(
+                success=False,
+                error='Fast2SMS API key not configured',
+                provider='fast2sms',
+                retryable=False
+            )
         
         try:
-            # Clean phone number (remove +91 or 91 prefix for Indian numbers)
-            clean_phone = phone.replace('+91', '').replace('91', '').replace('-', '').replace(' ', '')
-            if len(clean_phone) == 10 and clean_phone.startswith(('6', '7', '8', '9')):
-                phone_number = clean_phone
-            else:
-                return {
-                    'success': False,
-                    'error': 'Invalid Indian phone number format',
-                    'provider': 'fast2sms'
-                }
-            
-            headers = {
-                'authorization': self.api_key,
-                'Content-Type': 'application/json'
-            }
+            # Fast2SMS expects the bare 10-digit Indian number
+            phone_number = to_indian_mobile(phone)
+            if phone_number is None:
+                return SmsResult(
+                    success=False,
+                    error='Invalid Indian phone number format',
+                    provider='fast2sms',
+                    retryable=False
+                )
             
             data = {
                 'sender_id': self.sender_id,
@@ -55,66 +115,66 @@ class Fast2SMSProvider(SMSProvider):
                 'flash': 0
             }
             
-            response = requests.post(self.base_url, json=data, headers=headers, timeout=30)
-            response_data = response.json()
+            response = await _get_http_client().post(self.base_url, content=orjson.dumps(data), headers=self.headers)
+            response_data = orjson.loads(response.content)
             
             if response.status_code == 200 and response_data.get('return', False):
-                return {
-                    'success': True,
-                    'message': 'SMS sent successfully',
-                    'provider': 'fast2sms',
-                    'response': response_data
-                }
+                return SmsResult(
+                    success=True,
+                    message='SMS sent successfully',
+                    provider='fast2sms',
+                    response=response_data
+                )
             else:
-                return {
-                    'success': False,
-                    'error': response_data.get('message', 'Failed to send SMS'),
-                    'provider': 'fast2sms',
-                    'response': response_data
-                }
+                return SmsResult(
+                    success=False,
+                    error=response_data.get('message', 'Failed to send SMS'),
+                    provider='fast2sms',
+                    response=response_data
+                )
                 
         except Exception as e:
             logger.error(f"Fast2SMS error: {str(e)}")
-            return {
-                'success': False,
-                'error': f'Fast2SMS API error: {str(e)}',
-                'provider': 'fast2sms'
-            }
+            return SmsResult(
+                success=False,
+                error=f'Fast2SMS API error: {str(e)}',
+                provider='fast2sms'
+            )
 
 class MSG91Provider(SMSProvider):
     """MSG91 provider implementation (Popular in India)."""
     
+    __slots__ = ('auth_key', 'sender_id', 'template_id', 'base_url', 'headers')
+    
     def __init__(self):
         self.auth_key = os.getenv('MSG91_AUTH_KEY')
         self.sender_id = os.getenv('MSG91_SENDER_ID', 'XFASLO')
         self.template_id = os.getenv('MSG91_TEMPLATE_ID')
         self.base_url = 'https://control.msg91.com/api/v5/otp'
+        self.headers = {
+            'authkey': self.auth_key,
+            'Content-Type': 'application/json'
+        }
+    
+    def _is_configured(self) -> bool:
+        return bool(self.auth_key)
     
-    async def send_sms(self, phone: str, message: str) -> Dict[str, Any]:
+    async def send_sms(self, phone: str, message: str) -> SmsResult:
         if not self.auth_key:
-            return {
-                'success': False,
-                'error': 'MSG91 auth key not configured',
-                'provider': 'msg91'
-            }
+            return SmsResult(
+                success=False,
+                error='MSG91 auth key not configured',
+                provider='msg91',
+                retryable=False
+            )
         
         try:
-            # Clean phone number
-            clean_phone = phone.replace('+', '').replace('-', '').replace(' ', '')
-            if not clean_phone.startswith('91') and len(clean_phone) == 10:
-                clean_phone = '91' + clean_phone
-            
-            headers = {
-                'authkey': self.auth_key,
-                'Content-Type': 'application/json'
-            }
+            # MSG91 expects the number with its country code and no +
+            clean_phone = to_e164(phone)[1:]
             
             # Extract OTP from message (assuming format like "Your OTP is: 123456")
-            otp_code = ''
-            for word in message.split():
-                if word.isdigit() and len(word) >= 4:
-                    otp_code = word
-                    break
+            match = _OTP_CODE.search(message)
+            otp_code = match.group() if match else ''
             
             if self.template_id and otp_code:
                 # Use template-based sending
@@ -143,47 +203,53 @@ class MSG91Provider(SMSProvider):
                 }
                 url = 'https://control.msg91.com/api/v5/flow/'
             
-            response = requests.post(url, json=data, headers=headers, timeout=30)
-            response_data = response.json() if response.headers.get('content-type', '').startswith('application/json') else {'message': response.text}
+            response = await _get_http_client().post(url, content=orjson.dumps(data), headers=self.headers)
+            response_data = orjson.loads(response.content) if response.headers.get('content-type', '').startswith('application/json') else {'message': response.text}
             
             if response.status_code == 200:
-                return {
-                    'success': True,
-                    'message': 'SMS sent successfully',
-                    'provider': 'msg91',
-                    'response': response_data
-                }
+                return SmsResult(
+                    success=True,
+                    message='SMS sent successfully',
+                    provider='msg91',
+                    response=response_data
+                )
             else:
-                return {
-                    'success': False,
-                    'error': response_data.get('message', f'HTTP {response.status_code}'),
-                    'provider': 'msg91',
-                    'response': response_data
-                }
+                return SmsResult(
+                    success=False,
+                    error=response_data.get('message', f'HTTP {response.status_code}'),
+                    provider='msg91',
+                    response=response_data
+                )
                 
         except Exception as e:
             logger.error(f"MSG91 error: {str(e)}")
-            return {
-                'success': False,
-                'error': f'MSG91 API error: {str(e)}',
-                'provider': 'msg91'
-            }
+            return SmsResult(
+                success=False,
+                error=f'MSG91 API error: {str(e)}',
+                provider='msg91'
+            )
 
 class TwilioProvider(SMSProvider):
     """Twilio provider implementation (International)."""
     
+    __slots__ = ('account_sid', 'auth_token', 'from_number')
+    
     def __init__(self):
         self.account_sid = os.getenv('TWILIO_ACCOUNT_SID')
         self.auth_token = os.getenv('TWILIO_AUTH_TOKEN')
         self.from_number = os.getenv('TWILIO_FROM_NUMBER')
     
-    async def send_sms(self, phone: str, message: str) -> Dict[str, Any]:
+    def _is_configured(self) -> bool:
+        return all([self.account_sid, self.auth_token, self.from_number])
+    
+    async def send_sms(self, phone: str, message: str) -> SmsResult:
         if not all([self.account_sid, self.auth_token, self.from_number]):
-            return {
-                'success': False,
-                'error': 'Twilio credentials not configured',
-                'provider': 'twilio'
-            }
+            return SmsResult(
+                success=False,
+                error='Twilio credentials not configured',
+                provider='twilio',
+                retryable=False
+            )
         
         try:
             from twilio.rest import Client
@@ -191,48 +257,47 @@ class TwilioProvider(SMSProvider):
             client = Client(self.account_sid, self.auth_token)
             
             # Ensure phone number has country code
-            if not phone.startswith('+'):
-                if phone.startswith('91'):
-                    phone = '+' + phone
-                elif len(phone) == 10:
-                    phone = '+91' + phone
-                else:
-                    phone = '+' + phone
+            phone = to_e164(phone)
             
-            message_instance = client.messages.create(
+            # The Twilio SDK is synchronous, so keep it off the event loop
+            message_instance = await asyncio.to_thread(
+                client.messages.create,
                 body=message,
                 from_=self.from_number,
                 to=phone
             )
             
-            return {
-                'success': True,
-                'message': 'SMS sent successfully',
-                'provider': 'twilio',
-                'response': {
+            return SmsResult(
+                success=True,
+                message='SMS sent successfully',
+                provider='twilio',
+                response={
                     'sid': message_instance.sid,
                     'status': message_instance.status
                 }
-            }
+            )
             
         except ImportError:
-            return {
-                'success': False,
-                'error': 'Twilio library not installed. Run: pip install twilio',
-                'provider': 'twilio'
-            }
+            return SmsResult(
+                success=False,
+                error='Twilio library not installed. Run: pip install twilio',
+                provider='twilio',
+                retryable=False
+            )
         except Exception as e:
             logger.error(f"Twilio error: {str(e)}")
-            return {
-                'success': False,
-                'error': f'Twilio API error: {str(e)}',
-                'provider': 'twilio'
-            }
+            return SmsResult(
+                success=False,
+                error=f'Twilio API error: {str(e)}',
+                provider='twilio'
+            )
 
 class ConsoleSMSProvider(SMSProvider):
     """Console provider for development/testing."""
     
-    async def send_sms(self, phone: str, message: str) -> Dict[str, Any]:
+    __slots__ = ()
+    
+    async def send_sms(self, phone: str, message: str) -> SmsResult:
         print("\n" + "="*50)
         print("📱 SMS OTP (Development Mode)")
         print("="*50)
@@ -242,11 +307,11 @@ class ConsoleSMSProvider(SMSProvider):
         
         logger.info(f"Console SMS sent to {phone}: {message}")
         
-        return {
-            'success': True,
-            'message': 'SMS sent successfully (console mode)',
-            'provider': 'console'
-        }
+        return SmsResult(
+            success=True,
+            message='SMS sent successfully (console mode)',
+            provider='console'
+        )
 
 class SMSService:
     """Main SMS service that handles provider selection and fallback."""
@@ -268,50 +333,85 @@ class SMSService:
         preferred_provider = os.getenv('SMS_PROVIDER', 'fast2sms').lower()
         
         if preferred_provider == 'fast2sms':
-            self.providers = [Fast2SMSProvider(), MSG91Provider(), TwilioProvider()]
+            candidates = [Fast2SMSProvider(), MSG91Provider(), TwilioProvider()]
         elif preferred_provider == 'msg91':
-            self.providers = [MSG91Provider(), Fast2SMSProvider(), TwilioProvider()]
+            candidates = [MSG91Provider(), Fast2SMSProvider(), TwilioProvider()]
         elif preferred_provider == 'twilio':
-            self.providers = [TwilioProvider(), Fast2SMSProvider(), MSG91Provider()]
+            candidates = [TwilioProvider(), Fast2SMSProvider(), MSG91Provider()]
         else:
             # Default fallback order
-            self.providers = [Fast2SMSProvider(), MSG91Provider(), TwilioProvider()]
+            candidates = [Fast2SMSProvider(), MSG91Provider(), TwilioProvider()]
         
-        # Add console as last fallback
-        self.providers.append(ConsoleSMSProvider())
+        # Unconfigured providers can only ever fail, so leave them out of the send loop
+        self.providers = [p for p in candidates if p._is_configured()]
+        
+        # Fall back to console output when no gateway is configured
+        if not self.providers:
+            logger.warning("No SMS provider configured, falling back to console output")
+            self.providers.append(ConsoleSMSProvider())
         
         logger.info(f"SMS Service initialized with providers: {[p.__class__.__name__ for p in self.providers]}")
     
-    async def send_sms(self, phone: str, message: str) -> Dict[str, Any]:
+    async def send_sms(self, phone: str, message: str) -> SmsResult:
         """Send SMS using the first available provider."""
         
+        # No gateway can deliver to a malformed number, so don't try them all
+        if not is_valid_phone(phone):
+            return SmsResult(
+                success=False,
+                error='Invalid phone number format',
+                provider='none',
+                retryable=False
+            )
+        
         last_error = None
+        transient_failures = 0
         
         for provider in self.providers:
+            # Back off before the next gateway only after a transient failure
+            if last_error is not None and last_error.retryable:
+                delay = min(SMS_FALLBACK_BASE_DELAY_SECONDS * 2 ** transient_failures, SMS_FALLBACK_MAX_DELAY_SECONDS)
+                await asyncio.sleep(delay + random.random() * 0.1)
+                transient_failures += 1
+            
             try:
-                result = await provider.send_sms(phone, message)
+                result = await asyncio.wait_for(
+                    provider.send_sms(phone, message),
+                    timeout=SMS_PROVIDER_TIMEOUT_SECONDS
+                )
                 
-                if result['success']:
-                    logger.info(f"SMS sent successfully using {result['provider']}")
+                if result.success:
+                    logger.info(f"SMS sent successfully using {result.provider}")
                     return result
                 else:
                     last_error = result
-                    logger.warning(f"SMS failed with {result['provider']}: {result.get('error', 'Unknown error')}")
+                    logger.warning(f"SMS failed with {result.provider}: {result.error or 'Unknown error'}")
                     
+            except asyncio.TimeoutError:
+                # The request may still be delivered (a Twilio send in its worker thread
+                # can't be cancelled), so another gateway could send a duplicate OTP
+                provider_name = provider.__class__.__name__
+                logger.warning(f"SMS provider {provider_name} timed out; delivery unknown, not falling back")
+                return SmsResult(
+                    success=False,
+                    error=f'Provider {provider_name} timed out; the message may still be delivered',
+                    provider=provider_name.lower().replace('provider', ''),
+                    retryable=False
+                )
             except Exception as e:
-                last_error = {
-                    'success': False,
-                    'error': f'Provider {provider.__class__.__name__} failed: {str(e)}',
-                    'provider': provider.__class__.__name__.lower().replace('provider', '')
-                }
-                logger.error(f"SMS provider {provider.__class__.__name__} failed: {str(e)}")
+                last_error = SmsResult(
+                    success=False,
+                    error=f'Provider {provider.__class__.__name__} failed: {str(e) or type(e).__name__}',
+                    provider=provider.__class__.__name__.lower().replace('provider', '')
+                )
+                logger.error(f"SMS provider {provider.__class__.__name__} failed: {str(e) or type(e).__name__}")
         
         # If all providers failed, return the last error
-        return last_error or {
-            'success': False,
-            'error': 'All SMS providers failed',
-            'provider': 'none'
-        }
+        return last_error or SmsResult(
+            success=False,
+            error='All SMS providers failed',
+            provider='none'
+        )
 
 # Global SMS service instance
 sms_service = SMSService()
\ No newline at end of file
@@ -10,8 +10,8 @@ from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import os
-from motor.motor_asyncio import AsyncIOMotorClient
 from models.user import User
+from utils.database import get_database
 
 # Configuration
 SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "xfas-logistics-secret-key-change-in-production")
@@ -105,10 +105,7 @@ async def get_current_user(
         raise credentials_exception
     
     # Get database connection
-    from motor.motor_asyncio import AsyncIOMotorClient
-    mongo_url = os.environ['MONGO_URL']
-    client = AsyncIOMotorClient(mongo_url)
-    database = client[os.environ.get('DB_NAME', 'xfas_logistics')]
+    database = await get_database()
     
     # Find user in database
     user_data = await database.users.find_one({"id": user_id})
@@ -149,10 +146,7 @@ async def get_optional_current_user(
         if user_id is None:
             return None
             
-        from motor.motor_asyncio import AsyncIOMotorClient
-        mongo_url = os.environ['MONGO_URL']
-        client = AsyncIOMotorClient(mongo_url)
-        database = client[os.environ.get('DB_NAME', 'xfas_logistics')]
+        database = await get_database()
         user_data = await database.users.find_one({"id": user_id})
         if user_data is None:
             return None
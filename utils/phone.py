@@ -0,0 +1,32 @@
+"""
+Phone Number Utility
+Normalizes user-entered phone numbers for the SMS gateways
+"""
+
+import re
+from typing import Optional
+
+_NON_DIGIT = re.compile(r"\D+")
+
+
+def is_valid_phone(phone: str) -> bool:
+    """Whether the number has a plausible digit count for E.164 (10-15 digits)."""
+    return 10 <= len(_NON_DIGIT.sub("", phone)) <= 15
+
+
+def to_indian_mobile(phone: str) -> Optional[str]:
+    """Return the 10-digit Indian mobile number, or None if it is not one."""
+    digits = _NON_DIGIT.sub("", phone)
+    if len(digits) == 12 and digits.startswith("91"):
+        digits = digits[2:]
+    if len(digits) == 10 and digits[0] in "6789":
+        return digits
+    return None
+
+
+def to_e164(phone: str) -> str:
+    """Return the number with a leading +, assuming India for bare 10-digit numbers."""
+    digits = _NON_DIGIT.sub("", phone)
+    if len(digits) == 10 and not phone.lstrip().startswith("+"):
+        return "+91" + digits
+    return "+" + digits
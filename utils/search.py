@@ -0,0 +1,16 @@
+"""
+Search Utility
+Builds MongoDB filters for free-text searches typed by users
+"""
+
+import re
+from typing import Any, Dict, Iterable, List
+
+
+def literal_search_conditions(fields: Iterable[str], search: str) -> List[Dict[str, Any]]:
+    """Case-insensitive match of ``search`` on each field, for use under ``$or``.
+
+    The text is escaped so it is matched literally rather than run as a pattern.
+    """
+    pattern = {"$regex": re.escape(search), "$options": "i"}
+    return [{field: pattern} for field in fields]